@@ -0,0 +1,25 @@
+"""add_message_is_truncated
+
+Revision ID: a1d5e7c3f820
+Revises: f3c9a61d2b74
+Create Date: 2026-10-18 18:11:05.442917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1d5e7c3f820'
+down_revision = 'f3c9a61d2b74'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Marks answers that were cut off because the client disconnected
+    op.add_column('messages', sa.Column('is_truncated', sa.Boolean(), nullable=False, server_default=sa.false(), comment='Answer was cut off because the client disconnected'))
+
+
+def downgrade():
+    op.drop_column('messages', 'is_truncated')
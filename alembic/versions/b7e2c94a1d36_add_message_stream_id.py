@@ -0,0 +1,27 @@
+"""add_message_stream_id
+
+Revision ID: b7e2c94a1d36
+Revises: a1d5e7c3f820
+Create Date: 2026-10-18 19:24:37.905163
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2c94a1d36'
+down_revision = 'a1d5e7c3f820'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Links a streamed answer to its resumable stream so reconnects can replay it
+    op.add_column('messages', sa.Column('stream_id', sa.String(), nullable=True, comment='ID of the resumable stream that generated this answer'))
+    op.create_index(op.f('ix_messages_stream_id'), 'messages', ['stream_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_messages_stream_id'), table_name='messages')
+    op.drop_column('messages', 'stream_id')
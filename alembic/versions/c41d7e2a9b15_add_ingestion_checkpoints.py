@@ -0,0 +1,44 @@
+"""add_ingestion_checkpoints
+
+Revision ID: c41d7e2a9b15
+Revises: 6533613daee3
+Create Date: 2026-10-18 09:12:31.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d7e2a9b15'
+down_revision = '6533613daee3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Track per-batch progress of chunked ingestions so interrupted jobs can resume
+    op.create_table(
+        'ingestion_checkpoints',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('collection_name', sa.String(), nullable=False),
+        sa.Column('source_key', sa.String(), nullable=False, comment='Identifies the ingested source, e.g. file:<file_storage.id>'),
+        sa.Column('content_hash', sa.String(length=64), nullable=False, comment='SHA-256 of the source content'),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('batch_size', sa.Integer(), nullable=False),
+        sa.Column('total_chunks', sa.Integer(), nullable=True),
+        sa.Column('embedded_batches', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('inserted_batches', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('processing_info', sa.JSON(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('collection_name', 'source_key', name='uq_ingestion_checkpoint_source')
+    )
+    op.create_index(op.f('ix_ingestion_checkpoints_id'), 'ingestion_checkpoints', ['id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_ingestion_checkpoints_id'), table_name='ingestion_checkpoints')
+    op.drop_table('ingestion_checkpoints')
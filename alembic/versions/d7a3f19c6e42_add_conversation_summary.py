@@ -0,0 +1,29 @@
+"""add_conversation_summary
+
+Revision ID: d7a3f19c6e42
+Revises: c41d7e2a9b15
+Create Date: 2026-10-18 14:03:47.518226
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a3f19c6e42'
+down_revision = 'c41d7e2a9b15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Rolling summary of the part of a conversation that no longer fits the history window
+    op.add_column('conversations', sa.Column('summary', sa.Text(), nullable=True, comment='Rolling summary of messages older than the history window'))
+    op.add_column('conversations', sa.Column('summary_through_sequence', sa.Integer(), nullable=True, comment='Last message sequence_number folded into the summary'))
+    op.add_column('conversations', sa.Column('summary_updated_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    op.drop_column('conversations', 'summary_updated_at')
+    op.drop_column('conversations', 'summary_through_sequence')
+    op.drop_column('conversations', 'summary')
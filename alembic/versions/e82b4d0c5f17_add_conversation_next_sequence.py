@@ -0,0 +1,31 @@
+"""add_conversation_next_sequence
+
+Revision ID: e82b4d0c5f17
+Revises: d7a3f19c6e42
+Create Date: 2026-10-18 15:26:09.874301
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e82b4d0c5f17'
+down_revision = 'd7a3f19c6e42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Per-conversation counter so message sequence numbers are allocated atomically
+    op.add_column('conversations', sa.Column('next_sequence', sa.Integer(), nullable=False, server_default='1', comment='Sequence number allocated to the next message'))
+    op.execute("""
+        UPDATE conversations c
+        SET next_sequence = COALESCE(
+            (SELECT MAX(m.sequence_number) FROM messages m WHERE m.conversation_id = c.id), 0
+        ) + 1
+    """)
+
+
+def downgrade():
+    op.drop_column('conversations', 'next_sequence')
@@ -0,0 +1,27 @@
+"""add_conversation_topic_centroid
+
+Revision ID: f3c9a61d2b74
+Revises: e82b4d0c5f17
+Create Date: 2026-10-18 17:02:41.318552
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c9a61d2b74'
+down_revision = 'e82b4d0c5f17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Running topic embedding used to detect topic shifts for title updates
+    op.add_column('conversations', sa.Column('topic_centroid', sa.JSON(), nullable=True, comment='Running mean embedding of the user messages of the current topic'))
+    op.add_column('conversations', sa.Column('topic_message_count', sa.Integer(), nullable=False, server_default='0', comment='User messages averaged into topic_centroid'))
+
+
+def downgrade():
+    op.drop_column('conversations', 'topic_message_count')
+    op.drop_column('conversations', 'topic_centroid')
@@ -5,12 +5,18 @@ from datetime import datetime
 import os
 import io
 import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from app.db import crud, models, schemas
 from app.db.database import get_db
 from app.utils.auth import get_admin_access
 from app.services.rag_service import RemoteVectorStoreManager
 from app.services.ingestion_service import DocumentIngestionService
+from app.services.admin_config_service import AdminConfigService
+from app.services.collection_sync_service import CollectionSyncService, content_hash
+from app.services.collection_rebuild_service import CollectionRebuildService
+from app.services.metrics import queued_ingestion
 from app.config import settings
 
 router = APIRouter(
@@ -23,6 +29,8 @@ vector_store_manager = RemoteVectorStoreManager(
     milvus_uri=settings.MILVUS_URI
 )
 ingestion_service = DocumentIngestionService()
+collection_sync_service = CollectionSyncService(ingestion_service, vector_store_manager)
+collection_rebuild_service = CollectionRebuildService(collection_sync_service, vector_store_manager)
 
 @router.get("/", response_model=List[schemas.CollectionWithFiles])
 async def list_all_collections(
@@ -84,6 +92,7 @@ async def create_admin_collection_with_files(
     description: Optional[str] = Form(None),
     file_ids: List[int] = Form(...),
     is_global_default: bool = Form(False),
+    sync_existing: bool = Form(False),
     current_user: models.User = Depends(get_admin_access),
     db: Session = Depends(get_db)
 ):
@@ -96,6 +105,8 @@ async def create_admin_collection_with_files(
         description: Optional collection description
         file_ids: List of file IDs from MinIO to include in the collection
         is_global_default: Whether to set this as the global default collection
+        sync_existing: If the collection already exists, incrementally sync it to
+            file_ids instead of failing (only new/removed files are processed)
     
     Returns:
         Collection details with processing status
@@ -103,6 +114,28 @@ async def create_admin_collection_with_files(
     try:
         # Check if collection with this name already exists
         existing_collection = crud.get_collection_by_name(db, name)
+        if existing_collection and sync_existing and existing_collection.is_admin_only:
+            try:
+                sync_summary = await asyncio.to_thread(
+                    collection_sync_service.sync_admin_collection, existing_collection.id, file_ids
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+            if is_global_default:
+                AdminConfigService.set_predefined_collection(db, name)
+            return {
+                "collection": {
+                    "id": existing_collection.id,
+                    "name": existing_collection.name,
+                    "description": existing_collection.description,
+                    "is_global_default": existing_collection.is_global_default,
+                    "created_at": existing_collection.created_at.isoformat()
+                },
+                "sync_summary": sync_summary,
+                "milvus_collection_name": sync_summary["milvus_collection_name"],
+                "message": f"Collection '{name}' synced: {len(sync_summary['added'])} added, "
+                           f"{len(sync_summary['updated'])} updated, {len(sync_summary['removed'])} removed"
+            }
         if existing_collection:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -164,6 +197,8 @@ async def create_admin_collection_with_files(
         
         from app.services.minio_service import MinioService
         minio_service = MinioService()
+        ocr_mode = AdminConfigService.get_pdf_ocr_mode(db)
+        table_mode = AdminConfigService.get_pdf_table_mode(db)
         
         for file in files_to_process:
             try:
@@ -185,6 +220,8 @@ async def create_admin_collection_with_files(
                     continue
                 
                 # Process file for vector storage
+                file_hash = content_hash(file_data.getvalue())
+                pdf_processing = {}
                 num_docs = ingestion_service.ingest_file_object(
                     file_obj=file_data,
                     filename=file.filename,
@@ -194,7 +231,10 @@ async def create_admin_collection_with_files(
                         "file_name": file.original_filename,
                         "collection_id": db_collection.id,
                         "collection_name": name
-                    }
+                    },
+                    ocr_mode=ocr_mode,
+                    table_mode=table_mode,
+                    processing_info=pdf_processing
                 )
                 
                 # Update file metadata
@@ -202,8 +242,10 @@ async def create_admin_collection_with_files(
                     "file_metadata": {
                         **(file.file_metadata or {}),
                         "is_processed_for_rag": True,
+                        "content_hash": file_hash,
                         "chunk_count": num_docs,
-                        "processed_at": datetime.utcnow().isoformat()
+                        "processed_at": datetime.utcnow().isoformat(),
+                        **({"pdf_processing": pdf_processing} if pdf_processing else {})
                     }
                 })
                 
@@ -253,7 +295,6 @@ async def create_admin_collection_with_files(
         
         # Update global default collection setting if requested
         if is_global_default:
-            from app.services.admin_config_service import AdminConfigService
             AdminConfigService.set_predefined_collection(db, name)
         
         return {
@@ -363,7 +404,6 @@ async def update_admin_collection(
     
     # If setting as global default, update admin config
     if collection_update.is_global_default and updated_collection.is_global_default:
-        from app.services.admin_config_service import AdminConfigService
         AdminConfigService.set_predefined_collection(db, updated_collection.name)
         print(f"Updated admin config: set '{updated_collection.name}' as global default collection")
     
@@ -499,8 +539,8 @@ async def get_milvus_collection_stats(
         # Connect to Milvus
         connections.connect(uri=settings.MILVUS_URI)
         
-        # Get list of collections
-        collections = utility.list_collections()
+        # Get list of collections (rebuilt collections by alias, without their generations)
+        collections = vector_store_manager.list_collections()
         
         # Get stats for each collection
         result = []
@@ -570,11 +610,15 @@ async def process_file_for_collection(db: Session, file_id: int, collection_name
             return
         
         # Process file for vector storage
+        pdf_processing = {}
         num_docs = ingestion_service.ingest_file_object(
             file_obj=file_data,
             filename=file.filename,
             collection_name=collection_name,
-            metadata={"source_file_id": file.id, "file_name": file.original_filename}
+            metadata={"source_file_id": file.id, "file_name": file.original_filename},
+            ocr_mode=AdminConfigService.get_pdf_ocr_mode(db),
+            table_mode=AdminConfigService.get_pdf_table_mode(db),
+            processing_info=pdf_processing
         )
         
         # Update file metadata
@@ -584,7 +628,8 @@ async def process_file_for_collection(db: Session, file_id: int, collection_name
                 "is_processed_for_rag": True,
                 "is_processing_for_rag": False,
                 "chunk_count": num_docs,
-                "processed_at": datetime.utcnow().isoformat()
+                "processed_at": datetime.utcnow().isoformat(),
+                **({"pdf_processing": pdf_processing} if pdf_processing else {})
             }
         })
         
@@ -623,6 +668,7 @@ async def upload_files_and_create_collection(
     description: Optional[str] = Form(None),
     files: List[UploadFile] = File(...),
     is_global_default: bool = Form(False),
+    sync_existing: bool = Form(False),
     background_tasks: BackgroundTasks = BackgroundTasks(),
     current_user: models.User = Depends(get_admin_access),
     db: Session = Depends(get_db)
@@ -636,6 +682,11 @@ async def upload_files_and_create_collection(
     3. File processing for RAG
     
     Returns immediately with pending status, all processing happens in background.
+    
+    With sync_existing=true and an existing admin collection, the uploads are merged
+    into it incrementally: files whose content is already in the collection are
+    skipped, a file replacing one with the same name and different content swaps it
+    out, and only the new content is processed.
     """
     try:
         # Basic validation only
@@ -653,7 +704,7 @@ async def upload_files_and_create_collection(
         
         # Check if collection with this name already exists
         existing_collection = crud.get_collection_by_name(db, name)
-        if existing_collection:
+        if existing_collection and not (sync_existing and existing_collection.is_admin_only):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Collection with name '{name}' already exists"
@@ -686,6 +737,21 @@ async def upload_files_and_create_collection(
             })
             await file.seek(0)  # Reset for potential reuse
         
+        if existing_collection:
+            background_tasks.add_task(
+                process_admin_collection_upload_sync,
+                collection_id=existing_collection.id,
+                file_data_list=file_data_list,
+                user_id=current_user.id
+            )
+            return {
+                "status": "processing",
+                "message": f"Syncing {len(files)} files into existing collection '{name}' in the background.",
+                "total_files": len(files),
+                "collection_name": name,
+                "note": "Use GET /api/admin/collections/status/{name} to check processing status"
+            }
+        
         # Schedule ALL operations in background task - no blocking operations here!
         background_tasks.add_task(
             process_admin_collection_creation,
@@ -837,22 +903,30 @@ async def process_admin_collection_creation(
             uploaded_files = await asyncio.to_thread(upload_files_sync)
             print(f"Uploaded {len(uploaded_files)} files to MinIO")
             
-            # Step 4: Process files for RAG (run in thread pool)
+            # Step 4: Process files for RAG (run in thread pool, up to INGESTION_MAX_CONCURRENCY files at once)
             def process_files_for_rag():
                 minio_service = MinioService()
-                processed_count = 0
+                ocr_mode = AdminConfigService.get_pdf_ocr_mode(db)
+                table_mode = AdminConfigService.get_pdf_table_mode(db)
+                collection_id = db_collection.id
+                file_ids = [file_info["db_file"].id for file_info in uploaded_files]
                 
-                for file_info in uploaded_files:
+                def process_single_file(file_id: int) -> bool:
+                    # Each worker uses its own session - Session objects are not thread-safe
+                    file_db = SessionLocal()
+                    db_file = None
                     try:
-                        db_file = file_info["db_file"]
+                        db_file = crud.get_file_storage(file_db, file_id)
                         
                         # Download file from MinIO
                         download_success, file_data = minio_service.download_file(db_file.file_path)
                         if not download_success:
                             print(f"Failed to download file {db_file.original_filename} from MinIO")
-                            continue
+                            return False
                         
                         # Process file for vector storage (synchronous)
+                        file_hash = content_hash(file_data.getvalue())
+                        pdf_processing = {}
                         num_docs = ingestion_service.ingest_file_object(
                             file_obj=file_data,
                             filename=db_file.original_filename,
@@ -860,37 +934,66 @@ async def process_admin_collection_creation(
                             metadata={
                                 "source_file_id": db_file.id,
                                 "file_name": db_file.original_filename,
-                                "collection_id": db_collection.id,
+                                "collection_id": collection_id,
                                 "collection_name": name
-                            }
+                            },
+                            ocr_mode=ocr_mode,
+                            table_mode=table_mode,
+                            processing_info=pdf_processing
                         )
                         
                         if num_docs > 0:
                             # Update file metadata
-                            crud.update_file_storage(db, db_file.id, {
+                            crud.update_file_storage(file_db, db_file.id, {
                                 "file_metadata": {
                                     **(db_file.file_metadata or {}),
                                     "is_processed_for_rag": True,
+                                    "content_hash": file_hash,
                                     "chunk_count": num_docs,
-                                    "processed_at": datetime.utcnow().isoformat()
+                                    "processed_at": datetime.utcnow().isoformat(),
+                                    **({"pdf_processing": pdf_processing} if pdf_processing else {})
                                 }
                             })
                             
                             # Update collection file record
-                            collection_files = crud.get_collection_files_by_file_id(db, db_file.id)
+                            collection_files = crud.get_collection_files_by_file_id(file_db, db_file.id)
                             for cf in collection_files:
-                                crud.update_collection_file(db, cf.id, schemas.CollectionFileUpdate(
+                                crud.update_collection_file(file_db, cf.id, schemas.CollectionFileUpdate(
                                     is_processed=True
                                 ))
                             
-                            processed_count += 1
                             print(f"Processed file {db_file.original_filename} - created {num_docs} chunks")
-                        else:
-                            print(f"Failed to process file {db_file.original_filename} - no chunks created")
-                            
+                            return True
+                        
+                        print(f"Failed to process file {db_file.original_filename} - no chunks created")
+                        return False
+                    
                     except Exception as e:
-                        print(f"Error processing file {file_info['original_filename']} for RAG: {e}")
-                        continue
+                        print(f"Error processing file {file_id} for RAG: {e}")
+                        
+                        # Update file metadata to indicate error
+                        try:
+                            file_db.rollback()
+                            if db_file is not None:
+                                crud.update_file_storage(file_db, file_id, {
+                                    "file_metadata": {
+                                        **(db_file.file_metadata or {}),
+                                        "processing_error": str(e),
+                                        "processed_at": datetime.utcnow().isoformat()
+                                    }
+                                })
+                        except:
+                            pass
+                        return False
+                    finally:
+                        file_db.close()
+                
+                processed_count = 0
+                with ThreadPoolExecutor(max_workers=settings.INGESTION_MAX_CONCURRENCY) as executor:
+                    futures = [executor.submit(queued_ingestion(process_single_file), file_id) for file_id in file_ids]
+                    for future in as_completed(futures):
+                        if future.result():
+                            processed_count += 1
                 
                 return processed_count
             
@@ -900,7 +1003,6 @@ async def process_admin_collection_creation(
             # Step 5: Set global default if requested (run in thread pool)
             if is_global_default:
                 def set_global_default():
-                    from app.services.admin_config_service import AdminConfigService
                     AdminConfigService.set_predefined_collection(db, name)
                 
                 await asyncio.to_thread(set_global_default)
@@ -927,6 +1029,78 @@ async def process_admin_collection_creation(
         import traceback
         traceback.print_exc()
 
+# Background task function for merging uploads into an existing admin collection
+async def process_admin_collection_upload_sync(collection_id: int, file_data_list: List[Dict], user_id: int):
+    """Upload new or changed files into an existing admin collection and sync its vectors."""
+    from app.db.database import SessionLocal
+    from app.services.minio_service import MinioService
+    from app.utils.string_utils import sanitize_collection_name
+    
+    def upload_changed_files():
+        db = SessionLocal()
+        try:
+            minio_service = MinioService()
+            collection_files = db.query(models.CollectionFile).filter(
+                models.CollectionFile.collection_id == collection_id
+            ).all()
+            existing_hashes = {
+                (cf.file.file_metadata or {}).get("content_hash")
+                for cf in collection_files if cf.file
+            }
+            files_by_name = {cf.file.original_filename: cf.file_id for cf in collection_files if cf.file}
+            
+            for file_data in file_data_list:
+                file_hash = content_hash(file_data["content"])
+                if file_hash in existing_hashes:
+                    print(f"Skipping {file_data['filename']} - identical content already in collection {collection_id}")
+                    continue
+                
+                timestamp = int(time.time())
+                safe_filename = f"{timestamp}_{sanitize_collection_name(file_data['filename'])}"
+                file_path = f"admin/{user_id}/{safe_filename}"
+                if not minio_service.upload_file(
+                    file_data=file_data["content"],
+                    file_path=file_path,
+                    content_type=file_data["content_type"]
+                ):
+                    print(f"Failed to upload file {file_data['filename']} to MinIO")
+                    continue
+                
+                db_file = crud.create_file_storage(db, schemas.FileStorageCreate(
+                    user_id=user_id,
+                    filename=safe_filename,
+                    original_filename=file_data["filename"],
+                    file_path=file_path,
+                    file_size=file_data["size"],
+                    mime_type=file_data["content_type"],
+                    file_metadata={"is_admin_upload": True, "content_hash": file_hash}
+                ))
+                
+                # A new version of a file with the same name replaces the old one
+                replaced_file_id = files_by_name.get(file_data["filename"])
+                if replaced_file_id is not None:
+                    crud.remove_file_from_collection(db, collection_id, replaced_file_id)
+                    print(f"File {file_data['filename']} replaces file {replaced_file_id} in collection {collection_id}")
+                
+                crud.add_file_to_collection(db, schemas.CollectionFileCreate(
+                    collection_id=collection_id,
+                    file_id=db_file.id
+                ))
+                existing_hashes.add(file_hash)
+                files_by_name[file_data["filename"]] = db_file.id
+        finally:
+            db.close()
+    
+    try:
+        await asyncio.to_thread(upload_changed_files)
+        summary = await asyncio.to_thread(collection_sync_service.sync_admin_collection, collection_id)
+        print(f"Synced uploads into collection {collection_id}: {len(summary['added'])} added, "
+              f"{len(summary['removed'])} removed, {summary['unchanged']} unchanged, {len(summary['failed'])} failed")
+    except Exception as e:
+        print(f"Error syncing uploads into collection {collection_id}: {str(e)}")
+        import traceback
+        traceback.print_exc()
+
 # Background task function for admin file processing (kept for backwards compatibility)
 async def process_admin_file_for_rag(db_file_id: int, collection_name: str, db_conn_string: str, metadata: dict):
     """Background task to process an admin uploaded file for RAG."""
@@ -961,12 +1135,19 @@ async def process_admin_file_for_rag(db_file_id: int, collection_name: str, db_c
             
             # Initialize ingestion service and process file
             # Use asyncio.to_thread to avoid blocking the event loop
+            pdf_processing = {}
+            ocr_mode = AdminConfigService.get_pdf_ocr_mode(db)
+            table_mode = AdminConfigService.get_pdf_table_mode(db)
+            
             def process_file_sync():
                 return ingestion_service.ingest_file_object(
                     file_obj=file_data,
                     filename=file.original_filename,
                     collection_name=collection_name,
-                    metadata=metadata
+                    metadata=metadata,
+                    ocr_mode=ocr_mode,
+                    table_mode=table_mode,
+                    processing_info=pdf_processing
                 )
             
             # Run the synchronous operation in a thread pool
@@ -979,7 +1160,8 @@ async def process_admin_file_for_rag(db_file_id: int, collection_name: str, db_c
                         **(file.file_metadata or {}),
                         "is_processed_for_rag": True,
                         "chunk_count": num_docs,
-                        "processed_at": datetime.utcnow().isoformat()
+                        "processed_at": datetime.utcnow().isoformat(),
+                        **({"pdf_processing": pdf_processing} if pdf_processing else {})
                     }
                 })
                 
@@ -1180,4 +1362,122 @@ async def get_admin_collection_processing_status(
             "status": "error",
             "message": f"Error checking processing status: {str(e)}",
             "files": []
-        }
\ No newline at end of file
+        }
+
+@router.post("/{collection_id}/sync", response_model=Dict[str, Any])
+async def sync_admin_collection(
+    collection_id: int,
+    file_ids: Optional[List[int]] = Form(None),
+    current_user: models.User = Depends(get_admin_access),
+    db: Session = Depends(get_db)
+):
+    """
+    Incrementally sync an admin collection's vectors with its files.
+    
+    Compares the collection's files (with content hashes) against what is stored in
+    Milvus: new files are ingested, chunks of removed files are deleted by
+    source_file_id, changed files are re-ingested and unchanged files are left alone.
+    
+    Args:
+        collection_id: ID of the collection
+        file_ids: Optional desired file set; when given the collection's files are
+            set to exactly these before syncing
+    
+    Returns:
+        Sync summary
+    """
+    db_collection = crud.get_collection(db, collection_id)
+    if not db_collection:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Collection with ID {collection_id} not found"
+        )
+    if not db_collection.is_admin_only:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="This is not an admin collection"
+        )
+    
+    try:
+        return await asyncio.to_thread(collection_sync_service.sync_admin_collection, collection_id, file_ids)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except Exception as e:
+        print(f"Error syncing collection {collection_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to sync collection: {str(e)}"
+        )
+
+async def run_collection_rebuild(collection_id: int, allow_partial: bool):
+    """Background task running a blue/green rebuild of an admin collection."""
+    try:
+        summary = await asyncio.to_thread(
+            collection_rebuild_service.rebuild_admin_collection, collection_id, allow_partial
+        )
+        print(f"Rebuild of collection {collection_id} finished: {summary['status']}, "
+              f"live collection: {summary.get('live_collection')}")
+    except Exception as e:
+        print(f"Error rebuilding collection {collection_id}: {str(e)}")
+        import traceback
+        traceback.print_exc()
+
+@router.post("/{collection_id}/rebuild", response_model=Dict[str, Any])
+async def rebuild_admin_collection(
+    collection_id: int,
+    background_tasks: BackgroundTasks,
+    allow_partial: bool = Query(False, description="Swap in the new generation even if some files failed"),
+    current_user: models.User = Depends(get_admin_access),
+    db: Session = Depends(get_db)
+):
+    """
+    Rebuild an admin collection with zero downtime (blue/green).
+    
+    All files are ingested into a new shadow generation which is indexed and loaded
+    before the admin_<name> alias used for retrieval is atomically switched to it.
+    Conversations keep using the current generation until the switch, so the global
+    collection is never served half-populated and linked conversations stay valid.
+    """
+    db_collection = crud.get_collection(db, collection_id)
+    if not db_collection:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Collection with ID {collection_id} not found"
+        )
+    if not db_collection.is_admin_only:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="This is not an admin collection"
+        )
+    
+    background_tasks.add_task(run_collection_rebuild, collection_id, allow_partial)
+    
+    from app.utils.string_utils import sanitize_collection_name
+    alias = sanitize_collection_name(f"admin_{db_collection.name}")
+    return {
+        "status": "processing",
+        "collection_id": collection_id,
+        "alias": alias,
+        "message": f"Rebuild of '{db_collection.name}' started. The new generation goes live once fully indexed.",
+        "note": f"Use GET /api/admin/collections/{collection_id}/generations to see the live generation"
+    }
+
+@router.get("/{collection_id}/generations", response_model=Dict[str, Any])
+async def get_admin_collection_generations(
+    collection_id: int,
+    current_user: models.User = Depends(get_admin_access),
+    db: Session = Depends(get_db)
+):
+    """
+    Show which blue/green generation of an admin collection is live.
+    """
+    db_collection = crud.get_collection(db, collection_id)
+    if not db_collection:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Collection with ID {collection_id} not found"
+        )
+    
+    from app.utils.string_utils import sanitize_collection_name
+    alias = sanitize_collection_name(f"admin_{db_collection.name}")
+    return await asyncio.to_thread(collection_rebuild_service.get_status, alias)
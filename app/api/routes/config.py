@@ -269,6 +269,50 @@ async def set_global_collection_behavior(
         "message": f"Global collection behavior set to '{behavior}'"
     }
 
+@router.get("/pdf-processing", response_model=Dict[str, str])
+async def get_pdf_processing_modes(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_admin_access)
+):
+    """
+    Get the OCR and table structure policies used for PDF ingestion.
+    Each policy is one of 'off', 'auto' or 'force'.
+    """
+    return {
+        "ocr_mode": AdminConfigService.get_pdf_ocr_mode(db),
+        "table_mode": AdminConfigService.get_pdf_table_mode(db)
+    }
+
+@router.put("/pdf-processing", response_model=Dict[str, str])
+async def set_pdf_processing_modes(
+    request_body: Dict[str, str] = Body(...),
+    current_user: models.User = Depends(get_admin_access),
+    db: Session = Depends(get_db)
+):
+    """
+    Set the OCR and table structure policies used for PDF ingestion.
+    Admin users only.
+
+    Args:
+        request_body: JSON body with {"ocr_mode": "off|auto|force", "table_mode": "off|auto|force"}
+            (either key may be omitted)
+
+    'auto' OCR skips OCR on PDFs whose pages all carry a text layer and only OCRs
+    bitmap regions otherwise; 'auto' tables use the fast TableFormer model on
+    born-digital PDFs and the accurate one when OCR is required.
+    """
+    try:
+        return AdminConfigService.set_pdf_processing_modes(
+            db,
+            ocr_mode=request_body.get("ocr_mode"),
+            table_mode=request_body.get("table_mode")
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
 @router.get("/{category}", response_model=Dict[str, Any])
 async def get_category_config(
     category: str,
@@ -1,5 +1,5 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks, Request
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
@@ -9,14 +9,23 @@ from app.utils.auth import get_current_user, get_admin_access
 from app.services.rag_service import RagChatService
 from app.config import settings
 from app.utils.string_utils import sanitize_collection_name
+from app.utils.stream_encoding import coalesce_chunks
+from app.services.stream_cancellation import stop_on_disconnect
 
 router = APIRouter()
 
+
 # Initialize the RAG service
 rag_service = RagChatService(
     milvus_uri=settings.MILVUS_URI
 )
 
+
+def stream_chunks(http_request: Request, chunks, per_token: bool = False):
+    """Stop streamed text when the client disconnects and pass it through as is or merged into larger writes."""
+    chunks = stop_on_disconnect(http_request, chunks)
+    return chunks if per_token else coalesce_chunks(chunks)
+
 @router.get("/collections", response_model=schemas.CollectionsResponse, operation_id="api_rag_list_collections")
 async def list_collections(
     current_user: models.User = Depends(get_current_user),
@@ -112,6 +121,7 @@ async def rag_chat(
 @router.post("/chat/stream", operation_id="api_rag_stream_chat_with_collection")
 async def stream_rag_chat(
     request: schemas.RagChatRequest,
+    http_request: Request,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -136,13 +146,17 @@ async def stream_rag_chat(
         
         # Create streaming response
         return StreamingResponse(
-            rag_service.get_streaming_rag_response(
-                db=db,
-                user_id=current_user.id,
-                message=request.message,
-                collection_name=request.collection_name,
-                conversation_id=request.conversation_id,
-                meta_data=request.meta_data
+            stream_chunks(
+                http_request,
+                rag_service.get_streaming_rag_response(
+                    db=db,
+                    user_id=current_user.id,
+                    message=request.message,
+                    collection_name=request.collection_name,
+                    conversation_id=request.conversation_id,
+                    meta_data=request.meta_data
+                ),
+                per_token=request.per_token_frames
             ),
             media_type="text/event-stream"
         )
@@ -288,6 +302,7 @@ async def conversation_rag_chat(
 @router.post("/chat/conversation/stream", operation_id="api_rag_stream_chat_with_conversation")
 async def stream_conversation_rag_chat(
     request: schemas.ConversationRagChatRequest,
+    http_request: Request,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -312,12 +327,16 @@ async def stream_conversation_rag_chat(
         
         # Create streaming response
         return StreamingResponse(
-            rag_service.get_streaming_conversation_rag_response(
-                db=db,
-                user_id=current_user.id,
-                message=request.message,
-                conversation_id=request.conversation_id,
-                meta_data=request.meta_data
+            stream_chunks(
+                http_request,
+                rag_service.get_streaming_conversation_rag_response(
+                    db=db,
+                    user_id=current_user.id,
+                    message=request.message,
+                    conversation_id=request.conversation_id,
+                    meta_data=request.meta_data
+                ),
+                per_token=request.per_token_frames
             ),
             media_type="text/event-stream"
         )
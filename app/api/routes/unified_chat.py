@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, File, Form, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, File, Form, UploadFile, WebSocket, WebSocketDisconnect, Request
 from fastapi.responses import StreamingResponse, JSONResponse
 from typing import List, Dict, Any, Optional, Union
 from sqlalchemy.orm import Session
@@ -17,18 +17,24 @@ from sqlalchemy.orm import sessionmaker
 import os
 
 from app.utils.auth import get_current_active_user
-from app.db import models, schemas, crud
+from app.db import models, schemas, crud, async_crud
 from app.services.llm_service import get_llm_response, get_streaming_llm_response, generate_conversation_headline
 from app.services.rag_service import RagChatService, RemoteVectorStoreManager
 from app.services.minio_service import MinioService
-from app.services.title_service import TitleGenerationService
-from app.db.database import get_db
+from app.services.title_service import TitleGenerationService, TitleUpdateScheduler
+from app.db.database import get_db, SessionLocal, AsyncSessionLocal
 from app.config import settings
 from app.utils.infinity_embedder import InfinityEmbedder
 from app.services.ingestion_service import DocumentIngestionService
 from app.utils.string_utils import sanitize_collection_name, conversation_collection_name, sanitize_filename
+from app.utils.stream_encoding import ndjson_frame, token_frames
 from app.services.admin_config_service import AdminConfigService
 from app.services.rag_config_service import RAGConfigService
+from app.services.notification_service import file_event_broker, notify_file_event
+from app.services.conversation_summary_service import ConversationSummaryService
+from app.services.stream_cancellation import stop_on_disconnect
+from app.services.answer_stream_service import answer_stream_service, StreamExpired
+from app.services.tracing import current_timings
 
 """
 Unified Chat API
@@ -66,7 +72,9 @@ Each file is tied to the conversation and stored in MinIO, with its vector repre
 
 router = APIRouter()
 
-# WebSocket connection manager for file processing notifications
+# WebSocket connection manager for file processing notifications.
+# Events themselves arrive through file_event_broker (Postgres LISTEN/NOTIFY), so they
+# reach the socket regardless of which worker processed the file.
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Dict[str, List[WebSocket]] = {}
@@ -79,21 +87,16 @@ class ConnectionManager:
     
     def disconnect(self, websocket: WebSocket, conversation_id: str):
         if conversation_id in self.active_connections:
-            self.active_connections[conversation_id].remove(websocket)
+            if websocket in self.active_connections[conversation_id]:
+                self.active_connections[conversation_id].remove(websocket)
             if not self.active_connections[conversation_id]:
                 del self.active_connections[conversation_id]
-    
-    async def send_message(self, message: dict, conversation_id: str):
-        if conversation_id in self.active_connections:
-            for connection in self.active_connections[conversation_id]:
-                try:
-                    await connection.send_text(json.dumps(message))
-                except:
-                    # Remove dead connections
-                    self.active_connections[conversation_id].remove(connection)
 
 manager = ConnectionManager()
 
+# Seconds between SSE keepalive comments while waiting for file events
+SSE_KEEPALIVE_SECONDS = 15
+
 # Initialize services
 rag_service = RagChatService(
     milvus_uri=settings.MILVUS_URI
@@ -107,7 +110,8 @@ ingestion_service = DocumentIngestionService()
 # Define the UnifiedChatRequest schema here if it's not in schemas.py
 class UnifiedChatRequest(schemas.ChatRequest):
     """Simplified unified schema for chat - collections and files are auto-bound."""
-    pass  # All needed fields are in the base ChatRequest
+    # Streaming only: send every token in its own frame instead of coalescing them
+    per_token_frames: bool = False
 
 # Define the UnifiedChatResponse schema here if it's not in schemas.py
 class UnifiedChatResponse(schemas.ChatResponse):
@@ -273,7 +277,6 @@ async def unified_chat(
             # Add background task to update the conversation title based on the new message
             background_tasks.add_task(
                 process_title_update,
-                db_conn_string=settings.DATABASE_URL,
                 conversation_id=conversation_id,
                 user_message=request.message
             )
@@ -318,6 +321,7 @@ async def unified_chat(
                 content=response
             )
             crud.create_message(db, assistant_message)
+            ConversationSummaryService.schedule_update(conversation_id)
             
             # Check if messages were created
             messages = crud.get_conversation_messages(db, conversation_id)
@@ -326,7 +330,6 @@ async def unified_chat(
             # Add background task to update the conversation title based on the new message
             background_tasks.add_task(
                 process_title_update,
-                db_conn_string=settings.DATABASE_URL,
                 conversation_id=conversation_id,
                 user_message=request.message
             )
@@ -367,7 +370,6 @@ async def unified_chat(
             # Add background task to update the conversation title based on the new message
             background_tasks.add_task(
                 process_title_update,
-                db_conn_string=settings.DATABASE_URL,
                 conversation_id=conversation_id,
                 user_message=request.message
             )
@@ -395,17 +397,62 @@ async def unified_chat(
             used_rag=False
         )
 
+def resolve_global_collection(conversation_id: str):
+    """
+    Resolve the Milvus collection of a global collection conversation.
+
+    Runs in a worker thread with its own session, so the stream route doesn't
+    block the event loop on these queries. An outdated conversation is moved to
+    the current global collection when the behavior setting is auto_update.
+
+    Args:
+        conversation_id: ID of the conversation
+
+    Returns:
+        Tuple of the behavior setting (None if the collection is current) and the
+        Milvus collection name (None if no collection is linked)
+    """
+    behavior = None
+    with SessionLocal() as db:
+        conversation = crud.get_conversation(db, conversation_id)
+        # Check if the global collection has changed and handle based on behavior setting
+        if crud.is_global_collection_outdated(db, conversation_id):
+            behavior = AdminConfigService.get_config(db, models.AdminConfig.KEY_GLOBAL_COLLECTION_BEHAVIOR, "auto_update")
+            
+            if behavior == "auto_update":
+                # Auto-update the conversation to use the current global collection
+                updated_conversation = crud.update_conversation_to_current_global_collection(db, conversation_id)
+                if updated_conversation:
+                    conversation = updated_conversation
+                    print(f"DEBUG: Auto-updated conversation {conversation_id} to current global collection")
+        
+        # Use the linked global collection (read while the session is open)
+        collection = conversation.linked_global_collection if conversation else None
+        if not collection:
+            return behavior, None
+        # Add admin prefix for global collections since they're stored with admin prefix in Milvus
+        return behavior, f"admin_{collection.name}"
+
 @router.post("/stream")
 async def unified_stream_chat(
     request: UnifiedChatRequest,
+    http_request: Request,
     background_tasks: BackgroundTasks,
-    current_user: schemas.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: schemas.User = Depends(get_current_active_user)
 ):
     """
     Simplified unified streaming chat endpoint.
     Collections and files are auto-bound through conversation initiation and upload processes.
+
+    Database sessions are opened in short scopes instead of through request
+    dependencies, so no pooled connection is held while the answer streams.
+    The answer is generated into a resumable buffer identified by the X-Stream-ID
+    header; if the client does not reconnect within the grace period, generation
+    stops and the partial answer is saved as truncated.
     """
+    # ID under which the answer can be resumed, see resume_stream_chat
+    stream_id = answer_stream_service.new_stream_id()
+    
     # Process the conversation ID
     conversation_id = request.conversation_id
     if not conversation_id or conversation_id == "string":
@@ -419,108 +466,106 @@ async def unified_stream_chat(
     
     # Get the conversation if it exists
     conversation = None
-    if conversation_id:
-        conversation = crud.get_conversation(db, conversation_id)
-    
-    # Handle conversation type-based logic
-    if conversation and conversation.conversation_type == models.ConversationType.GLOBAL_COLLECTION:
-        # Check if the global collection has changed and handle based on behavior setting
-        if crud.is_global_collection_outdated(db, conversation_id):
-            from app.services.admin_config_service import AdminConfigService
-            behavior = AdminConfigService.get_config(db, models.AdminConfig.KEY_GLOBAL_COLLECTION_BEHAVIOR, "auto_update")
+    conversation_type = None
+    collection_name = None
+    async with AsyncSessionLocal() as adb:
+        if conversation_id:
+            conversation = await async_crud.get_conversation(adb, conversation_id)
+        if conversation:
+            conversation_type = conversation.conversation_type
+        
+        # Handle conversation type-based logic
+        if conversation_type == models.ConversationType.GLOBAL_COLLECTION:
+            behavior, collection_name = await asyncio.to_thread(resolve_global_collection, conversation_id)
             
             if behavior == "readonly_on_change":
                 return StreamingResponse(
                     generate_error_stream("The knowledge base has been updated. This conversation is now read-only. Please start a new conversation or migrate to the current knowledge base."),
                     media_type="application/x-ndjson"
                 )
-            elif behavior == "auto_update":
-                # Auto-update the conversation to use the current global collection
-                updated_conversation = crud.update_conversation_to_current_global_collection(db, conversation_id)
-                if updated_conversation:
-                    conversation = updated_conversation
-                    print(f"DEBUG: Auto-updated conversation {conversation_id} to current global collection")
-        
-        # Use the linked global collection
-        collection = conversation.linked_global_collection
-        if not collection:
-            return StreamingResponse(
-                generate_error_stream("The linked global collection was not found."),
-                media_type="application/x-ndjson"
-            )
-        # Add admin prefix for global collections since they're stored with admin prefix in Milvus
-        collection_name = f"admin_{collection.name}"
-        
-    
-    # Check if files are still processing before starting the stream
-    if conversation and conversation.conversation_type == models.ConversationType.USER_FILES:
-        # Get files attached to this conversation
-        conversation_files = crud.get_conversation_files(db, conversation_id)
+            if not collection_name:
+                return StreamingResponse(
+                    generate_error_stream("The linked global collection was not found."),
+                    media_type="application/x-ndjson"
+                )
         
-        # Check if any files are still being processed
-        files_processing = False
-        for file in conversation_files:
-            if file.file_metadata is None or not file.file_metadata.get("is_processed_for_rag", False):
-                # File exists but hasn't been processed yet
-                files_processing = True
-                break
-        
-        # If files are still processing, return a message
-        if files_processing:
-            return StreamingResponse(
-                generate_error_stream("Files are still being processed. Please wait a moment before chatting."),
-                media_type="application/x-ndjson"
-            )
+        # Check if files are still processing before starting the stream
+        if conversation_type == models.ConversationType.USER_FILES:
+            # Get files attached to this conversation
+            conversation_files = await async_crud.get_conversation_files(adb, conversation_id)
+            
+            # Check if any files are still being processed
+            files_processing = False
+            for file in conversation_files:
+                if file.file_metadata is None or not file.file_metadata.get("is_processed_for_rag", False):
+                    # File exists but hasn't been processed yet
+                    files_processing = True
+                    break
+            
+            # If files are still processing, return a message
+            if files_processing:
+                return StreamingResponse(
+                    generate_error_stream("Files are still being processed. Please wait a moment before chatting."),
+                    media_type="application/x-ndjson"
+                )
     
     async def stream_response():
+        db = None
         try:
-            # Get or create conversation first to get the conversation_id
-            db_conversation = None
-            if conversation_data["id"]:
-                db_conversation = crud.get_conversation(db, conversation_data["id"])
-            
-            # If conversation doesn't exist, create a new one
-            if not db_conversation:
-                # Create a new conversation
-                db_conversation = crud.create_conversation(db, current_user.id, request.meta_data)
-                conversation_data["id"] = db_conversation.id
+            async with AsyncSessionLocal() as adb:
+                # Get or create conversation first to get the conversation_id
+                db_conversation = None
+                if conversation_data["id"]:
+                    db_conversation = await async_crud.get_conversation(adb, conversation_data["id"])
+                
+                # If conversation doesn't exist, create a new one
+                if not db_conversation:
+                    # Create a new conversation
+                    db_conversation = await async_crud.create_conversation(adb, current_user.id, request.meta_data)
+                    conversation_data["id"] = db_conversation.id
+                
+                # NOTE: Save user message once here rather than in each service function
+                user_message = schemas.MessageCreate(
+                    conversation_id=conversation_data["id"],
+                    role="user",
+                    content=request.message
+                )
+                await async_crud.create_message(adb, user_message)
+                
+                conversation_files = []
+                if conversation_type == models.ConversationType.USER_FILES:
+                    conversation_files = await async_crud.get_conversation_files(adb, conversation_data["id"])
             
-            # NOTE: Save user message once here rather than in each service function
-            user_message = schemas.MessageCreate(
-                conversation_id=conversation_data["id"],
-                role="user",
-                content=request.message
-            )
-            crud.create_message(db, user_message)
+            # The services release this session's connection before the LLM streams
+            db = SessionLocal()
             
             # Add background task to generate/update the conversation title based on the new message
             background_tasks.add_task(
                 process_title_update,
-                db_conn_string=settings.DATABASE_URL,
                 conversation_id=conversation_data["id"],
                 user_message=request.message
             )
             
             # Scenario 1: RAG with admin collection
-            if conversation and conversation.conversation_type == models.ConversationType.GLOBAL_COLLECTION and collection_name:
+            if conversation_type == models.ConversationType.GLOBAL_COLLECTION and collection_name:
                 conversation_data["used_rag"] = True
                 
                 # Check if collection exists
                 available_collections = rag_service.list_available_collections()
                 if collection_name not in available_collections:
-                    yield json.dumps({
+                    yield ndjson_frame({
                         "status": "error",
                         "message": f"Collection '{collection_name}' not found. Available collections: {', '.join(available_collections)}"
-                    }) + "\n"
+                    })
                     return
                 
                 # Use RAG with streaming
                 try:
                     # Initial message
-                    yield json.dumps({
+                    yield ndjson_frame({
                         "status": "info",
                         "message": "Using RAG with collection: " + collection_name
-                    }) + "\n"
+                    })
                     
                     # Get streaming response from RAG service - don't save user message again
                     stream_gen = rag_service.get_streaming_rag_response(
@@ -530,34 +575,38 @@ async def unified_stream_chat(
                         collection_name=collection_name,
                         conversation_id=conversation_data["id"],
                         meta_data=request.meta_data,
-                        save_user_message=False  # We already saved it
+                        save_user_message=False,  # We already saved it
+                        stream_id=stream_id
                     )
                     
-                    # Handle the async generator
-                    async for chunk in stream_gen:
-                        yield json.dumps({
-                            "status": "token",
-                            "token": chunk
-                        }) + "\n"
+                    # Generate in the background so the client can reconnect and resume
+                    answer = start_answer_stream(stream_id, conversation_data["id"], current_user.id, stream_gen, db)
+                    db = None  # Closed by the answer stream
+                    
+                    # Coalesce tokens into frames unless the client asked for one frame per token
+                    async for frame in token_frames(stop_on_disconnect(http_request, answer.iter_from()),
+                                                    per_token=request.per_token_frames, offset=0):
+                        yield frame
                     
                     # Send final message with metadata
-                    yield json.dumps({
+                    yield ndjson_frame({
                         "status": "done",
                         "conversation_id": conversation_data["id"],
-                        "used_rag": True
-                    }) + "\n"
+                        "stream_id": stream_id,
+                        "used_rag": True,
+                        # Stage timings, including generation (the Server-Timing header is sent before it)
+                        "timings": current_timings()
+                    })
                     
                 except Exception as e:
-                    yield json.dumps({
+                    yield ndjson_frame({
                         "status": "error",
                         "message": f"Error in RAG response: {str(e)}"
-                    }) + "\n"
+                    })
                 
             else:
                 # Scenario 2: Check for files attached to conversation
-                conversation_files = crud.get_conversation_files(db, conversation_data["id"])
-                
-                if conversation_files and conversation and conversation.conversation_type == models.ConversationType.USER_FILES:
+                if conversation_files and conversation_type == models.ConversationType.USER_FILES:
                     conversation_data["used_rag"] = True
                     
                     # Create a temporary collection for this conversation
@@ -571,19 +620,19 @@ async def unified_stream_chat(
                             break
                     
                     if not all_processed:
-                        yield json.dumps({
+                        yield ndjson_frame({
                             "status": "error",
                             "message": "Some files are still being processed. Please wait a moment before chatting."
-                        }) + "\n"
+                        })
                         return
                     
                     # Use conversation-based RAG with streaming
                     try:
                         # Initial message
-                        yield json.dumps({
+                        yield ndjson_frame({
                             "status": "info",
                             "message": "Using conversation files for RAG"
-                        }) + "\n"
+                        })
                         
                         # Get streaming response from conversation RAG - don't save user message again
                         stream_gen = rag_service.get_streaming_conversation_rag_response(
@@ -592,28 +641,33 @@ async def unified_stream_chat(
                             query=request.message,
                             user_id=current_user.id,
                             conversation_collection=temp_collection_name,
-                            save_user_message=False  # We already saved it
+                            save_user_message=False,  # We already saved it
+                            stream_id=stream_id
                         )
                         
-                        # Since this is an async generator, we need to iterate through it with async for
-                        async for chunk in stream_gen:
-                            yield json.dumps({
-                                "status": "token",
-                                "token": chunk
-                            }) + "\n"
+                        # Generate in the background so the client can reconnect and resume
+                        answer = start_answer_stream(stream_id, conversation_data["id"], current_user.id, stream_gen, db)
+                        db = None  # Closed by the answer stream
+                        
+                        # Coalesce tokens into frames unless the client asked for one frame per token
+                        async for frame in token_frames(stop_on_disconnect(http_request, answer.iter_from()),
+                                                        per_token=request.per_token_frames, offset=0):
+                            yield frame
                         
                         # Send final message with metadata
-                        yield json.dumps({
+                        yield ndjson_frame({
                             "status": "done",
                             "conversation_id": conversation_data["id"],
-                            "used_rag": True
-                        }) + "\n"
+                            "stream_id": stream_id,
+                            "used_rag": True,
+                            "timings": current_timings()
+                        })
                         
                     except Exception as e:
-                        yield json.dumps({
+                        yield ndjson_frame({
                             "status": "error",
                             "message": f"Error in conversation RAG response: {str(e)}"
-                        }) + "\n"
+                        })
                     
                 else:
                     # Scenario 3: Regular chat (no RAG) - don't save user message again
@@ -623,55 +677,111 @@ async def unified_stream_chat(
                         message=request.message,
                         conversation_id=conversation_data["id"],
                         meta_data=request.meta_data,
-                        save_user_message=False  # We already saved it
+                        save_user_message=False,  # We already saved it
+                        stream_id=stream_id
                     )
                     
-                    # Handle the async generator
-                    async for chunk in stream_gen:
-                        yield json.dumps({
-                            "status": "token",
-                            "token": chunk
-                        }) + "\n"
+                    # Generate in the background so the client can reconnect and resume
+                    answer = start_answer_stream(stream_id, conversation_data["id"], current_user.id, stream_gen, db)
+                    db = None  # Closed by the answer stream
+                    
+                    # Coalesce tokens into frames unless the client asked for one frame per token
+                    async for frame in token_frames(stop_on_disconnect(http_request, answer.iter_from()),
+                                                    per_token=request.per_token_frames, offset=0):
+                        yield frame
                     
                     # Send final message with metadata
-                    yield json.dumps({
+                    yield ndjson_frame({
                         "status": "done",
                         "conversation_id": conversation_data["id"],
-                        "used_rag": False
-                    }) + "\n"
+                        "stream_id": stream_id,
+                        "used_rag": False,
+                        "timings": current_timings()
+                    })
                 
         except Exception as e:
             # Log the exception
             print(f"Error in stream_response: {str(e)}")
             
             # Return error to client
-            yield json.dumps({
+            yield ndjson_frame({
                 "status": "error",
                 "message": f"Error: {str(e)}"
-            }) + "\n"
+            })
+        finally:
+            if db is not None:
+                db.close()
     
     # Return streaming response
     return StreamingResponse(
         stream_response(),
-        media_type="application/x-ndjson"
+        media_type="application/x-ndjson",
+        headers={"X-Stream-ID": stream_id}
     )
 
-# Helper function to process title updates in background
-async def process_title_update(db_conn_string: str, conversation_id: str, user_message: str):
-    """Background task to process title updates for conversations."""
-    try:
-        # Create a new database session for this background task
-        engine = create_engine(db_conn_string)
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-        db = SessionLocal()
-        
+@router.get("/stream/{stream_id}")
+async def resume_stream_chat(
+    stream_id: str,
+    http_request: Request,
+    offset: int = 0,
+    per_token_frames: bool = False,
+    current_user: schemas.User = Depends(get_current_active_user)
+):
+    """
+    Resume a streamed answer after a dropped connection.
+    
+    Sends the answer from a character offset (the "offset" of the last token frame
+    received), following the generation if it is still running or replaying the
+    saved answer otherwise. Never starts a new generation.
+    """
+    stream = answer_stream_service.get(stream_id)
+    if stream is not None and stream.user_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Stream not found")
+    
+    async def resume_response():
+        try:
+            chunks = answer_stream_service.read(stream_id, current_user.id, offset=max(0, offset))
+            async for frame in token_frames(stop_on_disconnect(http_request, chunks),
+                                            per_token=per_token_frames, offset=max(0, offset)):
+                yield frame
+            
+            yield ndjson_frame({
+                "status": "done",
+                "stream_id": stream_id
+            })
+        except (StreamExpired, PermissionError):
+            yield ndjson_frame({
+                "status": "error",
+                "message": "Stream not found or expired. Reload the conversation to get the answer."
+            })
+        except Exception as e:
+            yield ndjson_frame({
+                "status": "error",
+                "message": f"Error: {str(e)}"
+            })
+    
+    return StreamingResponse(
+        resume_response(),
+        media_type="application/x-ndjson",
+        headers={"X-Stream-ID": stream_id}
+    )
+
+def start_answer_stream(stream_id: str, conversation_id: str, user_id: int, stream_gen, db: Session):
+    """Generate an answer into a resumable buffer, closing its session when generation ends."""
+    async def chunks():
         try:
-            # Process the message using our title service
-            await TitleGenerationService.process_new_message(db, conversation_id, user_message)
+            async for chunk in stream_gen:
+                yield chunk
         finally:
             db.close()
-    except Exception as e:
-        print(f"Error processing title update: {str(e)}")
+    
+    return answer_stream_service.start(stream_id, conversation_id, user_id, chunks())
+
+
+# Helper function to process title updates in background
+async def process_title_update(conversation_id: str, user_message: str):
+    """Background task to schedule a debounced title update for a conversation."""
+    TitleUpdateScheduler.schedule(conversation_id, user_message)
 
 # Helper function for processing files
 async def process_file_for_rag(db: Session, file_id: str, collection_name: str):
@@ -691,11 +801,15 @@ async def process_file_for_rag(db: Session, file_id: str, collection_name: str):
         safe_collection_name = sanitize_collection_name(collection_name)
         
         # Process file for vector storage
+        pdf_processing = {}
         num_docs = ingestion_service.ingest_file_object(
             file_obj=file_data,
             filename=file.filename,
             collection_name=safe_collection_name,
-            metadata={"source_file_id": file.id, "file_name": file.original_filename}
+            metadata={"source_file_id": file.id, "file_name": file.original_filename},
+            ocr_mode=AdminConfigService.get_pdf_ocr_mode(db),
+            table_mode=AdminConfigService.get_pdf_table_mode(db),
+            processing_info=pdf_processing
         )
         
         # Update file metadata
@@ -704,7 +818,8 @@ async def process_file_for_rag(db: Session, file_id: str, collection_name: str):
                 **(file.file_metadata or {}),
                 "is_processed_for_rag": True,
                 "chunk_count": num_docs,
-                "processed_at": datetime.utcnow().isoformat()
+                "processed_at": datetime.utcnow().isoformat(),
+                **({"pdf_processing": pdf_processing} if pdf_processing else {})
             }
         })
         
@@ -1088,10 +1203,10 @@ async def system_health_check():
     # Check Milvus
     try:
         connections.connect(uri=settings.MILVUS_URI)
-        collections = utility.list_collections()
+        utility.list_collections()
         health["components"]["milvus"] = {
             "status": "healthy", 
-            "collections": collections
+            "collections": vector_store_manager.list_collections()
         }
     except Exception as e:
         health["components"]["milvus"] = {
@@ -1166,6 +1281,7 @@ async def upload_file(
 ):
     """
     Upload up to 3 files and process them for RAG.
+    Files are processed concurrently, up to INGESTION_MAX_CONCURRENCY at a time.
     
     - conversation_id: Required - The conversation to attach these files to
     - sync_processing: If True (default), wait for processing to complete before returning
@@ -1203,6 +1319,7 @@ async def upload_file(
             )
         
         result = []
+        pending_files = []  # (result index, db_file) of uploaded files awaiting RAG processing
         supported_extensions = ['.pdf', '.txt', '.doc', '.docx', '.csv', '.md']
         max_file_size = 10 * 1024 * 1024  # 10MB
         
@@ -1273,61 +1390,80 @@ async def upload_file(
                 )
             )
             
-            # Process files based on sync_processing flag
-            if sync_processing and is_supported_type:
-                # Process synchronously - wait for completion
-                try:
-                    # Create collection name for this conversation
-                    collection_name = conversation_collection_name(conversation_id)
-                    
-                    # Process the file synchronously
-                    success = await process_file_sync(
-                        db_file_id=db_file.id,
+            # Reserve the result slot; processing happens below for all files at once
+            result.append(None)
+            pending_files.append((len(result) - 1, db_file))
+        
+        # Process files based on sync_processing flag
+        if pending_files and sync_processing:
+            # Process concurrently (bounded by INGESTION_MAX_CONCURRENCY) and wait for completion
+            collection_name = conversation_collection_name(conversation_id)
+            semaphore = asyncio.Semaphore(settings.INGESTION_MAX_CONCURRENCY)
+            
+            async def process_pending_file(db_file_id: int) -> bool:
+                async with semaphore:
+                    return await process_file_sync(
+                        db_file_id=db_file_id,
                         conversation_id=conversation_id,
                         user_id=current_user.id,
                         collection_name=collection_name
                     )
-                    
-                    if success:
-                        # Refresh the file object to get updated metadata
-                        db.refresh(db_file)
-                        
-                        # Create secure download URL
-                        file_dict = schemas.FileStorage.from_orm(db_file).dict()
-                        file_dict["download_url"] = f"/api/collections/{conversation_id}/files/{db_file.id}/download"
-                        file_dict["processing_status"] = "completed"
-                        
-                        result.append(file_dict)
-                    else:
-                        file_dict = schemas.FileStorage.from_orm(db_file).dict()
-                        file_dict["download_url"] = f"/api/collections/{conversation_id}/files/{db_file.id}/download"
-                        file_dict["processing_status"] = "failed"
-                        file_dict["error"] = "Failed to process file for RAG"
-                        
-                        result.append(file_dict)
-                except Exception as e:
-                    file_dict = schemas.FileStorage.from_orm(db_file).dict()
-                    file_dict["download_url"] = f"/api/collections/{conversation_id}/files/{db_file.id}/download"
+            
+            outcomes = await asyncio.gather(
+                *(process_pending_file(db_file.id) for _, db_file in pending_files),
+                return_exceptions=True
+            )
+            
+            for (index, db_file), outcome in zip(pending_files, outcomes):
+                # Refresh the file object to get updated metadata
+                db.refresh(db_file)
+                
+                # Create secure download URL
+                file_dict = schemas.FileStorage.from_orm(db_file).dict()
+                file_dict["download_url"] = f"/api/collections/{conversation_id}/files/{db_file.id}/download"
+                
+                if isinstance(outcome, Exception):
                     file_dict["processing_status"] = "failed"
-                    file_dict["error"] = f"Processing error: {str(e)}"
-                    
-                    result.append(file_dict)
-            else:
-                # Process asynchronously in background
-                if is_supported_type:
-                    background_tasks.add_task(
-                        process_uploaded_file_for_rag,
-                        db_file_id=db_file.id,
-                        conversation_id=conversation_id,
-                        user_id=current_user.id,
-                        db_conn_string=settings.DATABASE_URL
-                    )
-                    
-                    result.append({
-                        **schemas.FileStorage.from_orm(db_file).dict(),
-                        "download_url": f"/api/collections/{conversation_id}/files/{db_file.id}/download",
-                        "processing_status": "pending"
-                    })
+                    file_dict["error"] = f"Processing error: {str(outcome)}"
+                elif outcome:
+                    file_dict["processing_status"] = "completed"
+                else:
+                    file_dict["processing_status"] = "failed"
+                    file_dict["error"] = "Failed to process file for RAG"
+                
+                result[index] = file_dict
+
+                await notify_file_event({
+                    "type": "file_processing_completed",
+                    "file_id": db_file.id,
+                    "filename": db_file.original_filename,
+                    "conversation_id": conversation_id,
+                    "status": "success" if file_dict["processing_status"] == "completed" else "failed"
+                })
+
+            conversation_files = crud.get_conversation_files(db, conversation_id)
+            if all(f.file_metadata and f.file_metadata.get("is_processed_for_rag", False) for f in conversation_files):
+                await notify_file_event({
+                    "type": "all_files_processed",
+                    "conversation_id": conversation_id,
+                    "total_files": len(conversation_files)
+                })
+        elif pending_files:
+            # Process asynchronously in background
+            background_tasks.add_task(
+                process_uploaded_files_for_rag,
+                db_file_ids=[db_file.id for _, db_file in pending_files],
+                conversation_id=conversation_id,
+                user_id=current_user.id,
+                db_conn_string=settings.DATABASE_URL
+            )
+            
+            for index, db_file in pending_files:
+                result[index] = {
+                    **schemas.FileStorage.from_orm(db_file).dict(),
+                    "download_url": f"/api/collections/{conversation_id}/files/{db_file.id}/download",
+                    "processing_status": "pending"
+                }
         
         # Update conversation type if any files were processed successfully
         if result and not all(r.get("error", None) for r in result):
@@ -1353,11 +1489,8 @@ async def process_file_sync(db_file_id: int, conversation_id: str, user_id: int,
         db = SessionLocal()
         
         try:
-            # Initialize ingestion service
-            from app.services.ingestion_service import DocumentIngestionService
-            ingestion_service = DocumentIngestionService()
-            
-            # Ensure the collection exists first
+            # Ensure the collection exists first (module-level ingestion service is shared
+            # so concurrent files reuse the same warmed-up Docling converters)
             print(f"DEBUG: Ensuring collection exists: {collection_name}")
             await asyncio.to_thread(
                 ingestion_service.create_new_collection, 
@@ -1421,17 +1554,26 @@ def process_file_for_collection(file_id: int, collection_id: int, db: Session):
             return
         
         # Process file for vector storage
+        pdf_processing = {}
         num_docs = ingestion_service.ingest_file_object(
             file_obj=file_data,
             filename=file.filename,
             collection_name=safe_collection_name,
-            metadata={"source_file_id": file.id, "file_name": file.original_filename}
+            metadata={"source_file_id": file.id, "file_name": file.original_filename},
+            ocr_mode=AdminConfigService.get_pdf_ocr_mode(db),
+            table_mode=AdminConfigService.get_pdf_table_mode(db),
+            processing_info=pdf_processing
         )
         
         # Update collection file
         collection_file.is_processed = True
         db.commit()
         
+        if pdf_processing:
+            crud.update_file_storage(db, file.id, {
+                "file_metadata": {**(file.file_metadata or {}), "pdf_processing": pdf_processing}
+            })
+        
         print(f"Successfully processed file {file_id} for collection {collection_id}: {num_docs} chunks")
         return True
     except Exception as e:
@@ -1448,13 +1590,8 @@ def process_file_for_collection_sync(file_id: int, collection_name: str, db: Ses
             print(f"File not found: file_id={file_id}")
             return False
         
-        # Initialize services
-        from app.services.minio_service import MinioService
-        from app.services.ingestion_service import DocumentIngestionService
-        from app.utils.string_utils import sanitize_collection_name
-        
-        minio_service = MinioService()
-        ingestion_service = DocumentIngestionService()
+        # Uses the module-level minio_service / ingestion_service, which are safe to share
+        # across the worker threads processing files concurrently
         
         # Sanitize collection name for Milvus
         safe_collection_name = sanitize_collection_name(collection_name)
@@ -1467,11 +1604,15 @@ def process_file_for_collection_sync(file_id: int, collection_name: str, db: Ses
         
         # Process file for vector storage
         try:
+            pdf_processing = {}
             num_docs = ingestion_service.ingest_file_object(
                 file_obj=file_data,
                 filename=file.filename,
                 collection_name=safe_collection_name,
-                metadata={"source_file_id": file.id, "file_name": file.original_filename, "user_id": user_id}
+                metadata={"source_file_id": file.id, "file_name": file.original_filename, "user_id": user_id},
+                ocr_mode=AdminConfigService.get_pdf_ocr_mode(db),
+                table_mode=AdminConfigService.get_pdf_table_mode(db),
+                processing_info=pdf_processing
             )
             
             # Update file metadata with processing info
@@ -1479,6 +1620,8 @@ def process_file_for_collection_sync(file_id: int, collection_name: str, db: Ses
             new_metadata["is_processed_for_rag"] = True
             new_metadata["chunk_count"] = num_docs
             new_metadata["processed_at"] = datetime.utcnow().isoformat()
+            if pdf_processing:
+                new_metadata["pdf_processing"] = pdf_processing
 
             crud.update_file_storage(db, file.id, {"file_metadata": new_metadata})
             
@@ -1491,6 +1634,16 @@ def process_file_for_collection_sync(file_id: int, collection_name: str, db: Ses
         print(f"Error processing file {file_id} for collection {collection_name}: {str(e)}")
         return False
 
+async def process_uploaded_files_for_rag(db_file_ids: List[int], conversation_id: str, user_id: int, db_conn_string: str):
+    """Background task to process several uploaded files for RAG concurrently."""
+    semaphore = asyncio.Semaphore(settings.INGESTION_MAX_CONCURRENCY)
+    
+    async def process_bounded(db_file_id: int):
+        async with semaphore:
+            await process_uploaded_file_for_rag(db_file_id, conversation_id, user_id, db_conn_string)
+    
+    await asyncio.gather(*(process_bounded(db_file_id) for db_file_id in db_file_ids))
+
 async def process_uploaded_file_for_rag(db_file_id: int, conversation_id: str, user_id: int, db_conn_string: str):
     """Background task to process an uploaded file for RAG."""
     try:
@@ -1508,20 +1661,16 @@ async def process_uploaded_file_for_rag(db_file_id: int, conversation_id: str, u
                 return
             
             # Send processing started notification
-            await manager.send_message({
+            await notify_file_event({
                 "type": "file_processing_started",
                 "file_id": db_file_id,
                 "filename": file.original_filename,
                 "conversation_id": conversation_id
-            }, conversation_id)
+            })
             
             # Create a collection name for this conversation
             collection_name = conversation_collection_name(conversation_id)
             
-            # Initialize ingestion service
-            from app.services.ingestion_service import DocumentIngestionService
-            ingestion_service = DocumentIngestionService()
-            
             # Explicitly create the collection first
             print(f"DEBUG: Ensuring collection exists: {collection_name}")
             try:
@@ -1547,23 +1696,23 @@ async def process_uploaded_file_for_rag(db_file_id: int, conversation_id: str, u
             if success:
                 print(f"Successfully processed file {db_file_id} for conversation {conversation_id}")
                 # Send success notification
-                await manager.send_message({
+                await notify_file_event({
                     "type": "file_processing_completed",
                     "file_id": db_file_id,
                     "filename": file.original_filename,
                     "conversation_id": conversation_id,
                     "status": "success"
-                }, conversation_id)
+                })
             else:
                 print(f"Failed to process file {db_file_id} for conversation {conversation_id}")
                 # Send failure notification
-                await manager.send_message({
+                await notify_file_event({
                     "type": "file_processing_completed",
                     "file_id": db_file_id,
                     "filename": file.original_filename,
                     "conversation_id": conversation_id,
                     "status": "failed"
-                }, conversation_id)
+                })
                 
             # Check if all files in conversation are processed
             conversation_files = crud.get_conversation_files(db, conversation_id)
@@ -1574,11 +1723,11 @@ async def process_uploaded_file_for_rag(db_file_id: int, conversation_id: str, u
             
             if all_processed:
                 # Send all files completed notification
-                await manager.send_message({
+                await notify_file_event({
                     "type": "all_files_processed",
                     "conversation_id": conversation_id,
                     "total_files": len(conversation_files)
-                }, conversation_id)
+                })
                 
         finally:
             db.close()
@@ -1587,12 +1736,12 @@ async def process_uploaded_file_for_rag(db_file_id: int, conversation_id: str, u
         print(f"Error in background file processing: {str(e)}")
         # Send error notification
         try:
-            await manager.send_message({
+            await notify_file_event({
                 "type": "file_processing_error",
                 "file_id": db_file_id,
                 "conversation_id": conversation_id,
                 "error": str(e)
-            }, conversation_id)
+            })
         except:
             pass  # Don't fail if WebSocket notification fails
 
@@ -1709,10 +1858,10 @@ async def get_file_processing_status(
 
 # Helper function for error streaming
 async def generate_error_stream(error_message):
-    yield json.dumps({
+    yield ndjson_frame({
         "status": "error",
         "message": error_message
-    }) + "\n"
+    })
 
 # Endpoint to initiate an empty conversation
 @router.post("/initiate", response_model=schemas.ConversationInitiateResponse, status_code=status.HTTP_201_CREATED)
@@ -2034,6 +2183,14 @@ async def websocket_file_processing(websocket: WebSocket, conversation_id: str):
     Frontend can connect to this to receive updates when files are processed.
     """
     await manager.connect(websocket, conversation_id)
+    queue = file_event_broker.subscribe(conversation_id)
+    
+    async def forward_events():
+        while True:
+            event = await queue.get()
+            await websocket.send_text(json.dumps(event))
+    
+    forward_task = asyncio.create_task(forward_events())
     try:
         while True:
             # Keep connection alive and listen for any messages
@@ -2041,64 +2198,65 @@ async def websocket_file_processing(websocket: WebSocket, conversation_id: str):
             # Echo back for heartbeat
             await websocket.send_text(json.dumps({"type": "heartbeat", "status": "connected"}))
     except WebSocketDisconnect:
-        manager.disconnect(websocket, conversation_id)
+        pass
     except Exception as e:
         print(f"WebSocket error: {e}")
+    finally:
+        forward_task.cancel()
+        file_event_broker.unsubscribe(conversation_id, queue)
         manager.disconnect(websocket, conversation_id)
 
 # Add SSE endpoint for file processing notifications
 @router.get("/sse/file-processing/{conversation_id}")
 async def sse_file_processing(
     conversation_id: str,
-    current_user: schemas.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: schemas.User = Depends(get_current_active_user)
 ):
     """
     Server-Sent Events endpoint for file processing notifications.
     Alternative to WebSocket for browsers that prefer SSE.
+    
+    Events are pushed from the file event broker as soon as any worker finishes
+    a file; no database session is held while the stream is open.
     """
     async def event_stream():
-        # Send initial connection message
-        yield f"data: {json.dumps({'type': 'connected', 'conversation_id': conversation_id})}\n\n"
-        
-        # Check initial status
-        conversation_files = crud.get_conversation_files(db, conversation_id)
-        if conversation_files:
-            all_processed = all(
-                f.file_metadata and f.file_metadata.get("is_processed_for_rag", False)
-                for f in conversation_files
-            )
+        # Subscribe before checking status so no event is missed in between
+        queue = file_event_broker.subscribe(conversation_id)
+        try:
+            # Send initial connection message
+            yield f"data: {json.dumps({'type': 'connected', 'conversation_id': conversation_id})}\n\n"
             
-            if all_processed:
+            # Check initial status with a short-lived session
+            def all_files_processed() -> bool:
+                from app.db.database import SessionLocal
+                status_db = SessionLocal()
+                try:
+                    conversation_files = crud.get_conversation_files(status_db, conversation_id)
+                    return bool(conversation_files) and all(
+                        f.file_metadata and f.file_metadata.get("is_processed_for_rag", False)
+                        for f in conversation_files
+                    )
+                finally:
+                    status_db.close()
+            
+            if await asyncio.to_thread(all_files_processed):
                 yield f"data: {json.dumps({'type': 'all_files_processed', 'conversation_id': conversation_id})}\n\n"
                 return
-        
-        # Poll for changes (in a real implementation, you'd use a more efficient method)
-        last_check = {}
-        while True:
-            try:
-                conversation_files = crud.get_conversation_files(db, conversation_id)
-                current_status = {f.id: f.file_metadata.get("is_processed_for_rag", False) if f.file_metadata else False for f in conversation_files}
-                
-                # Check for changes
-                for file_id, is_processed in current_status.items():
-                    if file_id not in last_check or last_check[file_id] != is_processed:
-                        if is_processed:
-                            file = next(f for f in conversation_files if f.id == file_id)
-                            yield f"data: {json.dumps({'type': 'file_processing_completed', 'file_id': file_id, 'filename': file.original_filename, 'status': 'success'})}\n\n"
+            
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
                 
-                last_check = current_status
+                yield f"data: {json.dumps(event)}\n\n"
                 
-                # Check if all files are processed
-                if all(current_status.values()) and current_status:
-                    yield f"data: {json.dumps({'type': 'all_files_processed', 'conversation_id': conversation_id})}\n\n"
+                if event.get("type") == "all_files_processed":
                     break
-                
-                await asyncio.sleep(2)  # Poll every 2 seconds
-                
-            except Exception as e:
-                yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
-                break
+        finally:
+            file_event_broker.unsubscribe(conversation_id, queue)
     
     return StreamingResponse(
         event_stream(),
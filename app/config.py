@@ -22,6 +22,9 @@ class Settings(BaseModel):
     POSTGRES_HOST: str = os.getenv("POSTGRES_HOST", "192.168.1.10")
     POSTGRES_PORT: str = os.getenv("POSTGRES_PORT", "35433")
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "chatbot")
+    # All Postgres connections one uvicorn worker may open (both pools and the LISTEN connections).
+    # Workers x this must stay below Postgres max_connections (100 by default): 5 x 18 = 90.
+    DB_CONNECTIONS_PER_WORKER: int = int(os.getenv("DB_CONNECTIONS_PER_WORKER", "18"))
     
     # LLM Settings
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "EMPTY")
@@ -31,6 +34,12 @@ class Settings(BaseModel):
     LLM_TEMPERATURE: float = float(os.getenv("LLM_TEMPERATURE", "0.1"))
     LLM_TOP_P: float = float(os.getenv("LLM_TOP_P", "0.95"))
     LLM_CONFIG_NAME: str = os.getenv("LLM_CONFIG_NAME", "Epsindo LLM Configuration")
+    # Pooled LLM clients: shared keep-alive connections to the LLM endpoint
+    LLM_HTTP_MAX_CONNECTIONS: int = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))
+    LLM_HTTP_MAX_KEEPALIVE: int = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20"))
+    LLM_HTTP_TIMEOUT: float = float(os.getenv("LLM_HTTP_TIMEOUT", "120"))
+    LLM_CONFIG_CACHE_TTL_SECONDS: int = int(os.getenv("LLM_CONFIG_CACHE_TTL_SECONDS", "300"))  # Safety net; changes are pushed
+    ADMIN_CONFIG_CACHE_TTL_SECONDS: int = int(os.getenv("ADMIN_CONFIG_CACHE_TTL_SECONDS", "300"))  # Safety net; changes are pushed
     
     # Minio Settings (for file storage)
     MINIO_ENDPOINT: str = os.getenv("MINIO_ENDPOINT", "192.168.1.10:9000")
@@ -48,15 +57,63 @@ class Settings(BaseModel):
     MILVUS_URI: str = os.getenv("MILVUS_URI", "http://localhost:19530")
     DEFAULT_COLLECTION: str = os.getenv("DEFAULT_COLLECTION", "default_collection") 
     RETRIEVER_TOP_K: int = int(os.getenv("RETRIEVER_TOP_K", "10"))
+    LLM_TOKENIZER_PATH: str = os.getenv("LLM_TOKENIZER_PATH", "")  # HF tokenizer of the chat model; empty estimates from length
+    HISTORY_TOKEN_BUDGET_REGULAR: int = int(os.getenv("HISTORY_TOKEN_BUDGET_REGULAR", "6000"))
+    HISTORY_TOKEN_BUDGET_USER_FILES: int = int(os.getenv("HISTORY_TOKEN_BUDGET_USER_FILES", "3000"))
+    HISTORY_TOKEN_BUDGET_GLOBAL_COLLECTION: int = int(os.getenv("HISTORY_TOKEN_BUDGET_GLOBAL_COLLECTION", "3000"))
+    MESSAGE_CACHE_MAX_CONVERSATIONS: int = int(os.getenv("MESSAGE_CACHE_MAX_CONVERSATIONS", "2000"))
+    MESSAGE_CACHE_MAX_MESSAGES: int = int(os.getenv("MESSAGE_CACHE_MAX_MESSAGES", "200"))  # Per conversation
+    CONVERSATION_SUMMARY_ENABLED: bool = os.getenv("CONVERSATION_SUMMARY_ENABLED", "false").lower() == "true"
+    CONVERSATION_SUMMARY_INTERVAL: int = int(os.getenv("CONVERSATION_SUMMARY_INTERVAL", "4"))  # Exchanges between summary updates
+    CONVERSATION_SUMMARY_MAX_WORDS: int = int(os.getenv("CONVERSATION_SUMMARY_MAX_WORDS", "250"))
+    CONTEXTUALIZE_POLICY: str = os.getenv("CONTEXTUALIZE_POLICY", "auto")  # auto, always or never
+    CONTEXTUALIZE_SPECULATIVE_RETRIEVAL: bool = os.getenv("CONTEXTUALIZE_SPECULATIVE_RETRIEVAL", "true").lower() == "true"
+    STREAM_FRAME_MAX_DELAY_MS: int = int(os.getenv("STREAM_FRAME_MAX_DELAY_MS", "20"))  # Longest a streamed token is held back
+    STREAM_FRAME_MAX_BYTES: int = int(os.getenv("STREAM_FRAME_MAX_BYTES", "64"))  # Flush size of a coalesced token frame
+    STREAM_DISCONNECT_POLL_SECONDS: float = float(os.getenv("STREAM_DISCONNECT_POLL_SECONDS", "0.5"))
+    STREAM_BUFFER_MAX_CHARS: int = int(os.getenv("STREAM_BUFFER_MAX_CHARS", "65536"))  # Answer text kept per resumable stream
+    STREAM_BUFFER_TTL_SECONDS: int = int(os.getenv("STREAM_BUFFER_TTL_SECONDS", "60"))  # Buffer lifetime after generation ends
+    STREAM_RESUME_GRACE_SECONDS: int = int(os.getenv("STREAM_RESUME_GRACE_SECONDS", "30"))  # Generation kept running without a reader
+    STREAM_RESUME_WAIT_SECONDS: int = int(os.getenv("STREAM_RESUME_WAIT_SECONDS", "60"))  # Wait for an answer generated on another worker
+    STREAM_RELAY_HEARTBEAT_SECONDS: float = float(os.getenv("STREAM_RELAY_HEARTBEAT_SECONDS", "5"))  # Keeps a relay from another worker alive
+    STREAM_RELAY_ATTACH_TIMEOUT_SECONDS: float = float(os.getenv("STREAM_RELAY_ATTACH_TIMEOUT_SECONDS", "2"))
+    STREAM_RELAY_INTERVAL_MS: int = int(os.getenv("STREAM_RELAY_INTERVAL_MS", "100"))  # Batching of relayed tokens
+    RAG_CONTEXT_TOKEN_BUDGET: int = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "3000"))
+    RAG_CONTEXT_DEDUP_THRESHOLD: float = float(os.getenv("RAG_CONTEXT_DEDUP_THRESHOLD", "0.95"))  # Cosine similarity of near-duplicate chunks
+    RAG_CONTEXT_DEDUP_EMBED_CHARS: int = int(os.getenv("RAG_CONTEXT_DEDUP_EMBED_CHARS", "1000"))  # Text embedded per chunk without a stored vector
+    RAG_DEBUG_PROMPT_SAMPLE_RATE: float = float(os.getenv("RAG_DEBUG_PROMPT_SAMPLE_RATE", "0.0"))  # Fraction of requests whose full LLM input is printed
+    TITLE_DEBOUNCE_SECONDS: float = float(os.getenv("TITLE_DEBOUNCE_SECONDS", "2.0"))
+    TITLE_MAX_CONCURRENCY: int = int(os.getenv("TITLE_MAX_CONCURRENCY", "4"))  # Concurrent title updates per worker
+    TITLE_TOPIC_SHIFT_THRESHOLD: float = float(os.getenv("TITLE_TOPIC_SHIFT_THRESHOLD", "0.35"))  # Cosine distance to the topic centroid
+    TITLE_TOPIC_CENTROID_WINDOW: int = int(os.getenv("TITLE_TOPIC_CENTROID_WINDOW", "10"))  # Messages weighted into the centroid
     
     # Docling Settings
     DOCLING_PARSER_PATH: str = os.getenv("DOCLING_PARSER_PATH", "/app/.cache/docling/models")
     DOCLING_EMBED_MODEL: str = os.getenv("DOCLING_EMBED_MODEL", "/app/stella-embed-tokenizer")
     DOCLING_USE_GPU: bool = os.getenv("DOCLING_USE_GPU", "True").lower() == "true"
+    PDF_OCR_MODE: str = os.getenv("PDF_OCR_MODE", "auto")  # off, auto or force
+    PDF_TABLE_MODE: str = os.getenv("PDF_TABLE_MODE", "auto")  # off, auto or force
+    PDF_TEXT_LAYER_MIN_CHARS: int = int(os.getenv("PDF_TEXT_LAYER_MIN_CHARS", "32"))
+    UVICORN_WORKERS: int = int(os.getenv("UVICORN_WORKERS", "5"))  # API worker processes per host
+    # Shard processes per uvicorn worker (<= 1 disables page sharding); each worker starts its
+    # own pool on its first sharded PDF, so a host runs up to UVICORN_WORKERS x this many.
+    # Defaults to an even split of the CPU cores between the uvicorn workers.
+    DOCLING_SHARD_WORKERS: int = int(os.getenv("DOCLING_SHARD_WORKERS") or max(1, (os.cpu_count() or 1) // max(1, UVICORN_WORKERS)))
+    DOCLING_SHARD_PAGES: int = int(os.getenv("DOCLING_SHARD_PAGES", "25"))
+    DOCLING_SHARD_MIN_PAGES: int = int(os.getenv("DOCLING_SHARD_MIN_PAGES", "60"))
+    INGESTION_MAX_CONCURRENCY: int = int(os.getenv("INGESTION_MAX_CONCURRENCY", "4"))  # Files ingested in parallel
+    INGESTION_CHECKPOINTS_ENABLED: bool = os.getenv("INGESTION_CHECKPOINTS_ENABLED", "true").lower() == "true"
+    INGESTION_CHECKPOINT_DIR: str = os.getenv("INGESTION_CHECKPOINT_DIR", "/tmp/ingestion_checkpoints")
+    INGESTION_BATCH_SIZE: int = int(os.getenv("INGESTION_BATCH_SIZE", "64"))  # Chunks embedded/inserted per checkpoint
     
     # Build database URL
     @property
     def DATABASE_URL(self) -> str:
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
+    # Same database through asyncpg, used by the async chat path
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
+
 settings = Settings()
\ No newline at end of file
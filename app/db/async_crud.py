@@ -0,0 +1,159 @@
+"""
+Async variants of the CRUD operations used on the chat hot path.
+
+They mirror the functions in app.db.crud but run on an AsyncSession, so
+awaiting Postgres does not block the event loop. Relationships used by the
+chat routes are eager-loaded since lazy loading is not available in async
+sessions.
+"""
+import uuid
+from typing import List, Optional
+
+from sqlalchemy import case, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from . import models, schemas
+
+
+def _message_cache():
+    """Per-worker message history cache (imported lazily to avoid an import cycle)."""
+    from app.services.message_history_cache import message_history_cache
+    return message_history_cache
+
+
+# Conversation operations
+async def get_conversation(db: AsyncSession, conversation_id: str) -> Optional[models.Conversation]:
+    """Get a conversation with its linked global collection loaded."""
+    result = await db.execute(
+        select(models.Conversation)
+        .options(selectinload(models.Conversation.linked_global_collection))
+        .where(models.Conversation.id == conversation_id)
+    )
+    return result.scalars().first()
+
+
+async def create_conversation(db: AsyncSession, user_id: int, meta_data: dict = None) -> models.Conversation:
+    db_conversation = models.Conversation(
+        id=str(uuid.uuid4()),
+        user_id=user_id,
+        meta_data=meta_data
+    )
+    db.add(db_conversation)
+    await db.commit()
+    return await get_conversation(db, db_conversation.id)
+
+
+async def update_conversation(db: AsyncSession, conversation_id: str, meta_data: dict = None) -> Optional[models.Conversation]:
+    db_conversation = await get_conversation(db, conversation_id)
+    if db_conversation and meta_data is not None:
+        db_conversation.meta_data = meta_data
+        await db.commit()
+    return db_conversation
+
+
+# Message operations
+async def allocate_message_sequences(db: AsyncSession, conversation_id: str, count: int = 1) -> int:
+    """
+    Atomically reserve sequence numbers for new messages of a conversation.
+
+    See crud.allocate_message_sequences.
+
+    Args:
+        db: Async database session
+        conversation_id: Conversation ID
+        count: Number of sequence numbers to reserve
+
+    Returns:
+        First reserved sequence number
+    """
+    stmt = (
+        update(models.Conversation)
+        .where(models.Conversation.id == conversation_id)
+        .values(
+            next_sequence=models.Conversation.next_sequence + count,
+            expires_at=case((models.Conversation.is_empty == True, None), else_=models.Conversation.expires_at),
+            is_empty=False
+        )
+        .returning(models.Conversation.next_sequence)
+        .execution_options(synchronize_session="fetch")
+    )
+    next_sequence = (await db.execute(stmt)).scalar()
+    if next_sequence is None:
+        raise ValueError(f"Conversation with ID {conversation_id} not found")
+    return next_sequence - count
+
+
+async def create_messages(db: AsyncSession, messages: List[schemas.MessageCreate]) -> List[models.Message]:
+    """
+    Insert messages in one transaction, e.g. a user message and its answer.
+
+    Args:
+        db: Async database session
+        messages: Messages in conversation order
+
+    Returns:
+        Created Message objects
+    """
+    db_messages = []
+    try:
+        first_sequence = {}
+        for conversation_id in dict.fromkeys(m.conversation_id for m in messages):
+            count = sum(1 for m in messages if m.conversation_id == conversation_id)
+            first_sequence[conversation_id] = await allocate_message_sequences(db, conversation_id, count)
+
+        for message in messages:
+            db_message = models.Message(
+                conversation_id=message.conversation_id,
+                role=message.role,
+                content=message.content,
+                sequence_number=first_sequence[message.conversation_id],
+                is_truncated=message.is_truncated,
+                stream_id=message.stream_id
+            )
+            first_sequence[message.conversation_id] += 1
+            db_messages.append(db_message)
+
+        db.add_all(db_messages)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+    for db_message in db_messages:
+        await db.refresh(db_message)
+        _message_cache().append(db_message)
+    return db_messages
+
+
+async def create_message(db: AsyncSession, message: schemas.MessageCreate) -> models.Message:
+    return (await create_messages(db, [message]))[0]
+
+
+# File operations
+async def get_conversation_files(db: AsyncSession, conversation_id: str, skip: int = 0, limit: int = 100) -> List[models.FileStorage]:
+    """Get all files associated with a conversation."""
+    result = await db.execute(
+        select(models.FileStorage)
+        .where(models.FileStorage.conversation_id == conversation_id)
+        .offset(skip)
+        .limit(limit)
+    )
+    return list(result.scalars().all())
+
+
+# Admin config operations
+async def get_admin_config(db: AsyncSession, key: str, default_value=None):
+    """
+    Get an admin configuration value, loading the config snapshot asynchronously if needed.
+
+    Args:
+        db: Async database session
+        key: Configuration key
+        default_value: Default value if key is not found
+
+    Returns:
+        Configuration value
+    """
+    from app.services.admin_config_service import AdminConfigService
+    return await AdminConfigService.aget_config(db, key, default_value)
@@ -8,10 +8,10 @@ from sqlalchemy import func
 from app.models.user import UserRole
 from app.models.llm_config import LLMConfig
 import bcrypt
-from typing import Union, List
+from typing import Union, List, Optional
 from datetime import datetime, timedelta
 from sqlalchemy.sql import or_
-from sqlalchemy import text
+from sqlalchemy import text, update, case
 
 # User CRUD operations
 def get_user(db: Session, user_id: int):
@@ -228,6 +228,7 @@ def delete_conversation(db: Session, conversation_id: str):
         # Delete conversation from database (cascade deletes messages and files automatically)
         db.delete(db_conversation)
         db.commit()
+        _message_cache().invalidate(conversation_id)
         return True
         
     except Exception as e:
@@ -236,43 +237,103 @@ def delete_conversation(db: Session, conversation_id: str):
         return False
 
 # Message CRUD operations
+def _message_cache():
+    """Per-worker message history cache (imported lazily to avoid an import cycle)."""
+    from app.services.message_history_cache import message_history_cache
+    return message_history_cache
+
 def get_conversation_messages(db: Session, conversation_id: str, skip: int = 0, limit: int = 100):
     return db.query(models.Message).filter(
         models.Message.conversation_id == conversation_id
     ).order_by(models.Message.timestamp.desc()).offset(skip).limit(limit).all()
 
-def create_message(db: Session, message: schemas.MessageCreate):
-    # Get the parent conversation
-    conversation = db.query(models.Conversation).filter(models.Conversation.id == message.conversation_id).first()
-    
-    if not conversation:
-        # This should ideally not happen if conversation_id is validated upstream
-        # or if conversations are auto-created. Handle as an error or raise exception.
-        # For now, let's assume conversation exists or is created before this point.
-        pass # Or raise an error
-
-    # If the conversation was empty, mark it as not empty and clear expiration
-    if conversation and conversation.is_empty:
-        conversation.is_empty = False
-        conversation.expires_at = None
-        # The commit for the message will also save these changes to the conversation
-
-    # Get the highest sequence number in this conversation
-    highest_seq = db.query(func.max(models.Message.sequence_number)).filter(
-        models.Message.conversation_id == message.conversation_id
-    ).scalar() or 0
-    
-    # Create new message with incremented sequence number
-    db_message = models.Message(
-        conversation_id=message.conversation_id,
-        role=message.role,
-        content=message.content,
-        sequence_number=highest_seq + 1
+def get_recent_messages(db: Session, conversation_id: str, limit: int = 50, before_sequence: Optional[int] = None):
+    """Get the newest messages of a conversation by sequence number, newest first."""
+    query = db.query(models.Message).filter(models.Message.conversation_id == conversation_id)
+    if before_sequence is not None:
+        query = query.filter(models.Message.sequence_number < before_sequence)
+    return query.order_by(models.Message.sequence_number.desc()).limit(limit).all()
+
+def allocate_message_sequences(db: Session, conversation_id: str, count: int = 1) -> int:
+    """
+    Atomically reserve sequence numbers for new messages of a conversation.
+    
+    A single UPDATE ... RETURNING bumps the conversation's next_sequence counter,
+    so concurrent requests never get the same number. It also marks the
+    conversation as not empty and clears its expiration. The conversation row
+    stays locked until the caller commits.
+    
+    Args:
+        db: Database session
+        conversation_id: Conversation ID
+        count: Number of sequence numbers to reserve
+        
+    Returns:
+        First reserved sequence number
+    """
+    stmt = (
+        update(models.Conversation)
+        .where(models.Conversation.id == conversation_id)
+        .values(
+            next_sequence=models.Conversation.next_sequence + count,
+            expires_at=case((models.Conversation.is_empty == True, None), else_=models.Conversation.expires_at),
+            is_empty=False
+        )
+        .returning(models.Conversation.next_sequence)
+        .execution_options(synchronize_session="fetch")
     )
-    db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
-    return db_message
+    next_sequence = db.execute(stmt).scalar()
+    if next_sequence is None:
+        raise ValueError(f"Conversation with ID {conversation_id} not found")
+    return next_sequence - count
+
+def create_message(db: Session, message: schemas.MessageCreate):
+    return create_messages(db, [message])[0]
+
+def create_messages(db: Session, messages: List[schemas.MessageCreate]):
+    """
+    Insert messages in one transaction, e.g. a user message and its answer.
+    
+    Args:
+        db: Database session
+        messages: Messages in conversation order
+        
+    Returns:
+        Created Message objects
+    """
+    db_messages = []
+    try:
+        first_sequence = {}
+        for conversation_id in dict.fromkeys(m.conversation_id for m in messages):
+            count = sum(1 for m in messages if m.conversation_id == conversation_id)
+            first_sequence[conversation_id] = allocate_message_sequences(db, conversation_id, count)
+        
+        for message in messages:
+            db_message = models.Message(
+                conversation_id=message.conversation_id,
+                role=message.role,
+                content=message.content,
+                sequence_number=first_sequence[message.conversation_id],
+                is_truncated=message.is_truncated,
+                stream_id=message.stream_id
+            )
+            first_sequence[message.conversation_id] += 1
+            db_messages.append(db_message)
+        
+        db.add_all(db_messages)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    
+    for db_message in db_messages:
+        db.refresh(db_message)
+        _message_cache().append(db_message)
+    return db_messages
+
+def get_message_by_stream_id(db: Session, stream_id: str) -> Optional[models.Message]:
+    """Get the answer saved by a resumable stream."""
+    return db.query(models.Message).filter(models.Message.stream_id == stream_id).first()
 
 # LLM Config CRUD operations
 def get_llm_config(db: Session):
@@ -304,6 +365,14 @@ def get_llm_config(db: Session):
         print(f"Error getting LLM config: {e}")
         return None
 
+def _notify_llm_config_changed():
+    """Invalidate pooled LLM clients in every worker after the config changed."""
+    try:
+        from app.services.notification_service import publish_config_change
+        publish_config_change("llm_config")
+    except Exception as e:
+        print(f"Error publishing LLM config change: {e}")
+
 def get_llm_config_by_name(db: Session, name: str):
     """Get LLM config by name - kept for backwards compatibility"""
     return get_llm_config(db)
@@ -378,6 +447,7 @@ def update_llm_config(db: Session, config: schemas.LLMConfigUpdate):
         sql = text(f"UPDATE llm_config SET {', '.join(set_parts)}")
         db.execute(sql, params)
         db.commit()
+        _notify_llm_config_changed()
         
         # Return updated config
         return get_llm_config(db)
@@ -421,6 +491,7 @@ def create_llm_config(db: Session, config: schemas.LLMConfigCreate):
                 }
             )
             db.commit()
+            _notify_llm_config_changed()
             
             # Return the newly created config
             return get_llm_config(db)
@@ -710,6 +781,14 @@ def get_latest_admin_config(db: Session):
         print(f"Warning: Error fetching admin config: {str(e)}")
         return {}
 
+def _notify_admin_config_changed(key: str):
+    """Invalidate the cached admin config in every worker after a config changed."""
+    try:
+        from app.services.notification_service import publish_config_change
+        publish_config_change("admin_config", key=key)
+    except Exception as e:
+        print(f"Error publishing admin config change: {e}")
+
 def get_admin_config_by_key(db: Session, key: str):
     """Get an admin config by key."""
     return db.query(models.AdminConfig).filter(models.AdminConfig.key == key).first()
@@ -724,6 +803,7 @@ def create_admin_config(db: Session, key: str, value: str, description: str = No
     db.add(db_config)
     db.commit()
     db.refresh(db_config)
+    _notify_admin_config_changed(key)
     return db_config
 
 def update_admin_config(db: Session, key: str, value: str):
@@ -733,6 +813,7 @@ def update_admin_config(db: Session, key: str, value: str):
         db_config.value = value
         db.commit()
         db.refresh(db_config)
+        _notify_admin_config_changed(key)
         return db_config
     return None
 
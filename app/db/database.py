@@ -1,14 +1,50 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from app.config import settings
+from app.services.metrics import instrument_engine
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Connection budget of one uvicorn worker (DB_CONNECTIONS_PER_WORKER):
+# - one LISTEN connection per notification listener (file events, config
+#   changes, answer streams), opened outside the pools
+# - the sync pool: two thirds of the rest, as it serves most routes, the
+#   ingestion threads (INGESTION_MAX_CONCURRENCY) and the chat services'
+#   queries, which run in worker threads
+# - the async pool, for the lookups of the chat routes
+# With the default of 18 and 5 workers that is 90 connections, below the
+# Postgres default max_connections of 100 with room for migrations and psql.
+LISTEN_CONNECTIONS = 3
+POOLED_CONNECTIONS = max(2, settings.DB_CONNECTIONS_PER_WORKER - LISTEN_CONNECTIONS)
+SYNC_POOL_CONNECTIONS = max(1, POOLED_CONNECTIONS * 2 // 3)
+ASYNC_POOL_CONNECTIONS = max(1, POOLED_CONNECTIONS - SYNC_POOL_CONNECTIONS)
+
+
+def _pool_limits(connections: int) -> dict:
+    """Split a pool's connection limit into kept-open and overflow connections."""
+    pool_size = (connections + 1) // 2
+    return {"pool_size": pool_size, "max_overflow": connections - pool_size}
+
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_pool_limits(SYNC_POOL_CONNECTIONS))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the chat hot path, so queries don't block the event loop.
+# The sync engine above stays for background jobs, scripts and Alembic.
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL,
+    pool_pre_ping=True,
+    **_pool_limits(ASYNC_POOL_CONNECTIONS)
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Pool usage metrics (db_pool_checked_out, ...) for /metrics
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+
 Base = declarative_base()
 
 # Dependency
@@ -17,4 +53,25 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+def release_connection(db):
+    """
+    Return a session's pooled connection before slow non-database work.
+    
+    Ends the current transaction; the session stays usable and checks out a
+    connection again on its next query. Loaded objects are expired.
+    
+    Args:
+        db: Database session
+    """
+    try:
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+# Async dependency
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
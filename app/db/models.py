@@ -32,6 +32,12 @@ class Conversation(Base):
     linked_global_collection_id = Column(Integer, ForeignKey("collections.id"), nullable=True)
     original_global_collection_name = Column(String, nullable=True, comment="Name of the global collection when conversation was initiated")
     display_file_id = Column(Integer, ForeignKey("file_storage.id"), nullable=True, comment="File to display in the chat panel")
+    summary = Column(Text, nullable=True, comment="Rolling summary of messages older than the history window")
+    summary_through_sequence = Column(Integer, nullable=True, comment="Last message sequence_number folded into the summary")
+    summary_updated_at = Column(DateTime(timezone=True), nullable=True)
+    next_sequence = Column(Integer, nullable=False, default=1, server_default="1", comment="Sequence number allocated to the next message")
+    topic_centroid = Column(JSON, nullable=True, comment="Running mean embedding of the user messages of the current topic")
+    topic_message_count = Column(Integer, nullable=False, default=0, server_default="0", comment="User messages averaged into topic_centroid")
     
     # Relationships
     user = relationship("User", back_populates="conversations")
@@ -50,6 +56,8 @@ class Message(Base):
     content = Column(Text, nullable=False)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     rag_context = Column(Text, nullable=True, comment="Stores the retrieved context used for RAG responses")
+    is_truncated = Column(Boolean, nullable=False, default=False, server_default="false", comment="Answer was cut off because the client disconnected")
+    stream_id = Column(String, nullable=True, index=True, comment="ID of the resumable stream that generated this answer")
     
     # Relationships
     conversation = relationship("Conversation", back_populates="messages")
@@ -113,4 +121,26 @@ class CollectionFile(Base):
     # Unique constraint to prevent duplicate files in a collection
     __table_args__ = (
         UniqueConstraint('collection_id', 'file_id', name='uq_collection_file'),
-    ) 
\ No newline at end of file
+    ) 
+
+class IngestionCheckpoint(Base):
+    """Progress of an in-flight chunked ingestion, so an interrupted job can resume."""
+    __tablename__ = "ingestion_checkpoints"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    collection_name = Column(String, nullable=False)
+    source_key = Column(String, nullable=False, comment="Identifies the ingested source, e.g. file:<file_storage.id>")
+    content_hash = Column(String(64), nullable=False, comment="SHA-256 of the source content")
+    status = Column(String, nullable=False, default="pending")  # pending, parsed, inserting, failed
+    batch_size = Column(Integer, nullable=False)
+    total_chunks = Column(Integer, nullable=True)
+    embedded_batches = Column(Integer, default=0, nullable=False)
+    inserted_batches = Column(Integer, default=0, nullable=False)
+    processing_info = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    __table_args__ = (
+        UniqueConstraint('collection_name', 'source_key', name='uq_ingestion_checkpoint_source'),
+    )
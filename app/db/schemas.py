@@ -172,6 +172,8 @@ class MessageBase(BaseModel):
 class MessageCreate(MessageBase):
     conversation_id: str
     rag_context: Optional[str] = None
+    is_truncated: bool = False
+    stream_id: Optional[str] = None
 
 class Message(MessageBase):
     id: int
@@ -179,6 +181,7 @@ class Message(MessageBase):
     sequence_number: int
     timestamp: datetime
     rag_context: Optional[str] = None
+    is_truncated: bool = False
     
     class Config:
         from_attributes = True
@@ -259,12 +262,14 @@ class RagChatRequest(BaseModel):
     collection_name: str
     conversation_id: Optional[str] = None
     meta_data: Optional[Dict[str, Any]] = None
+    per_token_frames: bool = False  # Streaming: send each token as it arrives instead of coalescing
 
 class ConversationRagChatRequest(BaseModel):
     """Request schema for conversation-based RAG chat"""
     message: str
     conversation_id: str
     meta_data: Optional[Dict[str, Any]] = None
+    per_token_frames: bool = False  # Streaming: send each token as it arrives instead of coalescing
 
 class RagChatResponse(BaseModel):
     """Response schema for RAG chat"""
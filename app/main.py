@@ -1,5 +1,5 @@
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 import os
@@ -12,11 +12,16 @@ logging.getLogger("passlib.handlers.bcrypt").setLevel(logging.ERROR)
 
 from app.config import settings
 from app.api.routes import api_router
-from app.db.database import engine, get_db, Base
+from app.db.database import engine, async_engine, get_db, Base
 from app.db import models
 from app.db.models import UserRole
 from app.services.admin_config_service import AdminConfigService
 from app.services.super_admin_service import SuperAdminService
+from app.services.notification_service import answer_stream_broker, file_event_broker, config_change_listener
+from app.services.llm_client_pool import llm_client_pool
+from app.services.tracing import TraceMiddleware
+from app.services.metrics import MetricsMiddleware, render_metrics
+from prometheus_client import CONTENT_TYPE_LATEST
 
 # Note: Database tables are created by Alembic migrations, not here
 # This ensures proper version tracking and schema consistency
@@ -66,6 +71,11 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# Time the stages of each request (Server-Timing header and Prometheus histograms)
+app.add_middleware(TraceMiddleware)
+# Request rate, latency and in-flight requests per route
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 # Note: The API now uses a unified approach with all functionality in /api/chat
 # This includes: 
@@ -96,6 +106,7 @@ async def startup_db_client():
     1. Ensure all users have roles assigned
     2. Initialize the single super admin user
     3. Ensure default admin configurations are in the database
+    4. Start the file processing event and config change listeners
     """
     # Create a database session
     # Correct way to get a session for startup tasks if using SessionLocal pattern
@@ -118,6 +129,24 @@ async def startup_db_client():
         db.rollback() # Rollback in case of error during startup tasks
     finally:
         db.close()
+    
+    # Listen for file processing events published by any worker
+    file_event_broker.start()
+    
+    # Listen for configuration changes so in-process caches stay consistent across workers
+    config_change_listener.start()
+    
+    # Relay resumed answer streams between workers
+    answer_stream_broker.start()
+    llm_client_pool.bind_event_loop()
+
+@app.on_event("shutdown")
+async def shutdown_event_broker():
+    """Stop the Postgres listeners and close async DB connections."""
+    file_event_broker.stop()
+    config_change_listener.stop()
+    answer_stream_broker.stop()
+    await async_engine.dispose()
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root():
@@ -129,13 +158,23 @@ async def health_check():
     """Health check endpoint."""
     return {"status": "ok"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Prometheus metrics endpoint.
+
+    With several workers, set PROMETHEUS_MULTIPROC_DIR so the metrics of all
+    workers are collected instead of only those of the worker serving the scrape.
+    """
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app", 
         host="0.0.0.0", 
         port=35430, 
         reload=False,
-        workers=10,  # Use 1 worker to avoid multiprocessing import issues
+        workers=settings.UVICORN_WORKERS,  # Also splits the CPU cores for PDF shard pools
         loop="asyncio",  # Use asyncio event loop
         access_log=True,
         log_level="info"
@@ -33,4 +33,8 @@ class AdminConfig(Base):
     KEY_GLOBAL_COLLECTION_BEHAVIOR = "global_collection_behavior"  # auto_update or readonly_on_change
     KEY_GLOBAL_COLLECTION_RAG_PROMPT = "global_collection_rag_prompt"  # System prompt for global collection RAG
     KEY_USER_COLLECTION_RAG_PROMPT = "user_collection_rag_prompt"  # System prompt for user collection RAG
-    KEY_REGULAR_CHAT_PROMPT = "regular_chat_prompt"  # System prompt for regular chat (non-RAG) 
\ No newline at end of file
+    KEY_REGULAR_CHAT_PROMPT = "regular_chat_prompt"  # System prompt for regular chat (non-RAG) 
+    
+    # Document Processing Config Keys
+    KEY_PDF_OCR_MODE = "pdf_ocr_mode"  # off, auto or force
+    KEY_PDF_TABLE_MODE = "pdf_table_mode"  # off, auto or force
@@ -0,0 +1,675 @@
+#!/usr/bin/env python3
+"""
+Ingestion Benchmark
+
+Drives DocumentIngestionService.ingest_file_object over a generated corpus of
+PDF, DOCX, Markdown and CSV files of varying sizes, using local stand-ins for
+the external services:
+- a fake Infinity embeddings server (deterministic vectors, optional latency)
+- an in-memory vector store, or Milvus Lite (--vector-store milvus-lite)
+- local files read into BytesIO in place of MinIO downloads
+
+Checkpointed ingestion (INGESTION_CHECKPOINTS_ENABLED) is turned off unless
+--checkpoints is given, since its progress is stored in PostgreSQL. With
+--checkpoints the database from DATABASE_URL must be reachable.
+
+For each stage (download, parse, chunk, embed, insert) it reports throughput,
+p50/p95 latency per file and peak RSS, and writes the results as JSON so runs
+can be compared between commits.
+
+Usage:
+    python app/scripts/ingestion_benchmark.py --sizes small,medium --output results.json
+    python app/scripts/ingestion_benchmark.py --compare baseline.json results.json
+
+Peak RSS per stage is the process high-water mark observed when that stage
+finished, so the stage that pushed memory up is the first one showing the jump.
+"""
+
+import sys
+import os
+import io
+import json
+import time
+import random
+import hashlib
+import uuid
+import argparse
+import platform
+import resource
+import subprocess
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+# Add the project root to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+app_dir = os.path.dirname(current_dir)
+project_root = os.path.dirname(app_dir)
+sys.path.insert(0, project_root)
+
+STAGES = ["download", "parse", "chunk", "embed", "insert"]
+FORMATS = ["pdf", "docx", "md", "csv"]
+
+# Units per size class: PDF pages, DOCX/MD paragraphs, CSV rows
+SIZE_PROFILES = {
+    "small": {"pages": 2, "paragraphs": 12, "rows": 50},
+    "medium": {"pages": 15, "paragraphs": 90, "rows": 600},
+    "large": {"pages": 80, "paragraphs": 450, "rows": 5000},
+}
+
+VOCABULARY = (
+    "system data model report analysis policy customer service network storage "
+    "quarter revenue growth market product design process quality review budget "
+    "security access control deployment cluster latency throughput document "
+    "pelanggan layanan laporan anggaran proses kualitas jaringan keamanan produk "
+    "project schedule resource risk mitigation vendor contract invoice payment"
+).split()
+
+
+# ============================================================================
+# Synthetic corpus
+# ============================================================================
+
+def _sentence(rng: random.Random, min_words: int = 8, max_words: int = 18) -> str:
+    words = [rng.choice(VOCABULARY) for _ in range(rng.randint(min_words, max_words))]
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraph(rng: random.Random) -> str:
+    return " ".join(_sentence(rng) for _ in range(rng.randint(3, 6)))
+
+
+def make_markdown(rng: random.Random, paragraphs: int) -> bytes:
+    """Generate a Markdown document with headings, paragraphs and a table."""
+    parts = ["# Synthetic Benchmark Document\n"]
+    for i in range(paragraphs):
+        if i % 10 == 0:
+            parts.append(f"\n## Section {i // 10 + 1}\n")
+        parts.append(_paragraph(rng) + "\n")
+    parts.append("\n| Item | Quantity | Amount |\n|---|---|---|\n")
+    for i in range(10):
+        parts.append(f"| {rng.choice(VOCABULARY)} | {rng.randint(1, 99)} | {rng.uniform(10, 9999):.2f} |\n")
+    return "\n".join(parts).encode("utf-8")
+
+
+def make_csv(rng: random.Random, rows: int) -> bytes:
+    """Generate a CSV file with mixed text and numeric columns."""
+    lines = ["id,category,description,quantity,amount"]
+    for i in range(rows):
+        lines.append(
+            f"{i},{rng.choice(VOCABULARY)},{_sentence(rng, 4, 8).replace(',', '')},"
+            f"{rng.randint(1, 500)},{rng.uniform(1, 10000):.2f}"
+        )
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def make_docx(rng: random.Random, paragraphs: int) -> bytes:
+    """Generate a minimal DOCX package (no python-docx dependency)."""
+    body = "".join(
+        f"<w:p><w:r><w:t xml:space=\"preserve\">{escape(_paragraph(rng))}</w:t></w:r></w:p>"
+        for _ in range(paragraphs)
+    )
+    files = {
+        "[Content_Types].xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'
+        ),
+        "_rels/.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="word/document.xml"/>'
+            '</Relationships>'
+        ),
+        "word/document.xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f'<w:body>{body}</w:body></w:document>'
+        ),
+    }
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as package:
+        for name, content in files.items():
+            package.writestr(name, content)
+    return buffer.getvalue()
+
+
+def make_pdf(rng: random.Random, pages: int) -> bytes:
+    """Generate a born-digital PDF with a Helvetica text layer on every page."""
+    def pdf_text(value: str) -> str:
+        return value.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    kids = []
+    for page_index in range(pages):
+        page_id, content_id = 4 + 2 * page_index, 5 + 2 * page_index
+        kids.append(f"{page_id} 0 R")
+        lines = [_sentence(rng, 10, 14) for _ in range(55)]
+        stream = "BT /F1 10 Tf 12 TL 50 800 Td\n" + "".join(f"({pdf_text(line)}) '\n" for line in lines) + "ET"
+        stream_bytes = stream.encode("latin-1")
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode("latin-1")
+        objects[content_id] = (
+            f"<< /Length {len(stream_bytes)} >>\nstream\n".encode("latin-1") + stream_bytes + b"\nendstream"
+        )
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode("latin-1")
+
+    output = io.BytesIO()
+    output.write(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = output.tell()
+        output.write(f"{obj_id} 0 obj\n".encode("latin-1") + objects[obj_id] + b"\nendobj\n")
+    xref_offset = output.tell()
+    output.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1"))
+    for obj_id in sorted(objects):
+        output.write(f"{offsets[obj_id]:010d} 00000 n \n".encode("latin-1"))
+    output.write(
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("latin-1")
+    )
+    return output.getvalue()
+
+
+def generate_corpus(corpus_dir: Path, formats: List[str], sizes: List[str], files_per_combo: int,
+                    seed: int) -> List[Dict[str, Any]]:
+    """
+    Generate the benchmark corpus (deterministic for a given seed).
+
+    Returns:
+        List of corpus entries with path, format and size class
+    """
+    corpus_dir.mkdir(parents=True, exist_ok=True)
+    corpus = []
+    for size in sizes:
+        profile = SIZE_PROFILES[size]
+        for fmt in formats:
+            for index in range(files_per_combo):
+                rng = random.Random(f"{seed}-{size}-{fmt}-{index}")
+                if fmt == "pdf":
+                    content = make_pdf(rng, profile["pages"])
+                elif fmt == "docx":
+                    content = make_docx(rng, profile["paragraphs"])
+                elif fmt == "md":
+                    content = make_markdown(rng, profile["paragraphs"])
+                else:
+                    content = make_csv(rng, profile["rows"])
+                path = corpus_dir / f"{size}_{index:02d}.{fmt}"
+                path.write_bytes(content)
+                corpus.append({"path": path, "format": fmt, "size_class": size, "bytes": len(content)})
+    return corpus
+
+
+# ============================================================================
+# Fake Infinity embeddings server
+# ============================================================================
+
+def _fake_vector(text: str, dimension: int) -> List[float]:
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    vector = np.random.default_rng(int.from_bytes(digest, "little")).standard_normal(dimension)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def start_fake_infinity_server(dimension: int, latency_ms: float) -> ThreadingHTTPServer:
+    """Start an OpenAI-compatible /embeddings server on a free local port."""
+
+    class FakeInfinityHandler(BaseHTTPRequestHandler):
+        def _send_json(self, payload: dict):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            texts = request.get("input", [])
+            if isinstance(texts, str):
+                texts = [texts]
+            if latency_ms:
+                time.sleep(latency_ms / 1000.0)
+            self._send_json({
+                "object": "list",
+                "model": request.get("model"),
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": _fake_vector(text, dimension)}
+                    for i, text in enumerate(texts)
+                ],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            })
+
+        def do_GET(self):
+            self._send_json({"data": [{"id": "fake-embedder"}], "status": "ok"})
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeInfinityHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ============================================================================
+# Stage instrumentation
+# ============================================================================
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is reported in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+class StageRecorder:
+    """Accumulates stage durations for the file being ingested on the current thread."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def begin(self, record: Dict[str, Any]):
+        self._local.record = record
+
+    def end(self):
+        self._local.record = None
+
+    def current(self, stage: str) -> float:
+        record = getattr(self._local, "record", None)
+        return record["stages"].get(stage, 0.0) if record else 0.0
+
+    def add(self, stage: str, seconds: float):
+        record = getattr(self._local, "record", None)
+        if record is None:
+            return
+        record["stages"][stage] = record["stages"].get(stage, 0.0) + seconds
+        record["peak_rss_mb"][stage] = max(record["peak_rss_mb"].get(stage, 0.0), _peak_rss_mb())
+
+
+def instrument(recorder: StageRecorder, ingestion_service, vector_store_factory):
+    """
+    Wrap Docling, the embedder and the vector store so each stage is timed.
+
+    parse  - DocumentConverter.convert (and sharded conversions)
+    chunk  - HybridChunker.chunk iteration and contextualize
+    embed  - embed_documents calls on the ingestion service's embedder
+    insert - vector store add_documents (excluding the embedding time inside it)
+             and add_embeddings, used by checkpointed ingestion
+    """
+    from docling.document_converter import DocumentConverter
+    from docling.chunking import HybridChunker
+    from app.services.document_processor import DoclingProcessor
+
+    original_convert = DocumentConverter.convert
+
+    def timed_convert(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original_convert(self, *args, **kwargs)
+        finally:
+            recorder.add("parse", time.perf_counter() - start)
+
+    original_sharded = DoclingProcessor._process_pdf_sharded
+
+    def timed_sharded(self, *args, **kwargs):
+        chunk_before = recorder.current("chunk")
+        start = time.perf_counter()
+        try:
+            return original_sharded(self, *args, **kwargs)
+        finally:
+            chunk_time = recorder.current("chunk") - chunk_before
+            recorder.add("parse", time.perf_counter() - start - chunk_time)
+
+    original_chunk = HybridChunker.chunk
+
+    def timed_chunk(self, *args, **kwargs):
+        iterator = iter(original_chunk(self, *args, **kwargs))
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                recorder.add("chunk", time.perf_counter() - start)
+                return
+            recorder.add("chunk", time.perf_counter() - start)
+            yield item
+
+    original_contextualize = HybridChunker.contextualize
+
+    def timed_contextualize(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original_contextualize(self, *args, **kwargs)
+        finally:
+            recorder.add("chunk", time.perf_counter() - start)
+
+    DocumentConverter.convert = timed_convert
+    DoclingProcessor._process_pdf_sharded = timed_sharded
+    HybridChunker.chunk = timed_chunk
+    HybridChunker.contextualize = timed_contextualize
+
+    embedder = ingestion_service.embeddings
+    original_embed = embedder.embed_documents
+
+    def timed_embed(texts):
+        start = time.perf_counter()
+        try:
+            return original_embed(texts)
+        finally:
+            recorder.add("embed", time.perf_counter() - start)
+
+    embedder.embed_documents = timed_embed
+
+    def timed_vector_store(collection_name: str):
+        store = vector_store_factory(collection_name)
+        if getattr(store, "_benchmark_timed", False):
+            return store
+        original_add = store.add_documents
+        original_add_embeddings = store.add_embeddings
+
+        def timed_add(documents, **kwargs):
+            embed_before = recorder.current("embed")
+            start = time.perf_counter()
+            try:
+                return original_add(documents, **kwargs)
+            finally:
+                embed_time = recorder.current("embed") - embed_before
+                recorder.add("insert", time.perf_counter() - start - embed_time)
+
+        def timed_add_embeddings(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original_add_embeddings(*args, **kwargs)
+            finally:
+                recorder.add("insert", time.perf_counter() - start)
+
+        store.add_documents = timed_add
+        store.add_embeddings = timed_add_embeddings
+        store._benchmark_timed = True
+        return store
+
+    ingestion_service.get_vector_store = timed_vector_store
+
+
+# ============================================================================
+# Benchmark run
+# ============================================================================
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=project_root, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def summarize(records: List[Dict[str, Any]], wall_time: float) -> Dict[str, Any]:
+    """Aggregate per-file records into per-stage statistics."""
+    ok_records = [r for r in records if not r.get("error")]
+    total_bytes = sum(r["bytes"] for r in ok_records)
+    total_chunks = sum(r["chunks"] for r in ok_records)
+    stages = {}
+    for stage in STAGES:
+        latencies = [r["stages"].get(stage, 0.0) for r in ok_records]
+        total = sum(latencies)
+        stages[stage] = {
+            "total_s": round(total, 4),
+            "p50_s": round(float(np.percentile(latencies, 50)), 4) if latencies else None,
+            "p95_s": round(float(np.percentile(latencies, 95)), 4) if latencies else None,
+            "files_per_s": round(len(latencies) / total, 3) if total else None,
+            "mb_per_s": round(total_bytes / 1024 / 1024 / total, 3) if total else None,
+            "chunks_per_s": round(total_chunks / total, 2) if total and stage in ("chunk", "embed", "insert") else None,
+            "peak_rss_mb": round(max((r["peak_rss_mb"].get(stage, 0.0) for r in ok_records), default=0.0), 1),
+        }
+    totals = [r["total_s"] for r in ok_records]
+    return {
+        "files": len(records),
+        "failed": len(records) - len(ok_records),
+        "bytes": total_bytes,
+        "chunks": total_chunks,
+        "wall_time_s": round(wall_time, 3),
+        "files_per_s": round(len(ok_records) / wall_time, 3) if wall_time else None,
+        "p50_file_s": round(float(np.percentile(totals, 50)), 4) if totals else None,
+        "p95_file_s": round(float(np.percentile(totals, 95)), 4) if totals else None,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "stages": stages,
+    }
+
+
+def run_benchmark(args) -> Dict[str, Any]:
+    """Generate the corpus, start stand-ins, ingest every file and collect results."""
+    server = start_fake_infinity_server(args.embed_dim, args.embed_latency_ms)
+    fake_url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"Fake Infinity server listening on {fake_url}")
+
+    # Settings are read at import time, so point the app at the stand-ins first
+    os.environ["INFINITY_API_URL"] = fake_url
+    os.environ["DOCLING_USE_GPU"] = "true" if args.gpu else "false"
+    os.environ["INGESTION_CHECKPOINTS_ENABLED"] = "true" if args.checkpoints else "false"
+    if args.vector_store == "milvus-lite":
+        os.environ["MILVUS_URI"] = str(Path(args.corpus_dir) / "benchmark_milvus.db")
+
+    from app.config import settings
+    from app.services.ingestion_service import DocumentIngestionService
+
+    corpus = generate_corpus(
+        Path(args.corpus_dir), args.formats, args.sizes, args.files_per_combo, args.seed
+    )
+    print(f"Generated {len(corpus)} files in {args.corpus_dir}")
+
+    ingestion_service = DocumentIngestionService()
+
+    if args.vector_store == "memory":
+        from langchain_core.vectorstores import InMemoryVectorStore
+
+        class MemoryVectorStore(InMemoryVectorStore):
+            """InMemoryVectorStore accepting precomputed embeddings, like the Milvus store."""
+
+            def add_embeddings(self, texts, embeddings, metadatas=None, **kwargs):
+                ids = []
+                for index, (text, vector) in enumerate(zip(texts, embeddings)):
+                    metadata = metadatas[index] if metadatas else {}
+                    doc_id = metadata.get("chunk_id") or str(uuid.uuid4())
+                    self.store[doc_id] = {"id": doc_id, "vector": vector, "text": text, "metadata": metadata}
+                    ids.append(doc_id)
+                return ids
+
+        stores: Dict[str, MemoryVectorStore] = {}
+        stores_lock = threading.Lock()
+
+        def vector_store_factory(collection_name: str):
+            with stores_lock:
+                if collection_name not in stores:
+                    stores[collection_name] = MemoryVectorStore(embedding=ingestion_service.embeddings)
+                return stores[collection_name]
+
+        ingestion_service.vectorstore_manager.collection_exists = lambda name: name in stores
+    else:
+        vector_store_factory = DocumentIngestionService.get_vector_store.__get__(ingestion_service)
+
+    recorder = StageRecorder()
+    instrument(recorder, ingestion_service, vector_store_factory)
+
+    collection_name = f"benchmark_{int(time.time())}"
+
+    # Distinct source IDs, so checkpointed runs don't share (and reset) one checkpoint
+    source_ids = {id(entry): index + 1 for index, entry in enumerate(corpus)}
+
+    def ingest(entry: Dict[str, Any]) -> Dict[str, Any]:
+        record = {
+            "file": entry["path"].name,
+            "format": entry["format"],
+            "size_class": entry["size_class"],
+            "bytes": entry["bytes"],
+            "chunks": 0,
+            "stages": {},
+            "peak_rss_mb": {},
+        }
+        recorder.begin(record)
+        start = time.perf_counter()
+        try:
+            # Stand-in for MinioService.download_file, which returns a BytesIO
+            download_start = time.perf_counter()
+            file_data = io.BytesIO(entry["path"].read_bytes())
+            recorder.add("download", time.perf_counter() - download_start)
+
+            record["chunks"] = ingestion_service.ingest_file_object(
+                file_obj=file_data,
+                filename=entry["path"].name,
+                collection_name=collection_name,
+                metadata={"source_file_id": source_ids.get(id(entry), 0), "file_name": entry["path"].name},
+                ocr_mode=args.ocr_mode,
+                table_mode=args.table_mode
+            )
+        except Exception as e:
+            record["error"] = str(e)
+            print(f"  ✗ {entry['path'].name}: {e}")
+        finally:
+            record["total_s"] = round(time.perf_counter() - start, 4)
+            record["stages"] = {stage: round(value, 4) for stage, value in record["stages"].items()}
+            recorder.end()
+        if not record.get("error"):
+            print(f"  ✓ {record['file']}: {record['chunks']} chunks in {record['total_s']:.2f}s")
+        return record
+
+    # Warm-up run so model loading is not attributed to the first measured file
+    if args.warmup and corpus:
+        print("Warm-up ingestion...")
+        # A copy gets source ID 0, so the measured run doesn't resume the warm-up's checkpoint
+        ingest(dict(corpus[0]))
+
+    print(f"Ingesting {len(corpus)} files (concurrency={args.concurrency})...")
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        records = list(executor.map(ingest, corpus))
+    wall_time = time.perf_counter() - wall_start
+
+    server.shutdown()
+
+    return {
+        "meta": {
+            "benchmark": "ingestion",
+            "commit": _git_commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "vector_store": args.vector_store,
+            "embed_dim": args.embed_dim,
+            "embed_latency_ms": args.embed_latency_ms,
+            "concurrency": args.concurrency,
+            "ocr_mode": args.ocr_mode,
+            "table_mode": args.table_mode,
+            "formats": args.formats,
+            "sizes": args.sizes,
+            "files_per_combo": args.files_per_combo,
+            "seed": args.seed,
+            "docling_shard_workers": settings.DOCLING_SHARD_WORKERS,
+            "checkpoints": args.checkpoints,
+        },
+        "summary": summarize(records, wall_time),
+        "files": records,
+    }
+
+
+# ============================================================================
+# Reporting
+# ============================================================================
+
+def print_summary(results: Dict[str, Any]):
+    summary = results["summary"]
+    print("\n=== Ingestion Benchmark Results ===")
+    print(f"Commit: {results['meta']['commit']}  Files: {summary['files']} (failed: {summary['failed']})  "
+          f"Chunks: {summary['chunks']}  Wall: {summary['wall_time_s']}s  Peak RSS: {summary['peak_rss_mb']} MB")
+    print(f"{'stage':<10}{'total_s':>10}{'p50_s':>10}{'p95_s':>10}{'files/s':>10}{'MB/s':>10}{'chunks/s':>10}{'rss_mb':>10}")
+    for stage, stats in summary["stages"].items():
+        row = [stats[key] for key in ("total_s", "p50_s", "p95_s", "files_per_s", "mb_per_s", "chunks_per_s", "peak_rss_mb")]
+        print(f"{stage:<10}" + "".join(f"{'-' if value is None else value:>10}" for value in row))
+
+
+def compare_results(baseline_path: str, candidate_path: str):
+    """Print per-stage deltas between two result files."""
+    baseline = json.loads(Path(baseline_path).read_text())
+    candidate = json.loads(Path(candidate_path).read_text())
+    print(f"\n=== Comparing {baseline['meta']['commit']} -> {candidate['meta']['commit']} ===")
+    print(f"{'stage':<10}{'metric':<12}{'baseline':>12}{'candidate':>12}{'delta':>10}")
+
+    def row(stage: str, metric: str, old, new):
+        if old in (None, 0) or new is None:
+            delta = "-"
+        else:
+            delta = f"{(new - old) / old * 100:+.1f}%"
+        print(f"{stage:<10}{metric:<12}{'-' if old is None else old:>12}{'-' if new is None else new:>12}{delta:>10}")
+
+    for stage in STAGES:
+        old_stats = baseline["summary"]["stages"].get(stage, {})
+        new_stats = candidate["summary"]["stages"].get(stage, {})
+        for metric in ("p50_s", "p95_s", "files_per_s", "peak_rss_mb"):
+            row(stage, metric, old_stats.get(metric), new_stats.get(metric))
+    row("total", "wall_time_s", baseline["summary"]["wall_time_s"], candidate["summary"]["wall_time_s"])
+    row("total", "peak_rss_mb", baseline["summary"]["peak_rss_mb"], candidate["summary"]["peak_rss_mb"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark document ingestion with local stand-ins")
+    parser.add_argument("--formats", default=",".join(FORMATS), help="Comma-separated formats (pdf,docx,md,csv)")
+    parser.add_argument("--sizes", default="small,medium", help="Comma-separated size classes (small,medium,large)")
+    parser.add_argument("--files-per-combo", type=int, default=2, help="Files per format/size combination")
+    parser.add_argument("--seed", type=int, default=42, help="Corpus generation seed")
+    parser.add_argument("--corpus-dir", default="/tmp/ingestion_benchmark", help="Where to write the corpus")
+    parser.add_argument("--vector-store", choices=["memory", "milvus-lite"], default="memory")
+    parser.add_argument("--embed-dim", type=int, default=1024, help="Fake embedding dimension")
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0, help="Simulated latency per embedding request")
+    parser.add_argument("--concurrency", type=int, default=1, help="Files ingested in parallel")
+    parser.add_argument("--ocr-mode", choices=["off", "auto", "force"], default="auto")
+    parser.add_argument("--table-mode", choices=["off", "auto", "force"], default="auto")
+    parser.add_argument("--gpu", action="store_true", help="Allow Docling to use the GPU")
+    parser.add_argument("--checkpoints", action="store_true",
+                        help="Use checkpointed ingestion (needs the PostgreSQL database from DATABASE_URL)")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false", help="Skip the warm-up ingestion")
+    parser.add_argument("--output", help="Path for the JSON results")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"), help="Compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_results(*args.compare)
+        return
+
+    args.formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    args.sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    for fmt in args.formats:
+        if fmt not in FORMATS:
+            parser.error(f"Unknown format: {fmt}")
+    for size in args.sizes:
+        if size not in SIZE_PROFILES:
+            parser.error(f"Unknown size class: {size}")
+
+    results = run_benchmark(args)
+    print_summary(results)
+
+    output = args.output or os.path.join(
+        "benchmark-results",
+        f"ingestion-{results['meta']['commit'] or 'unknown'}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    Path(output).write_text(json.dumps(results, indent=2))
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
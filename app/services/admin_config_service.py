@@ -1,13 +1,115 @@
 from typing import Any, Dict, List, Optional, Union
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+import copy
 import json
+import logging
+import threading
+import time
 
 from app.models.admin_config import AdminConfig
 from app.config import settings
+from app.services.notification_service import config_change_listener, publish_config_change
+
+logger = logging.getLogger("admin_config_service")
+
+ADMIN_CONFIG_CHANGE = "admin_config"
+
+# Allowed values for the PDF OCR / table structure policies
+PDF_PROCESSING_MODES = ("off", "auto", "force")
 
 class AdminConfigService:
-    """Service for managing unified system configurations."""
-    
+    """
+    Service for managing unified system configurations.
+
+    Reads are served from a process-local snapshot of the admin_config table that
+    is loaded in one query and dropped whenever a config is written (in every
+    worker, via the config change listener), with a TTL as a safety net.
+    """
+
+    _cache: Optional[Dict[str, Any]] = None
+    _cache_loaded_at = 0.0
+    _cache_generation = 0
+    _cache_lock = threading.Lock()
+
+    @staticmethod
+    def _convert_value(value: str, value_type: Optional[str]) -> Any:
+        """Convert a stored string value based on its value_type."""
+        if value_type == "int":
+            return int(value)
+        elif value_type == "float":
+            return float(value)
+        elif value_type == "boolean":
+            return value.lower() == "true"
+        elif value_type == "json":
+            return json.loads(value)
+
+        # Return as string for other types
+        return value
+
+    @staticmethod
+    def _cached_snapshot():
+        """Return (snapshot or None if stale, generation) of the cache."""
+        cls = AdminConfigService
+        with cls._cache_lock:
+            if cls._cache is not None and time.monotonic() - cls._cache_loaded_at < settings.ADMIN_CONFIG_CACHE_TTL_SECONDS:
+                return cls._cache, cls._cache_generation
+            return None, cls._cache_generation
+
+    @staticmethod
+    def _build_snapshot(rows, generation: int) -> Dict[str, Any]:
+        """Convert (key, value, value_type) rows into a snapshot and cache it."""
+        cls = AdminConfigService
+        snapshot = {}
+        for key, value, value_type in rows:
+            try:
+                snapshot[key] = cls._convert_value(value, value_type)
+            except (ValueError, TypeError) as e:
+                logger.warning(f"Ignoring admin config {key} with invalid {value_type} value: {e}")
+
+        with cls._cache_lock:
+            # Don't store a snapshot that an invalidation raced with
+            if generation == cls._cache_generation:
+                cls._cache = snapshot
+                cls._cache_loaded_at = time.monotonic()
+        return snapshot
+
+    @staticmethod
+    def _get_snapshot(db: Session) -> Dict[str, Any]:
+        """Get the cached key -> value snapshot, loading it from the database if needed."""
+        snapshot, generation = AdminConfigService._cached_snapshot()
+        if snapshot is not None:
+            return snapshot
+        rows = db.query(AdminConfig.key, AdminConfig.value, AdminConfig.value_type).all()
+        return AdminConfigService._build_snapshot(rows, generation)
+
+    @staticmethod
+    async def _aget_snapshot(db) -> Dict[str, Any]:
+        """Async variant of _get_snapshot for an AsyncSession."""
+        snapshot, generation = AdminConfigService._cached_snapshot()
+        if snapshot is not None:
+            return snapshot
+        result = await db.execute(select(AdminConfig.key, AdminConfig.value, AdminConfig.value_type))
+        return AdminConfigService._build_snapshot(result.all(), generation)
+
+    @staticmethod
+    def invalidate_cache(payload: Optional[dict] = None):
+        """Drop the cached config snapshot of this worker."""
+        cls = AdminConfigService
+        with cls._cache_lock:
+            cls._cache = None
+            cls._cache_generation += 1
+        logger.debug(f"Admin config cache invalidated: {payload}")
+
+    @staticmethod
+    def _notify_changed(key: str):
+        """Invalidate the config snapshot in every worker."""
+        try:
+            publish_config_change(ADMIN_CONFIG_CHANGE, key=key)
+        except Exception as e:
+            logger.error(f"Error publishing admin config change for {key}: {e}")
+            AdminConfigService.invalidate_cache()
+
     @staticmethod
     def initialize_default_configs(db: Session):
         """
@@ -40,6 +142,25 @@ class AdminConfigService:
                     "rag"
                 )
         
+        # Document processing defaults
+        processing_defaults = {
+            AdminConfig.KEY_PDF_OCR_MODE: settings.PDF_OCR_MODE,
+            AdminConfig.KEY_PDF_TABLE_MODE: settings.PDF_TABLE_MODE,
+        }
+        for key, default_value in processing_defaults.items():
+            existing_config = db.query(AdminConfig).filter(
+                AdminConfig.key == key,
+                AdminConfig.category == "processing"
+            ).first()
+            if not existing_config:
+                AdminConfigService.set_config(
+                    db,
+                    key,
+                    default_value,
+                    f"Default document processing setting: {key}",
+                    "processing"
+                )
+        
         # Note: No explicit commit here as set_config handles its own commit.
         # However, if this function were to do multiple set_config calls that should
         # be atomic as a group, a session commit at the end (managed by the caller)
@@ -59,9 +180,27 @@ class AdminConfigService:
         Returns:
             Configuration value
         """
-        config = db.query(AdminConfig).filter(AdminConfig.key == key).first()
+        return AdminConfigService._lookup(AdminConfigService._get_snapshot(db), key, default_value)
+
+    @staticmethod
+    async def aget_config(db, key: str, default_value: Optional[Any] = None) -> Any:
+        """
+        Get a configuration value by key using an AsyncSession.
         
-        if not config:
+        Args:
+            db: Async database session
+            key: Configuration key
+            default_value: Default value if key is not found
+            
+        Returns:
+            Configuration value
+        """
+        return AdminConfigService._lookup(await AdminConfigService._aget_snapshot(db), key, default_value)
+
+    @staticmethod
+    def _lookup(snapshot: Dict[str, Any], key: str, default_value: Optional[Any] = None) -> Any:
+        """Resolve a key from a snapshot, falling back to defaults."""
+        if key not in snapshot:
             # Return default from parameters or from settings
             if default_value is not None:
                 return default_value
@@ -77,21 +216,18 @@ class AdminConfigService:
                 return 10  # Default 10MB
             elif key == AdminConfig.KEY_GLOBAL_COLLECTION_BEHAVIOR:
                 return "auto_update"  # Default behavior
+            elif key == AdminConfig.KEY_PDF_OCR_MODE:
+                return settings.PDF_OCR_MODE
+            elif key == AdminConfig.KEY_PDF_TABLE_MODE:
+                return settings.PDF_TABLE_MODE
             
             return None
             
-        # Convert value based on value_type
-        if config.value_type == "int":
-            return int(config.value)
-        elif config.value_type == "float":
-            return float(config.value)
-        elif config.value_type == "boolean":
-            return config.value.lower() == "true"
-        elif config.value_type == "json":
-            return json.loads(config.value)
-        
-        # Return as string for other types
-        return config.value
+        value = snapshot[key]
+        # JSON values are shared through the cache; hand out a copy
+        if isinstance(value, (dict, list)):
+            return copy.deepcopy(value)
+        return value
         
     @staticmethod
     def set_config(db: Session, key: str, value: Any, description: Optional[str] = None, 
@@ -151,6 +287,7 @@ class AdminConfigService:
             
         db.commit()
         db.refresh(config)
+        AdminConfigService._notify_changed(key)
         
         return config
         
@@ -199,6 +336,7 @@ class AdminConfigService:
             
         db.delete(config)
         db.commit()
+        AdminConfigService._notify_changed(key)
         
         return True
         
@@ -426,4 +564,85 @@ class AdminConfigService:
             db,
             AdminConfig.KEY_REGULAR_CHAT_PROMPT,
             None  # No default system prompt for regular chat
-        )
\ No newline at end of file
+        )
+
+    @staticmethod
+    def get_pdf_ocr_mode(db: Session) -> str:
+        """
+        Get the OCR policy applied to PDF ingestion.
+        
+        Args:
+            db: Database session
+            
+        Returns:
+            One of 'off', 'auto' or 'force'
+        """
+        mode = AdminConfigService.get_config(
+            db,
+            AdminConfig.KEY_PDF_OCR_MODE,
+            settings.PDF_OCR_MODE
+        )
+        return mode if mode in PDF_PROCESSING_MODES else "auto"
+
+    @staticmethod
+    def get_pdf_table_mode(db: Session) -> str:
+        """
+        Get the table structure policy applied to PDF ingestion.
+        
+        Args:
+            db: Database session
+            
+        Returns:
+            One of 'off', 'auto' or 'force'
+        """
+        mode = AdminConfigService.get_config(
+            db,
+            AdminConfig.KEY_PDF_TABLE_MODE,
+            settings.PDF_TABLE_MODE
+        )
+        return mode if mode in PDF_PROCESSING_MODES else "auto"
+
+    @staticmethod
+    def set_pdf_processing_modes(db: Session, ocr_mode: Optional[str] = None,
+                                 table_mode: Optional[str] = None) -> Dict[str, str]:
+        """
+        Set the OCR and table structure policies for PDF ingestion.
+        
+        Args:
+            db: Database session
+            ocr_mode: 'off', 'auto' or 'force' (unchanged if None)
+            table_mode: 'off', 'auto' or 'force' (unchanged if None)
+            
+        Returns:
+            Dictionary with the current ocr_mode and table_mode
+        """
+        for mode in (ocr_mode, table_mode):
+            if mode is not None and mode not in PDF_PROCESSING_MODES:
+                raise ValueError(f"Mode must be one of {', '.join(PDF_PROCESSING_MODES)}")
+        
+        if ocr_mode is not None:
+            AdminConfigService.set_config(
+                db,
+                AdminConfig.KEY_PDF_OCR_MODE,
+                ocr_mode,
+                "OCR policy for PDF ingestion (off, auto, force)",
+                "processing",
+                "string"
+            )
+        if table_mode is not None:
+            AdminConfigService.set_config(
+                db,
+                AdminConfig.KEY_PDF_TABLE_MODE,
+                table_mode,
+                "Table structure policy for PDF ingestion (off, auto, force)",
+                "processing",
+                "string"
+            )
+        
+        return {
+            "ocr_mode": AdminConfigService.get_pdf_ocr_mode(db),
+            "table_mode": AdminConfigService.get_pdf_table_mode(db)
+        }
+
+
+config_change_listener.register(ADMIN_CONFIG_CHANGE, AdminConfigService.invalidate_cache)
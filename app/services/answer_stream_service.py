@@ -0,0 +1,426 @@
+import asyncio
+import logging
+import uuid
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Optional, Set
+
+from app.config import settings
+from app.db import crud
+from app.db.database import SessionLocal
+from app.services.metrics import CHAT_STREAMS_IN_FLIGHT
+from app.services.notification_service import answer_stream_broker, publish_answer_stream_event
+
+logger = logging.getLogger("answer_stream_service")
+
+# How often a reconnect served by another worker checks whether the answer was saved
+SAVED_ANSWER_POLL_SECONDS = 1.0
+
+# Answer characters per relayed chunk; JSON escaping keeps this below the 8000 byte NOTIFY limit
+RELAY_CHUNK_CHARS = 600
+
+# Heartbeats a relay or a reader may miss before the other side is considered gone
+RELAY_MISSED_HEARTBEATS = 3
+
+
+class StreamExpired(Exception):
+    """The requested part of an answer is no longer buffered and was not saved."""
+
+
+class AnswerStream:
+    """
+    Buffered output of one streamed answer.
+
+    Generation runs in its own task and appends to the buffer; the original
+    response and any reconnects read from it by character offset. Only the last
+    STREAM_BUFFER_MAX_CHARS characters are kept.
+    """
+
+    def __init__(self, stream_id: str, conversation_id: str, user_id: int, max_chars: int):
+        self.stream_id = stream_id
+        self.conversation_id = conversation_id
+        self.user_id = user_id
+        self.max_chars = max_chars
+        self.start_offset = 0
+        self.end_offset = 0
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.consumers = 0
+        self.task: Optional[asyncio.Task] = None
+        # Readers on other workers: last heartbeat time and the task relaying to them
+        self.remote_readers: Dict[str, float] = {}
+        self.relays: Dict[str, asyncio.Task] = {}
+        self._chunks: Deque[str] = deque()
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def append(self, text: str):
+        self._chunks.append(text)
+        self.end_offset += len(text)
+        while len(self._chunks) > 1 and self.end_offset - self.start_offset > self.max_chars:
+            self.start_offset += len(self._chunks.popleft())
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.finished = True
+        self.error = error
+        self._notify()
+
+    def text_from(self, offset: int) -> str:
+        """Buffered text from a character offset to the end."""
+        if offset < self.start_offset:
+            raise StreamExpired(f"Offset {offset} of stream {self.stream_id} is no longer buffered")
+        parts = []
+        position = self.end_offset
+        # Readers are usually close to the end, so walk back from there
+        for chunk in reversed(self._chunks):
+            if position <= offset:
+                break
+            start = position - len(chunk)
+            parts.append(chunk[max(0, offset - start):])
+            position = start
+        return "".join(reversed(parts))
+
+    async def iter_from(self, offset: int = 0) -> AsyncIterator[str]:
+        """
+        Read the answer from a character offset until generation ends.
+
+        Args:
+            offset: Number of answer characters the reader already has
+
+        Yields:
+            Answer text following the offset
+
+        Raises:
+            StreamExpired: If the reader fell behind the buffer
+        """
+        self.consumers += 1
+        try:
+            while True:
+                changed = self._changed
+                if offset < self.end_offset:
+                    text = self.text_from(offset)
+                    offset += len(text)
+                    yield text
+                    continue
+                if self.finished:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await changed.wait()
+        finally:
+            self.consumers -= 1
+            if self.consumers == 0:
+                answer_stream_service.on_detached(self)
+
+
+class AnswerStreamService:
+    """
+    Per-worker registry of resumable answer streams.
+
+    A stream keeps generating for STREAM_RESUME_GRACE_SECONDS after its last
+    reader disconnects, so a client on a flaky network can reconnect and resume
+    instead of asking again. After that the generation is cancelled and the
+    partial answer is saved as truncated. Finished streams stay buffered for
+    STREAM_BUFFER_TTL_SECONDS; later reconnects replay the answer saved with the
+    stream ID.
+
+    A reconnect served by another uvicorn worker asks the generating worker,
+    over the answer_streams Postgres channel, to relay the stream. The relay
+    counts as a reader, so generation continues while the remote reader sends
+    heartbeats. Sticky routing of /stream/{stream_id} to the generating worker
+    is therefore not required, but it avoids the relay round trips.
+    """
+
+    def __init__(self):
+        self._streams: Dict[str, AnswerStream] = {}
+        self._background: Set[asyncio.Task] = set()
+        answer_stream_broker.set_request_handler(self._handle_relay_request)
+
+    @staticmethod
+    def new_stream_id() -> str:
+        return str(uuid.uuid4())
+
+    def get(self, stream_id: str) -> Optional[AnswerStream]:
+        return self._streams.get(stream_id)
+
+    def start(self, stream_id: str, conversation_id: str, user_id: int, chunks: AsyncIterator[str]) -> AnswerStream:
+        """
+        Start generating an answer into a new buffer.
+
+        Must be called from the event loop.
+
+        Args:
+            stream_id: ID of the stream
+            conversation_id: Conversation the answer belongs to
+            user_id: Owner of the conversation
+            chunks: Answer stream from one of the streaming services
+
+        Returns:
+            The buffered stream
+        """
+        stream = AnswerStream(stream_id, conversation_id, user_id, settings.STREAM_BUFFER_MAX_CHARS)
+        self._streams[stream_id] = stream
+        stream.task = asyncio.get_running_loop().create_task(self._produce(stream, chunks))
+        return stream
+
+    async def _produce(self, stream: AnswerStream, chunks: AsyncIterator[str]):
+        CHAT_STREAMS_IN_FLIGHT.inc()
+        try:
+            async for text in chunks:
+                if text:
+                    stream.append(text)
+        except asyncio.CancelledError:
+            stream.finish()
+            raise
+        except Exception as e:
+            stream.finish(error=e)
+        else:
+            stream.finish()
+        finally:
+            CHAT_STREAMS_IN_FLIGHT.dec()
+            asyncio.get_running_loop().call_later(
+                settings.STREAM_BUFFER_TTL_SECONDS, self._streams.pop, stream.stream_id, None
+            )
+
+    def on_detached(self, stream: AnswerStream):
+        """Give a stream without readers a grace period before stopping its generation."""
+        if stream.finished:
+            return
+        asyncio.get_running_loop().call_later(settings.STREAM_RESUME_GRACE_SECONDS, self._abandon_if_idle, stream)
+
+    def _abandon_if_idle(self, stream: AnswerStream):
+        if stream.consumers == 0 and not stream.finished and stream.task is not None:
+            print(f"DEBUG: No reader reconnected to stream {stream.stream_id}, cancelling generation")
+            stream.task.cancel()
+
+    def _publish_later(self, event: dict):
+        """Publish a relay event from synchronous code, logging failures."""
+        task = asyncio.get_running_loop().create_task(self._publish_quietly(event))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    @staticmethod
+    async def _publish_quietly(event: dict):
+        try:
+            await publish_answer_stream_event(event)
+        except Exception as e:
+            logger.warning(f"Failed to publish {event.get('type')} for stream {event.get('stream_id')}: {e}")
+
+    def _handle_relay_request(self, event: dict):
+        """Serve attach, heartbeat and detach requests for streams generated on this worker."""
+        stream = self._streams.get(event.get("stream_id"))
+        reader = event.get("reader")
+        if stream is None or not reader:
+            return
+        kind = event.get("type")
+        if kind == "detach":
+            stream.remote_readers.pop(reader, None)
+            relay = stream.relays.pop(reader, None)
+            if relay is not None:
+                relay.cancel()
+            return
+        if event.get("user_id") != stream.user_id:
+            self._publish_later({"type": "denied", "stream_id": stream.stream_id, "reader": reader})
+            return
+        if kind == "attach" and reader not in stream.relays:
+            stream.remote_readers[reader] = asyncio.get_running_loop().time()
+            stream.relays[reader] = asyncio.get_running_loop().create_task(
+                self._relay(stream, reader, int(event.get("offset", 0)))
+            )
+        elif kind == "heartbeat" and reader in stream.relays:
+            stream.remote_readers[reader] = asyncio.get_running_loop().time()
+
+    async def _relay(self, stream: AnswerStream, reader: str, offset: int):
+        """
+        Send a stream to a reader on another worker until generation ends or the reader goes away.
+
+        Args:
+            stream: Stream generated on this worker
+            reader: ID of the remote reader
+            offset: Number of answer characters the reader already has
+        """
+        loop = asyncio.get_running_loop()
+        heartbeat = settings.STREAM_RELAY_HEARTBEAT_SECONDS
+        interval = settings.STREAM_RELAY_INTERVAL_MS / 1000
+        base = {"stream_id": stream.stream_id, "reader": reader}
+        stream.consumers += 1
+        try:
+            await publish_answer_stream_event({**base, "type": "attached"})
+            while True:
+                if loop.time() - stream.remote_readers.get(reader, 0.0) > RELAY_MISSED_HEARTBEATS * heartbeat:
+                    print(f"DEBUG: Remote reader of stream {stream.stream_id} stopped sending heartbeats")
+                    return
+                changed = stream._changed
+                if offset < stream.end_offset:
+                    text = stream.text_from(offset)
+                    for start in range(0, len(text), RELAY_CHUNK_CHARS):
+                        piece = text[start:start + RELAY_CHUNK_CHARS]
+                        await publish_answer_stream_event({**base, "type": "chunk", "offset": offset, "text": piece})
+                        offset += len(piece)
+                    if not stream.finished:
+                        # Let tokens accumulate so each notification carries several
+                        await asyncio.sleep(interval)
+                    continue
+                if stream.finished:
+                    await publish_answer_stream_event({**base, "type": "end", "error": stream.error is not None})
+                    return
+                try:
+                    await asyncio.wait_for(changed.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    # Keepalive while the model is slow, so the reader doesn't give up
+                    await publish_answer_stream_event({**base, "type": "attached"})
+        except StreamExpired:
+            await self._publish_quietly({**base, "type": "expired"})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Relay of stream {stream.stream_id} failed: {e}")
+        finally:
+            stream.consumers -= 1
+            if stream.relays.get(reader) is asyncio.current_task():
+                stream.relays.pop(reader, None)
+            stream.remote_readers.pop(reader, None)
+            if stream.consumers == 0:
+                self.on_detached(stream)
+
+    async def _read_remote(self, stream_id: str, user_id: int, offset: int) -> AsyncIterator[str]:
+        """
+        Read a stream generated on another worker through the relay.
+
+        Args:
+            stream_id: ID of the stream
+            user_id: ID of the requesting user
+            offset: Number of answer characters the client already has
+
+        Yields:
+            Answer text following the offset
+
+        Raises:
+            StreamExpired: If no worker relays the stream, or the relay breaks off
+            PermissionError: If the stream belongs to another user
+        """
+        loop = asyncio.get_running_loop()
+        heartbeat = settings.STREAM_RELAY_HEARTBEAT_SECONDS
+        reader = str(uuid.uuid4())
+        base = {"stream_id": stream_id, "reader": reader, "user_id": user_id}
+        queue = answer_stream_broker.subscribe(reader)
+        try:
+            await publish_answer_stream_event({**base, "type": "attach", "offset": offset})
+            try:
+                event = await asyncio.wait_for(queue.get(), settings.STREAM_RELAY_ATTACH_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                raise StreamExpired(f"No worker is generating stream {stream_id}")
+            last_event = next_heartbeat = loop.time()
+            next_heartbeat += heartbeat
+            while True:
+                kind = event.get("type")
+                if kind == "denied":
+                    raise PermissionError("You don't have access to this stream")
+                if kind == "expired":
+                    raise StreamExpired(f"Offset {offset} of stream {stream_id} is no longer buffered")
+                if kind == "end":
+                    if event.get("error"):
+                        raise StreamExpired(f"Generation of stream {stream_id} failed")
+                    return
+                if kind == "chunk":
+                    start = event.get("offset", 0)
+                    if start > offset:
+                        raise StreamExpired(f"Missed part of stream {stream_id}")
+                    text = event.get("text", "")[offset - start:]
+                    if text:
+                        offset += len(text)
+                        yield text
+
+                while True:
+                    now = loop.time()
+                    if now - last_event > RELAY_MISSED_HEARTBEATS * heartbeat:
+                        raise StreamExpired(f"Relay of stream {stream_id} stopped")
+                    if now >= next_heartbeat:
+                        await publish_answer_stream_event({**base, "type": "heartbeat", "offset": offset})
+                        next_heartbeat = now + heartbeat
+                    try:
+                        event = await asyncio.wait_for(queue.get(), next_heartbeat - now)
+                        last_event = loop.time()
+                        break
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            answer_stream_broker.unsubscribe(reader)
+            self._publish_later({**base, "type": "detach"})
+
+    @staticmethod
+    def _load_saved_answer(stream_id: str):
+        db = SessionLocal()
+        try:
+            message = crud.get_message_by_stream_id(db, stream_id)
+            if message is None:
+                return None
+            return message.content, message.conversation.user_id, message.is_truncated
+        finally:
+            db.close()
+
+    async def _wait_for_saved_answer(self, stream_id: str, timeout: float):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            saved = await asyncio.to_thread(self._load_saved_answer, stream_id)
+            if saved is not None or loop.time() >= deadline:
+                return saved
+            await asyncio.sleep(SAVED_ANSWER_POLL_SECONDS)
+
+    async def read(self, stream_id: str, user_id: int, offset: int = 0) -> AsyncIterator[str]:
+        """
+        Resume an answer from a character offset without generating it again.
+
+        Reads from this worker's buffer, or through the relay from the worker
+        generating the answer, while it has the requested text. Otherwise waits up
+        to STREAM_RESUME_WAIT_SECONDS for the saved answer and replays it.
+
+        Args:
+            stream_id: ID of the stream
+            user_id: ID of the requesting user
+            offset: Number of answer characters the client already has
+
+        Yields:
+            Answer text following the offset
+
+        Raises:
+            StreamExpired: If the answer is neither buffered nor saved
+            PermissionError: If the stream belongs to another user
+        """
+        stream = self.get(stream_id)
+        if stream is not None:
+            if stream.user_id != user_id:
+                raise PermissionError("You don't have access to this stream")
+            try:
+                async for text in stream.iter_from(offset):
+                    yield text
+                    offset += len(text)
+                return
+            except StreamExpired:
+                # Fell behind the buffer: replay the saved answer once it is stored
+                while not stream.finished:
+                    await asyncio.sleep(SAVED_ANSWER_POLL_SECONDS)
+        else:
+            try:
+                async for text in self._read_remote(stream_id, user_id, offset):
+                    yield text
+                    offset += len(text)
+                return
+            except StreamExpired as e:
+                print(f"DEBUG: {e}, waiting for the saved answer")
+
+        saved = await self._wait_for_saved_answer(stream_id, settings.STREAM_RESUME_WAIT_SECONDS)
+        if saved is None:
+            raise StreamExpired(f"Stream {stream_id} not found")
+        content, owner_id, _ = saved
+        if owner_id != user_id:
+            raise PermissionError("You don't have access to this stream")
+        if offset < len(content):
+            yield content[offset:]
+
+
+answer_stream_service = AnswerStreamService()
@@ -0,0 +1,146 @@
+import hashlib
+import logging
+import re
+import time
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import text
+
+from app.db import crud
+from app.db.database import SessionLocal, engine
+from app.services.collection_sync_service import CollectionSyncService
+from app.services.rag_service import GENERATION_SEPARATOR, RemoteVectorStoreManager
+from app.utils.string_utils import sanitize_collection_name
+
+logger = logging.getLogger("collection_rebuild_service")
+
+def generation_name(alias: str, generation: int) -> str:
+    """Name of the physical collection holding a generation of an aliased collection."""
+    return f"{alias}{GENERATION_SEPARATOR}{generation}"
+
+
+class CollectionRebuildService:
+    """
+    Blue/green rebuilds of admin collections.
+
+    A rebuild ingests every file of the collection into a new shadow generation,
+    builds its index and loads it, then atomically swaps the admin_<name> alias that
+    RagChatService searches through. Conversations keep querying the previous
+    generation until the swap, so they never see a half-populated collection. The
+    previous generation is released and kept for rollback; older ones are dropped.
+    """
+
+    def __init__(self, sync_service: CollectionSyncService, vector_store_manager: RemoteVectorStoreManager):
+        self.sync_service = sync_service
+        self.vector_store_manager = vector_store_manager
+
+    def list_generations(self, alias: str) -> List[Tuple[int, str]]:
+        """
+        List the physical generations of an aliased collection.
+
+        Args:
+            alias: Alias name
+
+        Returns:
+            (generation, collection_name) tuples in ascending order
+        """
+        pattern = re.compile(rf"^{re.escape(alias)}{GENERATION_SEPARATOR}(\d+)$")
+        generations = []
+        for name in self.vector_store_manager.list_collections(physical=True):
+            match = pattern.match(name)
+            if match:
+                generations.append((int(match.group(1)), name))
+        return sorted(generations)
+
+    def get_status(self, alias: str) -> Dict[str, Any]:
+        """Describe which generation an alias currently serves."""
+        return {
+            "alias": alias,
+            "live_collection": self.vector_store_manager.resolve_alias(alias),
+            "generations": [name for _, name in self.list_generations(alias)]
+        }
+
+    def rebuild_admin_collection(self, collection_id: int, allow_partial: bool = False) -> Dict[str, Any]:
+        """
+        Rebuild an admin collection into a shadow generation and swap it in.
+
+        Args:
+            collection_id: ID of the collection
+            allow_partial: Swap even if some files failed to ingest
+
+        Returns:
+            Rebuild summary
+        """
+        start_time = time.time()
+        db = SessionLocal()
+        try:
+            collection = crud.get_collection(db, collection_id)
+            if not collection:
+                raise ValueError(f"Collection with ID {collection_id} not found")
+            alias = sanitize_collection_name(f"admin_{collection.name}")
+        finally:
+            db.close()
+
+        # Only one rebuild per collection across all workers
+        lock_key = int.from_bytes(hashlib.sha1(alias.encode("utf-8")).digest()[:8], "big", signed=True)
+        with engine.connect() as lock_conn:
+            if not lock_conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": lock_key}).scalar():
+                raise RuntimeError(f"A rebuild of '{collection.name}' is already running")
+            try:
+                return self._rebuild(collection_id, alias, allow_partial, start_time)
+            finally:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": lock_key})
+
+    def _rebuild(self, collection_id: int, alias: str, allow_partial: bool, start_time: float) -> Dict[str, Any]:
+        generations = self.list_generations(alias)
+        live_collection = self.vector_store_manager.resolve_alias(alias)
+        shadow = generation_name(alias, (generations[-1][0] + 1) if generations else 1)
+        logger.info(f"Rebuilding {alias} into shadow collection {shadow} (live: {live_collection or alias})")
+
+        # STEP 1: Ingest all files into the shadow generation
+        sync_summary = self.sync_service.sync_admin_collection(collection_id, milvus_collection_name=shadow)
+        ingested = len(sync_summary["added"])
+        if not ingested or (sync_summary["failed"] and not allow_partial):
+            logger.error(f"Rebuild of {alias} aborted: {ingested} files ingested, {len(sync_summary['failed'])} failed")
+            if self.vector_store_manager.collection_exists(shadow):
+                from pymilvus import utility
+                utility.drop_collection(shadow)
+            return {
+                "status": "aborted",
+                "alias": alias,
+                "shadow_collection": shadow,
+                "live_collection": live_collection,
+                "sync_summary": sync_summary
+            }
+
+        # STEP 2: Warm the shadow generation so the swap has no cold start
+        self.vector_store_manager.warm_collection(shadow)
+
+        # STEP 3: Atomically switch readers to the new generation
+        previous = self.vector_store_manager.point_alias(alias, shadow)
+
+        # STEP 4: Release the previous generation and drop anything older
+        if previous:
+            try:
+                self.vector_store_manager.release_collection(previous)
+            except Exception as e:
+                logger.warning(f"Failed to release previous generation {previous}: {e}")
+        from pymilvus import utility
+        for _, name in self.list_generations(alias):
+            if name not in (shadow, previous):
+                try:
+                    utility.drop_collection(name)
+                    logger.info(f"Dropped stale generation {name}")
+                except Exception as e:
+                    logger.warning(f"Failed to drop stale generation {name}: {e}")
+
+        summary = {
+            "status": "completed",
+            "alias": alias,
+            "live_collection": shadow,
+            "previous_collection": previous,
+            "sync_summary": sync_summary,
+            "duration_seconds": round(time.time() - start_time, 2)
+        }
+        logger.info(f"Rebuild of {alias} completed in {summary['duration_seconds']}s, now serving {shadow}")
+        return summary
@@ -0,0 +1,224 @@
+import hashlib
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.db import crud, models, schemas
+from app.db.database import SessionLocal
+from app.services.admin_config_service import AdminConfigService
+from app.services.ingestion_service import DocumentIngestionService
+from app.services.metrics import queued_ingestion
+from app.services.minio_service import MinioService
+from app.services.rag_service import RemoteVectorStoreManager
+from app.utils.string_utils import sanitize_collection_name
+
+logger = logging.getLogger("collection_sync_service")
+
+
+def content_hash(data: bytes) -> str:
+    """SHA-256 hex digest used to identify file content."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class CollectionSyncService:
+    """
+    Incrementally synchronizes an admin collection's Milvus vectors with its files.
+
+    The desired state is the collection's CollectionFile set; the actual state is the
+    set of source_file_id values (and the content hashes they were ingested with)
+    stored in Milvus. Only the difference is applied: new or changed files are
+    ingested, chunks of removed or changed files are deleted by source_file_id, and
+    unchanged files are left alone.
+    """
+
+    def __init__(self, ingestion_service: DocumentIngestionService,
+                 vector_store_manager: RemoteVectorStoreManager):
+        self.ingestion_service = ingestion_service
+        self.vector_store_manager = vector_store_manager
+        self.minio_service = MinioService()
+
+    def sync_admin_collection(self, collection_id: int, file_ids: Optional[List[int]] = None,
+                              milvus_collection_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Bring an admin collection's vectors in line with its files.
+
+        Args:
+            collection_id: ID of the collection
+            file_ids: Desired file set; when given, CollectionFile rows are added/removed
+                to match it first. When omitted the current CollectionFile set is used.
+            milvus_collection_name: Target Milvus collection; defaults to admin_<name>
+
+        Returns:
+            Summary of added, updated, removed, unchanged and failed files
+        """
+        start_time = time.time()
+        db = SessionLocal()
+        try:
+            collection = crud.get_collection(db, collection_id)
+            if not collection:
+                raise ValueError(f"Collection with ID {collection_id} not found")
+
+            safe_collection_name = milvus_collection_name or sanitize_collection_name(f"admin_{collection.name}")
+            collection_name = collection.name
+
+            # STEP 1: Apply the desired file set to the CollectionFile rows
+            current_rows = db.query(models.CollectionFile).filter(
+                models.CollectionFile.collection_id == collection_id
+            ).all()
+            if file_ids is not None:
+                desired_ids = set(file_ids)
+                for file_id in desired_ids:
+                    if not crud.get_file_storage(db, file_id):
+                        raise ValueError(f"File with ID {file_id} not found")
+                for row in current_rows:
+                    if row.file_id not in desired_ids:
+                        db.delete(row)
+                current_ids = {row.file_id for row in current_rows}
+                for file_id in desired_ids - current_ids:
+                    db.add(models.CollectionFile(collection_id=collection_id, file_id=file_id, is_processed=False))
+                db.commit()
+                current_rows = db.query(models.CollectionFile).filter(
+                    models.CollectionFile.collection_id == collection_id
+                ).all()
+
+            desired_hashes: Dict[int, Optional[str]] = {}
+            for row in current_rows:
+                metadata = row.file.file_metadata if row.file else None
+                desired_hashes[row.file_id] = (metadata or {}).get("content_hash")
+
+            # STEP 2: Diff against what Milvus actually holds
+            stored_hashes = self.vector_store_manager.get_source_file_hashes(safe_collection_name)
+
+            to_add, to_update, unchanged = [], [], []
+            for file_id, desired_hash in desired_hashes.items():
+                if file_id not in stored_hashes:
+                    to_add.append(file_id)
+                elif desired_hash and stored_hashes[file_id] and desired_hash != stored_hashes[file_id]:
+                    to_update.append(file_id)
+                else:
+                    unchanged.append(file_id)
+            to_remove = [file_id for file_id in stored_hashes if file_id not in desired_hashes]
+
+            logger.info(
+                f"Sync of {safe_collection_name}: {len(to_add)} new, {len(to_update)} changed, "
+                f"{len(to_remove)} removed, {len(unchanged)} unchanged"
+            )
+
+            # Unchanged files are already in Milvus
+            for row in current_rows:
+                if row.file_id in unchanged and not row.is_processed:
+                    row.is_processed = True
+            db.commit()
+
+            ocr_mode = AdminConfigService.get_pdf_ocr_mode(db)
+            table_mode = AdminConfigService.get_pdf_table_mode(db)
+        finally:
+            db.close()
+
+        # STEP 3: Delete chunks of removed and changed files
+        if to_remove or to_update:
+            self.vector_store_manager.delete_by_source_file_ids(safe_collection_name, to_remove + to_update)
+
+        # STEP 4: Ingest new and changed files
+        failed = []
+        ingested = {}
+        pending = to_add + to_update
+        if pending:
+            # The collection may have been dropped or never created
+            if not self.vector_store_manager.collection_exists(safe_collection_name):
+                self.ingestion_service.create_new_collection(safe_collection_name)
+
+            with ThreadPoolExecutor(max_workers=settings.INGESTION_MAX_CONCURRENCY) as executor:
+                futures = {
+                    executor.submit(
+                        queued_ingestion(self._ingest_file), file_id, collection_id, collection_name,
+                        safe_collection_name, ocr_mode, table_mode
+                    ): file_id
+                    for file_id in pending
+                }
+                for future in as_completed(futures):
+                    file_id = futures[future]
+                    try:
+                        ingested[file_id] = future.result()
+                    except Exception as e:
+                        logger.error(f"Failed to ingest file {file_id} into {safe_collection_name}: {e}")
+                        failed.append({"file_id": file_id, "error": str(e)})
+
+        summary = {
+            "collection_id": collection_id,
+            "milvus_collection_name": safe_collection_name,
+            "added": [file_id for file_id in to_add if file_id in ingested],
+            "updated": [file_id for file_id in to_update if file_id in ingested],
+            "removed": to_remove,
+            "unchanged": len(unchanged),
+            "failed": failed,
+            "chunks_created": sum(ingested.values()),
+            "duration_seconds": round(time.time() - start_time, 2)
+        }
+        logger.info(f"Sync of {safe_collection_name} finished in {summary['duration_seconds']}s")
+        return summary
+
+    def _ingest_file(self, file_id: int, collection_id: int, collection_name: str,
+                     safe_collection_name: str, ocr_mode: str, table_mode: str) -> int:
+        """Download and ingest one file, recording its content hash. Runs in a worker thread."""
+        db = SessionLocal()
+        db_file = None
+        try:
+            db_file = crud.get_file_storage(db, file_id)
+            download_success, file_data = self.minio_service.download_file(db_file.file_path)
+            if not download_success:
+                raise Exception("Failed to download from storage")
+
+            file_hash = content_hash(file_data.getvalue())
+            pdf_processing = {}
+            num_docs = self.ingestion_service.ingest_file_object(
+                file_obj=file_data,
+                filename=db_file.original_filename,
+                collection_name=safe_collection_name,
+                metadata={
+                    "source_file_id": db_file.id,
+                    "file_name": db_file.original_filename,
+                    "collection_id": collection_id,
+                    "collection_name": collection_name
+                },
+                ocr_mode=ocr_mode,
+                table_mode=table_mode,
+                processing_info=pdf_processing
+            )
+
+            crud.update_file_storage(db, db_file.id, {
+                "file_metadata": {
+                    **(db_file.file_metadata or {}),
+                    "is_processed_for_rag": True,
+                    "content_hash": file_hash,
+                    "chunk_count": num_docs,
+                    "processed_at": datetime.utcnow().isoformat(),
+                    **({"pdf_processing": pdf_processing} if pdf_processing else {})
+                }
+            })
+            collection_file = db.query(models.CollectionFile).filter(
+                models.CollectionFile.collection_id == collection_id,
+                models.CollectionFile.file_id == file_id
+            ).first()
+            if collection_file:
+                crud.update_collection_file(db, collection_file.id, schemas.CollectionFileUpdate(is_processed=True))
+            return num_docs
+        except Exception as e:
+            db.rollback()
+            if db_file is not None:
+                try:
+                    crud.update_file_storage(db, file_id, {
+                        "file_metadata": {
+                            **(db_file.file_metadata or {}),
+                            "processing_error": str(e),
+                            "processed_at": datetime.utcnow().isoformat()
+                        }
+                    })
+                except Exception:
+                    pass
+            raise
+        finally:
+            db.close()
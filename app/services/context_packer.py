@@ -0,0 +1,162 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.config import settings
+from app.services.history_window import count_tokens
+
+logger = logging.getLogger("context_packer")
+
+# Metadata key of a chunk vector returned by the vector store with the search
+# result; removed from the documents by pack_documents
+STORED_VECTOR_KEY = "_stored_vector"
+
+# Leading lines of a chunk compared against the previous chunk when merging,
+# since Docling repeats section headings at the start of every chunk
+HEADING_LINES = 3
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+def _file_key(doc: Document) -> Optional[str]:
+    for field in ("source_file_id", "filename", "file_name", "source"):
+        value = doc.metadata.get(field)
+        if value is not None:
+            return f"{field}:{value}"
+    return None
+
+
+def _strip_repeated_heading(previous: str, text: str) -> str:
+    heading = {line.strip() for line in previous.split("\n")[:HEADING_LINES] if line.strip()}
+    lines = text.split("\n")
+    while lines and lines[0].strip() and lines[0].strip() in heading:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def _merge_adjacent(docs: List[Document], scores: List[float]) -> List[Document]:
+    """Merge consecutive chunks of the same file, ordered by their best score."""
+    groups: Dict[Tuple, List[Tuple[int, Document, float]]] = {}
+    for position, (doc, score) in enumerate(zip(docs, scores)):
+        file_key = _file_key(doc)
+        chunk_index = doc.metadata.get("chunk_index")
+        if file_key is None or not isinstance(chunk_index, int):
+            groups[("single", position)] = [(0, doc, score)]
+        else:
+            groups.setdefault(("file", file_key), []).append((chunk_index, doc, score))
+
+    merged: List[Tuple[float, Document]] = []
+    for members in groups.values():
+        members.sort(key=lambda member: member[0])
+        run = [members[0]]
+        for member in members[1:] + [None]:
+            if member is not None and member[0] == run[-1][0] + 1:
+                run.append(member)
+                continue
+            text = run[0][1].page_content
+            for _, doc, _ in run[1:]:
+                text += "\n" + _strip_repeated_heading(text, doc.page_content)
+            metadata = dict(run[0][1].metadata)
+            if len(run) > 1:
+                metadata["merged_chunk_indexes"] = [index for index, _, _ in run]
+            merged.append((max(score for _, _, score in run), Document(page_content=text, metadata=metadata)))
+            run = [member] if member is not None else []
+
+    merged.sort(key=lambda item: item[0], reverse=True)
+    return [doc for _, doc in merged]
+
+
+async def pack_documents(docs: List[Document], query: str, embeddings: Embeddings,
+                         max_tokens: Optional[int] = None) -> List[Document]:
+    """
+    Prepare retrieved chunks for the prompt context.
+
+    Exact duplicates and chunks whose embedding is nearly identical to a better
+    scoring chunk (cosine similarity of at least RAG_CONTEXT_DEDUP_THRESHOLD) are
+    dropped. The remaining chunks are taken by similarity to the query until the
+    token budget is used up, and consecutive chunks of the same file are merged.
+
+    Chunks are compared by the vectors stored with them, as returned by the search
+    (see RetrievalMilvus). The query embedding comes from the embedder's cache,
+    since the retriever has just embedded the same query. Chunks without a stored
+    vector are embedded from their first RAG_CONTEXT_DEDUP_EMBED_CHARS characters.
+    If embedding fails, retrieval order is used as the score and only exact
+    duplicates are removed.
+
+    Args:
+        docs: Retrieved documents, best match first
+        query: Search query the documents were retrieved for
+        embeddings: Embedder used for the collection
+        max_tokens: Context token budget (defaults to RAG_CONTEXT_TOKEN_BUDGET)
+
+    Returns:
+        Documents to put in the context, best match first
+    """
+    if max_tokens is None:
+        max_tokens = settings.RAG_CONTEXT_TOKEN_BUDGET
+    if not docs:
+        return docs
+
+    stored_vectors = [doc.metadata.pop(STORED_VECTOR_KEY, None) for doc in docs]
+
+    # Exact duplicates, keeping the higher ranked copy
+    seen = set()
+    unique_docs = []
+    vectors = []
+    for doc, vector in zip(docs, stored_vectors):
+        key = _normalize(doc.page_content)
+        if key and key not in seen:
+            seen.add(key)
+            unique_docs.append(doc)
+            vectors.append(vector)
+
+    scores = [-float(rank) for rank in range(len(unique_docs))]
+    similarity = None
+    if len(unique_docs) > 1:
+        try:
+            missing = [i for i, vector in enumerate(vectors) if vector is None]
+            if missing:
+                limit = settings.RAG_CONTEXT_DEDUP_EMBED_CHARS
+                embedded = await asyncio.to_thread(
+                    embeddings.embed_documents, [unique_docs[i].page_content[:limit] for i in missing]
+                )
+                for i, vector in zip(missing, embedded):
+                    vectors[i] = vector
+            query_vector = await asyncio.to_thread(embeddings.embed_query, query)
+            matrix = np.asarray([query_vector] + vectors, dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.where(norms > 0, norms, 1.0)
+            scores = (matrix[1:] @ matrix[0]).tolist()
+            similarity = matrix[1:] @ matrix[1:].T
+        except Exception as e:
+            logger.warning(f"Could not embed retrieved chunks, packing without near-duplicate removal: {e}")
+
+    order = sorted(range(len(unique_docs)), key=lambda i: scores[i], reverse=True)
+
+    selected: List[int] = []
+    used_tokens = 0
+    near_duplicates = 0
+    for i in order:
+        if similarity is not None and selected and similarity[i, selected].max() >= settings.RAG_CONTEXT_DEDUP_THRESHOLD:
+            near_duplicates += 1
+            continue
+        cost = count_tokens(unique_docs[i].page_content)
+        if selected and used_tokens + cost > max_tokens:
+            # A smaller, lower scoring chunk may still fit
+            continue
+        selected.append(i)
+        used_tokens += cost
+
+    packed = _merge_adjacent([unique_docs[i] for i in selected], [scores[i] for i in selected])
+    logger.debug(
+        f"Packed {len(docs)} retrieved chunks into {len(packed)} "
+        f"({len(docs) - len(unique_docs)} exact and {near_duplicates} near duplicates removed, "
+        f"{sum(vector is not None for vector in stored_vectors)} stored vectors, ~{used_tokens}/{max_tokens} tokens)"
+    )
+    return packed
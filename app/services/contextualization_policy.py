@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import re
+from typing import List, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.messages import BaseMessage, HumanMessage
+
+from app.config import settings
+from app.services.tracing import trace_span, traced_retrieve
+
+logger = logging.getLogger("contextualization_policy")
+
+# Words that usually point back at earlier turns (English and Indonesian)
+REFERENCE_WORDS = {
+    "it", "its", "this", "that", "these", "those", "they", "them", "their",
+    "he", "him", "his", "she", "her", "one", "ones", "above", "previous", "former", "latter",
+    "same", "again", "else", "more", "other",
+    "ini", "itu", "tersebut", "tadi", "dia", "mereka", "beliau", "sebelumnya", "lagi", "lainnya",
+}
+
+# Openers of follow-up questions that only make sense with the previous turn
+FOLLOW_UP_PREFIXES = (
+    "and ", "also ", "but ", "so ", "then ", "what about", "how about", "why not", "what else",
+    "dan ", "juga ", "tapi ", "lalu ", "terus ", "kalau ", "bagaimana dengan", "gimana dengan",
+)
+
+# Questions shorter than this are treated as elliptical follow-ups
+MIN_SELF_CONTAINED_WORDS = 4
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def prior_history(chat_history: List[BaseMessage], message: str) -> List[BaseMessage]:
+    """
+    History before the current question.
+
+    A caller that loads history after saving the user message without
+    skip_current_message gets the current question as a trailing human message
+    with the same content.
+    """
+    if chat_history and isinstance(chat_history[-1], HumanMessage) and chat_history[-1].content.strip() == message.strip():
+        return chat_history[:-1]
+    return chat_history
+
+
+def _normalize(text: str) -> str:
+    return " ".join(WORD_PATTERN.findall(text.lower()))
+
+
+def is_self_contained(message: str) -> bool:
+    """
+    Cheap check whether a question can be searched without the chat history.
+
+    Args:
+        message: User question
+
+    Returns:
+        True if the question has no references to earlier turns
+    """
+    text = message.strip().lower()
+    words = WORD_PATTERN.findall(text)
+    if len(words) < MIN_SELF_CONTAINED_WORDS:
+        return False
+    if text.startswith(FOLLOW_UP_PREFIXES):
+        return False
+    # Indonesian possessive suffix, e.g. "harganya" ("its price")
+    if any(word in REFERENCE_WORDS or (len(word) > 5 and word.endswith("nya")) for word in words):
+        return False
+    return True
+
+
+def needs_contextualization(message: str, chat_history: List[BaseMessage]) -> Tuple[bool, str]:
+    """
+    Decide whether the question must be rewritten with the chat history before retrieval.
+
+    Args:
+        message: User question
+        chat_history: Conversation history (may include the current question)
+
+    Returns:
+        (rewrite needed, reason)
+    """
+    policy = settings.CONTEXTUALIZE_POLICY
+    if policy == "never":
+        return False, "policy_never"
+    if policy == "always":
+        return True, "policy_always"
+    if not prior_history(chat_history, message):
+        return False, "no_history"
+    if is_self_contained(message):
+        return False, "self_contained"
+    return True, "needs_history"
+
+
+async def contextualize_and_retrieve(contextualizer, retriever, message: str,
+                                     chat_history: List[BaseMessage],
+                                     collection_type: str = "global_collection") -> Tuple[str, List[Document]]:
+    """
+    Get the search query and the retrieved documents for a RAG turn.
+
+    The rewrite LLM call is skipped when the policy allows it. Otherwise retrieval
+    with the raw question starts speculatively alongside the rewrite, and its
+    result is used if the rewrite returns the question unchanged.
+
+    Args:
+        contextualizer: Runnable producing the rewritten question
+        retriever: Retriever to search with
+        message: User question
+        chat_history: Conversation history
+        collection_type: Kind of collection searched, for the search latency metric
+
+    Returns:
+        (search query, relevant documents)
+    """
+    rewrite, reason = needs_contextualization(message, chat_history)
+    if not rewrite:
+        print(f"DEBUG: Skipping question contextualization ({reason})")
+        return message, await traced_retrieve(retriever, message, collection_type)
+
+    speculative = None
+    if settings.CONTEXTUALIZE_SPECULATIVE_RETRIEVAL:
+        speculative = asyncio.create_task(traced_retrieve(retriever, message, collection_type))
+
+    try:
+        with trace_span("contextualization"):
+            contextualized_question = await contextualizer.ainvoke({
+                "chat_history": chat_history,
+                "input": message
+            })
+    except BaseException:
+        if speculative:
+            speculative.cancel()
+        raise
+
+    if speculative:
+        if _normalize(contextualized_question) == _normalize(message):
+            print("DEBUG: Rewritten question matches the original, reusing speculative retrieval")
+            return contextualized_question, await speculative
+        speculative.cancel()
+
+    return contextualized_question, await traced_retrieve(retriever, contextualized_question, collection_type)
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import List, Optional, Set
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db import models
+from app.db.database import SessionLocal
+from app.services.history_window import load_history_window
+from app.services.llm_client_pool import llm_client_pool
+
+logger = logging.getLogger("conversation_summary_service")
+
+# Longest excerpt of a single message passed to the summarizer
+MAX_MESSAGE_CHARS = 2000
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an assistant. "
+    "Update the existing summary with the new messages. Keep facts about the user, names, numbers, "
+    "decisions, and open questions; drop small talk. Write at most {max_words} words, in the "
+    "language of the conversation. Return only the summary without any formatting or explanations."
+)
+
+
+class ConversationSummaryService:
+    """
+    Rolling summary memory for long conversations.
+
+    Messages that fall out of the token-budgeted history window are folded into
+    Conversation.summary by a cheap, thinking-disabled LLM call, and the summary is
+    added to the system prompt. Updates run in the background every
+    CONVERSATION_SUMMARY_INTERVAL exchanges, so prompt length stays roughly constant
+    without losing older facts.
+    """
+
+    _running: Set[str] = set()
+    _tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def get_summary_prompt(db: Session, conversation_id: str) -> Optional[str]:
+        """
+        Get the summary section to append to the system prompt.
+
+        Args:
+            db: Database session
+            conversation_id: Conversation ID
+
+        Returns:
+            Summary text, or None if the conversation has no summary
+        """
+        if not settings.CONVERSATION_SUMMARY_ENABLED or not conversation_id:
+            return None
+        conversation = db.get(models.Conversation, conversation_id)
+        if not conversation or not conversation.summary:
+            return None
+        return f"Summary of the earlier conversation:\n{conversation.summary}"
+
+    @staticmethod
+    def schedule_update(conversation_id: str):
+        """
+        Update the conversation summary in the background after an exchange.
+
+        Must be called from the event loop; at most one update per conversation runs
+        at a time in a worker.
+
+        Args:
+            conversation_id: Conversation ID
+        """
+        if not settings.CONVERSATION_SUMMARY_ENABLED or not conversation_id:
+            return
+        if conversation_id in ConversationSummaryService._running:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        ConversationSummaryService._running.add(conversation_id)
+        task = loop.create_task(ConversationSummaryService._run_update(conversation_id))
+        ConversationSummaryService._tasks.add(task)
+        task.add_done_callback(ConversationSummaryService._tasks.discard)
+
+    @staticmethod
+    async def _run_update(conversation_id: str):
+        try:
+            await ConversationSummaryService.update_summary(conversation_id)
+        except Exception as e:
+            logger.error(f"Failed to update summary of conversation {conversation_id}: {e}")
+        finally:
+            ConversationSummaryService._running.discard(conversation_id)
+
+    @staticmethod
+    def _collect_pending(conversation_id: str):
+        """Find messages outside the history window that are not yet summarized. Runs in a thread."""
+        db = SessionLocal()
+        try:
+            conversation = db.get(models.Conversation, conversation_id)
+            if not conversation:
+                return None
+            through = conversation.summary_through_sequence or 0
+            latest = conversation.next_sequence - 1
+            if latest - through < 2 * settings.CONVERSATION_SUMMARY_INTERVAL:
+                return None
+
+            window = load_history_window(db, conversation_id, conversation.conversation_type)
+            window_start = window[0].sequence_number if window else latest + 1
+            pending = db.query(models.Message).filter(
+                models.Message.conversation_id == conversation_id,
+                models.Message.sequence_number > through,
+                models.Message.sequence_number < window_start
+            ).order_by(models.Message.sequence_number).all()
+            if not pending:
+                return None
+
+            # Resolve the LLM here so the config is read with this session
+            llm = llm_client_pool.get_llm(db, streaming=False, override_thinking=False)
+            lines = [
+                f"{'User' if msg.role == 'user' else 'Assistant'}: {msg.content[:MAX_MESSAGE_CHARS]}"
+                for msg in pending if msg.role in ("user", "assistant")
+            ]
+            return llm, conversation.summary, through, pending[-1].sequence_number, lines
+        finally:
+            db.close()
+
+    @staticmethod
+    def _store(conversation_id: str, summary: str, expected_through: int, new_through: int) -> bool:
+        """Save the summary unless another worker advanced it first. Runs in a thread."""
+        db = SessionLocal()
+        try:
+            through_column = func.coalesce(models.Conversation.summary_through_sequence, 0)
+            updated = db.query(models.Conversation).filter(
+                models.Conversation.id == conversation_id,
+                through_column == expected_through
+            ).update({
+                models.Conversation.summary: summary,
+                models.Conversation.summary_through_sequence: new_through,
+                models.Conversation.summary_updated_at: datetime.now(timezone.utc)
+            }, synchronize_session=False)
+            db.commit()
+            return updated > 0
+        finally:
+            db.close()
+
+    @staticmethod
+    async def update_summary(conversation_id: str) -> bool:
+        """
+        Fold messages that left the history window into the conversation summary.
+
+        Args:
+            conversation_id: Conversation ID
+
+        Returns:
+            True if the summary was updated
+        """
+        pending = await asyncio.to_thread(ConversationSummaryService._collect_pending, conversation_id)
+        if not pending:
+            return False
+        llm, previous_summary, through, new_through, lines = pending
+
+        messages: List = [
+            SystemMessage(content=SUMMARY_SYSTEM_PROMPT.format(max_words=settings.CONVERSATION_SUMMARY_MAX_WORDS)),
+            HumanMessage(content=(
+                f"Existing summary:\n{previous_summary or '(none)'}\n\n"
+                "New messages:\n" + "\n".join(lines)
+            ))
+        ]
+        result = await llm.ainvoke(messages)
+        summary = (result.content or "").strip()
+        if not summary:
+            return False
+
+        stored = await asyncio.to_thread(ConversationSummaryService._store, conversation_id, summary, through, new_through)
+        if stored:
+            print(f"DEBUG: Updated summary of conversation {conversation_id} through message {new_through}")
+        return stored
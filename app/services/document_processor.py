@@ -1,8 +1,15 @@
 import os
+import re
 import logging
 import time
+import threading
+import shutil
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import traceback
-from typing import List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 from langchain_core.documents import Document
 
 from langchain_docling.loader import ExportType
@@ -10,6 +17,7 @@ from langchain_docling import DoclingLoader
 from docling.document_converter import DocumentConverter, PdfFormatOption, WordFormatOption, MarkdownFormatOption, CsvFormatOption, HTMLFormatOption, PowerpointFormatOption, ExcelFormatOption, AsciiDocFormatOption
 from docling.datamodel.base_models import InputFormat
 from docling.chunking import HybridChunker
+from docling_core.types.doc import DoclingDocument
 from docling.datamodel.pipeline_options import (
     AcceleratorDevice,
     AcceleratorOptions,
@@ -19,12 +27,259 @@ from docling.datamodel.pipeline_options import (
     EasyOcrOptions,
 )
 
+from app.config import settings
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, 
                    format='%(asctime)s [%(levelname)s] [%(name)s] %(message)s',
                    handlers=[logging.StreamHandler()])
 logger = logging.getLogger("docling_processor")
 
+# Accepted values for the OCR / table structure policies
+PROCESSING_MODES = ("off", "auto", "force")
+
+# Collections of a DoclingDocument whose items are addressed by JSON pointer ("#/texts/3")
+_DOC_ITEM_COLLECTIONS = ("groups", "texts", "pictures", "tables", "key_value_items", "form_items")
+_DOC_REF_PATTERN = re.compile(r"^#/(" + "|".join(_DOC_ITEM_COLLECTIONS) + r")/(\d+)$")
+
+
+def build_document_converter(pdf_pipeline_options: PdfPipelineOptions) -> DocumentConverter:
+    """
+    Build a document converter using the given PDF pipeline options.
+    
+    Args:
+        pdf_pipeline_options: Pipeline options for PDF inputs
+        
+    Returns:
+        DocumentConverter for all supported formats
+    """
+    return DocumentConverter(
+        format_options={
+            InputFormat.PDF: PdfFormatOption(pipeline_options=pdf_pipeline_options),
+            InputFormat.DOCX: WordFormatOption(),
+            InputFormat.XLSX: ExcelFormatOption(),
+            InputFormat.PPTX: PowerpointFormatOption(),
+            InputFormat.MD: MarkdownFormatOption(),
+            InputFormat.CSV: CsvFormatOption(),
+            InputFormat.HTML: HTMLFormatOption(),
+            InputFormat.ASCIIDOC: AsciiDocFormatOption()
+        }
+    )
+
+
+def build_pdf_pipeline_options(artifacts_path: str, device: AcceleratorDevice, converter_key: tuple,
+                               num_threads: Optional[int] = None) -> PdfPipelineOptions:
+    """
+    Build PDF pipeline options for a processing variant.
+    
+    Args:
+        artifacts_path: Path to Docling parser artifacts
+        device: Accelerator device
+        converter_key: (do_ocr, force_full_page_ocr, do_table_structure, table_mode)
+        num_threads: Optional thread count for the accelerator
+        
+    Returns:
+        PdfPipelineOptions for the variant
+    """
+    do_ocr, full_page_ocr, do_table_structure, table_former_mode = converter_key
+    accelerator_options = AcceleratorOptions(device=device)
+    if num_threads:
+        accelerator_options = AcceleratorOptions(device=device, num_threads=num_threads)
+    
+    return PdfPipelineOptions(
+        artifacts_path=artifacts_path,
+        do_ocr=do_ocr,
+        do_table_structure=do_table_structure,
+        ocr_options=EasyOcrOptions(lang=["en", "id"], force_full_page_ocr=full_page_ocr),
+        table_structure_options=TableStructureOptions(
+            do_cell_matching=True,
+            mode=table_former_mode
+        ),
+        accelerator_options=accelerator_options
+    )
+
+
+# Process pool shared by every DoclingProcessor in this process. It is created on
+# the first sharded PDF, so uvicorn workers that never parse one don't start it.
+_shard_pool: Optional[ProcessPoolExecutor] = None
+_shard_pool_lock = threading.Lock()
+
+# Per-process state for shard workers (populated by _init_shard_worker)
+_shard_worker_state: Dict[str, Any] = {}
+
+
+def _init_shard_worker(artifacts_path: str, device_value: str, num_threads: int, warm_key: tuple):
+    """Initialize a shard worker process and pre-warm its default PDF converter."""
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+    except Exception:
+        pass
+    
+    _shard_worker_state["artifacts_path"] = artifacts_path
+    _shard_worker_state["device"] = AcceleratorDevice(device_value)
+    _shard_worker_state["num_threads"] = num_threads
+    _shard_worker_state["converters"] = {}
+    
+    try:
+        converter = _get_shard_worker_converter(warm_key)
+        converter.initialize_pipeline(InputFormat.PDF)
+        logger.info(f"Shard worker {os.getpid()} ready ({num_threads} threads)")
+    except Exception as e:
+        logger.warning(f"Shard worker {os.getpid()} could not pre-warm converter: {e}")
+
+
+def get_shard_pool(artifacts_path: str, device: AcceleratorDevice) -> ProcessPoolExecutor:
+    """
+    Get the process pool used for page-sharded PDF parsing, creating it on first use.
+    
+    Workers are spawned (not forked) and each pre-warms a PDF converter. Every
+    uvicorn worker has its own pool, so the CPU cores are split evenly between
+    the UVICORN_WORKERS x DOCLING_SHARD_WORKERS shard processes of the host.
+    
+    Args:
+        artifacts_path: Path to Docling parser artifacts
+        device: Accelerator device
+        
+    Returns:
+        ProcessPoolExecutor for shard conversion
+    """
+    global _shard_pool
+    with _shard_pool_lock:
+        if _shard_pool is None:
+            workers = settings.DOCLING_SHARD_WORKERS
+            threads = max(1, (os.cpu_count() or 1) // (workers * max(1, settings.UVICORN_WORKERS)))
+            logger.info(f"Starting PDF shard pool with {workers} workers ({threads} threads each)")
+            _shard_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_shard_worker,
+                initargs=(artifacts_path, device.value, threads, (False, False, True, TableFormerMode.FAST))
+            )
+        return _shard_pool
+
+
+def _reset_shard_pool():
+    """Drop a broken shard pool so the next sharded conversion starts a fresh one."""
+    global _shard_pool
+    with _shard_pool_lock:
+        if _shard_pool is not None:
+            _shard_pool.shutdown(wait=False, cancel_futures=True)
+            _shard_pool = None
+
+
+def _get_shard_worker_converter(converter_key: tuple) -> DocumentConverter:
+    """Get (or build once) the converter for a variant inside a shard worker."""
+    converters = _shard_worker_state["converters"]
+    converter = converters.get(converter_key)
+    if converter is None:
+        pipeline_options = build_pdf_pipeline_options(
+            _shard_worker_state["artifacts_path"],
+            _shard_worker_state["device"],
+            converter_key,
+            _shard_worker_state["num_threads"]
+        )
+        converter = build_document_converter(pipeline_options)
+        converters[converter_key] = converter
+    return converter
+
+
+def _convert_pdf_shard(shard_path: str, converter_key: tuple) -> dict:
+    """
+    Convert one PDF shard in a worker process.
+    
+    Args:
+        shard_path: Path to the shard PDF
+        converter_key: PDF processing variant
+        
+    Returns:
+        The converted DoclingDocument as a JSON-compatible dict
+    """
+    converter = _get_shard_worker_converter(converter_key)
+    conv_result = converter.convert(shard_path)
+    return conv_result.document.export_to_dict()
+
+
+def _offset_doc_ref(ref: str, offsets: Dict[str, int]) -> str:
+    """Shift a DoclingDocument JSON pointer by the item offsets of earlier shards."""
+    match = _DOC_REF_PATTERN.match(ref)
+    if not match:
+        return ref
+    collection, index = match.group(1), int(match.group(2))
+    return f"#/{collection}/{index + offsets.get(collection, 0)}"
+
+
+def _rebase_doc_refs(node: Any, offsets: Dict[str, int]) -> Any:
+    """Recursively rewrite item references ($ref / self_ref / cref) in an exported document."""
+    if isinstance(node, dict):
+        rebased = {}
+        for key, value in node.items():
+            if key in ("$ref", "self_ref", "cref") and isinstance(value, str):
+                rebased[key] = _offset_doc_ref(value, offsets)
+            else:
+                rebased[key] = _rebase_doc_refs(value, offsets)
+        return rebased
+    if isinstance(node, list):
+        return [_rebase_doc_refs(item, offsets) for item in node]
+    return node
+
+
+def _number_chunks(docs: List[Document]) -> List[Document]:
+    """Store each chunk's position in its file, used to merge neighbouring chunks in the RAG context."""
+    for index, doc in enumerate(docs):
+        doc.metadata["chunk_index"] = index
+    return docs
+
+
+def merge_docling_shards(shard_docs: List[dict], page_offsets: List[int], filename: str) -> dict:
+    """
+    Merge exported shard documents into one exported DoclingDocument.
+    
+    Item references are rebased onto the merged item lists and page numbers are
+    shifted by each shard's starting page, so reading order, provenance and page
+    metadata match a single-pass conversion.
+    
+    Args:
+        shard_docs: Exported shard documents in page order
+        page_offsets: Number of pages preceding each shard
+        filename: Original file name of the merged document
+        
+    Returns:
+        Exported DoclingDocument dict
+    """
+    merged = dict(shard_docs[0])
+    merged["name"] = os.path.splitext(filename)[0]
+    if merged.get("origin"):
+        merged["origin"] = {**merged["origin"], "filename": filename}
+    for collection in _DOC_ITEM_COLLECTIONS:
+        merged[collection] = []
+    merged["body"] = {**shard_docs[0]["body"], "children": []}
+    if merged.get("furniture") is not None:
+        merged["furniture"] = {**shard_docs[0]["furniture"], "children": []}
+    merged["pages"] = {}
+    
+    for shard_doc, page_offset in zip(shard_docs, page_offsets):
+        offsets = {collection: len(merged[collection]) for collection in _DOC_ITEM_COLLECTIONS}
+        
+        for collection in _DOC_ITEM_COLLECTIONS:
+            for item in shard_doc.get(collection) or []:
+                item = _rebase_doc_refs(item, offsets)
+                for prov in item.get("prov") or []:
+                    prov["page_no"] = prov["page_no"] + page_offset
+                merged[collection].append(item)
+        
+        merged["body"]["children"].extend(_rebase_doc_refs(shard_doc["body"].get("children", []), offsets))
+        if merged.get("furniture") is not None and shard_doc.get("furniture"):
+            merged["furniture"]["children"].extend(
+                _rebase_doc_refs(shard_doc["furniture"].get("children", []), offsets)
+            )
+        
+        for page_no, page in (shard_doc.get("pages") or {}).items():
+            new_page_no = int(page_no) + page_offset
+            merged["pages"][str(new_page_no)] = {**page, "page_no": new_page_no}
+    
+    return merged
+
 class DoclingProcessor:
     """Service for processing documents using Docling."""
     
@@ -136,33 +391,251 @@ class DoclingProcessor:
         # Create document converter with format options
         logger.info("Creating document converter")
         try:
-            self.doc_converter = DocumentConverter(
-                format_options={
-                    InputFormat.PDF: PdfFormatOption(pipeline_options=self.pdf_pipeline_options),
-                    InputFormat.DOCX: WordFormatOption(),
-                    InputFormat.XLSX: ExcelFormatOption(),
-                    InputFormat.PPTX: PowerpointFormatOption(),
-                    InputFormat.MD: MarkdownFormatOption(),
-                    InputFormat.CSV: CsvFormatOption(),
-                    InputFormat.HTML: HTMLFormatOption(),
-                    InputFormat.ASCIIDOC: AsciiDocFormatOption()
-                }
-            )
+            self.doc_converter = build_document_converter(self.pdf_pipeline_options)
             logger.info("Document converter created successfully")
             logger.info("✓ Supported formats: PDF, DOCX, XLSX, PPTX, Markdown, CSV, HTML, AsciiDoc")
         except Exception as e:
             logger.error(f"Failed to create document converter: {e}", exc_info=True)
             raise
         
+        # PDF converters keyed by (do_ocr, force_full_page_ocr, do_table_structure, table_mode).
+        # Docling loads its models lazily per pipeline, so each variant is built once and reused.
+        self._pdf_converters = {
+            (True, False, True, TableFormerMode.ACCURATE): self.doc_converter
+        }
+        self._pdf_converters_lock = threading.Lock()
+        
         logger.info("=== DOCUMENT PROCESSOR INITIALIZED ===")
     
-    def process_files(self, file_paths: List[str], metadata: Optional[dict] = None) -> List[Document]:
+    def inspect_pdf_text_layer(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Check which pages of a PDF carry an extractable text layer.
+        
+        Args:
+            file_path: Path to the PDF file
+            
+        Returns:
+            Dictionary with page_count, text_pages and the 1-based pages lacking text,
+            or None if the PDF could not be inspected
+        """
+        try:
+            from pypdf import PdfReader
+            
+            reader = PdfReader(file_path)
+            pages_without_text = []
+            for page_no, page in enumerate(reader.pages, start=1):
+                try:
+                    text = page.extract_text() or ""
+                except Exception:
+                    text = ""
+                if len(text.strip()) < settings.PDF_TEXT_LAYER_MIN_CHARS:
+                    pages_without_text.append(page_no)
+            
+            page_count = len(reader.pages)
+            return {
+                "page_count": page_count,
+                "text_pages": page_count - len(pages_without_text),
+                "pages_without_text": pages_without_text
+            }
+        except Exception as e:
+            logger.warning(f"Could not inspect PDF text layer for {file_path}: {e}")
+            return None
+    
+    def _resolve_pdf_options(self, file_path: str, ocr_mode: str, table_mode: str) -> Tuple[tuple, Dict[str, Any]]:
+        """
+        Decide the OCR and table structure settings for a single PDF.
+        
+        OCR modes:
+            off   - never OCR, rely on the embedded text layer
+            auto  - skip OCR when every page has a text layer; otherwise OCR
+                    only the bitmap regions, leaving text-layer pages untouched
+            force - full-page OCR on every page
+        Table modes:
+            off   - no table structure recognition
+            auto  - FAST TableFormer on born-digital text, ACCURATE when OCR runs
+            force - ACCURATE TableFormer on every document
+        
+        Args:
+            file_path: Path to the PDF file
+            ocr_mode: OCR policy
+            table_mode: Table structure policy
+            
+        Returns:
+            Tuple of (converter key, dictionary describing the applied processing mode)
+        """
+        ocr_mode = ocr_mode if ocr_mode in PROCESSING_MODES else "auto"
+        table_mode = table_mode if table_mode in PROCESSING_MODES else "auto"
+        
+        text_layer = None
+        if ocr_mode == "auto":
+            text_layer = self.inspect_pdf_text_layer(file_path)
+        
+        if ocr_mode == "off":
+            do_ocr, full_page_ocr = False, False
+        elif ocr_mode == "force":
+            do_ocr, full_page_ocr = True, True
+        elif text_layer is None:
+            # Unreadable text layer - keep the previous behaviour and OCR the document
+            do_ocr, full_page_ocr = True, False
+        elif not text_layer["pages_without_text"]:
+            do_ocr, full_page_ocr = False, False
+        elif text_layer["text_pages"] == 0:
+            do_ocr, full_page_ocr = True, True
+        else:
+            do_ocr, full_page_ocr = True, False
+        
+        if table_mode == "off":
+            do_table_structure, table_former_mode = False, TableFormerMode.ACCURATE
+        elif table_mode == "force" or do_ocr:
+            do_table_structure, table_former_mode = True, TableFormerMode.ACCURATE
+        else:
+            do_table_structure, table_former_mode = True, TableFormerMode.FAST
+        
+        info = {
+            "ocr_mode": ocr_mode,
+            "table_mode": table_mode,
+            "ocr_applied": "full_page" if full_page_ocr else ("bitmap_regions" if do_ocr else "none"),
+            "table_structure": table_former_mode.value if do_table_structure else "none",
+        }
+        if text_layer is not None:
+            info["page_count"] = text_layer["page_count"]
+            info["ocr_pages"] = text_layer["pages_without_text"]
+        
+        return (do_ocr, full_page_ocr, do_table_structure, table_former_mode), info
+    
+    def _get_pdf_converter(self, converter_key: tuple) -> DocumentConverter:
+        """
+        Get (or build once) the converter for a PDF processing variant.
+        
+        Args:
+            converter_key: (do_ocr, force_full_page_ocr, do_table_structure, table_mode)
+            
+        Returns:
+            DocumentConverter configured for the variant
+        """
+        with self._pdf_converters_lock:
+            converter = self._pdf_converters.get(converter_key)
+            if converter is None:
+                do_ocr, full_page_ocr, do_table_structure, table_former_mode = converter_key
+                logger.info(f"Creating PDF converter variant: do_ocr={do_ocr}, "
+                            f"full_page_ocr={full_page_ocr}, tables={do_table_structure} ({table_former_mode.value})")
+                pipeline_options = build_pdf_pipeline_options(self.parser_artifact_path, self.device, converter_key)
+                converter = build_document_converter(pipeline_options)
+                self._pdf_converters[converter_key] = converter
+            return converter
+    
+    def _count_pdf_pages(self, file_path: str) -> int:
+        """
+        Count the pages of a PDF without parsing its content.
+        
+        Args:
+            file_path: Path to the PDF file
+            
+        Returns:
+            Number of pages, or 0 if the PDF could not be read
+        """
+        try:
+            from pypdf import PdfReader
+            return len(PdfReader(file_path).pages)
+        except Exception as e:
+            logger.warning(f"Could not count PDF pages for {file_path}: {e}")
+            return 0
+    
+    def _should_shard(self, page_count: int) -> bool:
+        """Whether a PDF is large enough to be parsed in page shards."""
+        return (
+            settings.DOCLING_SHARD_WORKERS > 1
+            and page_count >= settings.DOCLING_SHARD_MIN_PAGES
+            and page_count > settings.DOCLING_SHARD_PAGES
+        )
+    
+    def _process_pdf_sharded(self, file_path: str, converter_key: tuple, page_count: int) -> Optional[List[Document]]:
+        """
+        Parse a large PDF as page-range shards in the shard process pool.
+        
+        The shard documents are merged back into a single DoclingDocument (page
+        numbers and item references rebased) before chunking, so chunk order and
+        page metadata match a single-pass conversion.
+        
+        Args:
+            file_path: Path to the PDF file
+            converter_key: PDF processing variant
+            page_count: Number of pages in the PDF
+            
+        Returns:
+            List of chunked documents, or None if sharded parsing failed
+        """
+        from pypdf import PdfReader, PdfWriter
+        
+        shard_size = settings.DOCLING_SHARD_PAGES
+        page_ranges = [(start, min(start + shard_size, page_count)) for start in range(0, page_count, shard_size)]
+        logger.info(f"Sharding {page_count}-page PDF into {len(page_ranges)} shards of up to {shard_size} pages")
+        
+        os.makedirs("/tmp/docling_temp", exist_ok=True)
+        shard_dir = tempfile.mkdtemp(prefix="shards_", dir="/tmp/docling_temp")
+        try:
+            # STEP 1: Split the PDF into page-range shards
+            split_start = time.time()
+            reader = PdfReader(file_path)
+            shard_paths = []
+            for idx, (start, end) in enumerate(page_ranges):
+                writer = PdfWriter()
+                for page_index in range(start, end):
+                    writer.add_page(reader.pages[page_index])
+                shard_path = os.path.join(shard_dir, f"shard_{idx:04d}.pdf")
+                with open(shard_path, "wb") as f:
+                    writer.write(f)
+                shard_paths.append(shard_path)
+            logger.info(f"Split PDF into shards in {time.time() - split_start:.2f} seconds")
+            
+            # STEP 2: Convert shards concurrently
+            parse_start = time.time()
+            pool = get_shard_pool(self.parser_artifact_path, self.device)
+            futures = [pool.submit(_convert_pdf_shard, shard_path, converter_key) for shard_path in shard_paths]
+            shard_docs = [future.result() for future in futures]
+            logger.info(f"Converted {len(shard_docs)} shards in {time.time() - parse_start:.2f} seconds")
+            
+            # STEP 3: Merge shards and chunk the merged document
+            merged = merge_docling_shards(
+                shard_docs,
+                [start for start, _ in page_ranges],
+                os.path.basename(file_path)
+            )
+            dl_doc = DoclingDocument.model_validate(merged)
+            
+            chunker = HybridChunker(tokenizer=self.embed_model_id)
+            docs = [
+                Document(
+                    page_content=chunker.contextualize(chunk=chunk),
+                    metadata={"source": file_path, "dl_meta": chunk.meta.export_json_dict()}
+                )
+                for chunk in chunker.chunk(dl_doc)
+            ]
+            logger.info(f"Sharded parsing produced {len(docs)} chunks")
+            return docs
+        except BrokenProcessPool as e:
+            logger.error(f"PDF shard pool broke while parsing {file_path}: {e}")
+            _reset_shard_pool()
+            return None
+        except Exception as e:
+            logger.error(f"Sharded parsing failed for {file_path}: {e}", exc_info=True)
+            return None
+        finally:
+            shutil.rmtree(shard_dir, ignore_errors=True)
+    
+    def process_files(self, file_paths: List[str], metadata: Optional[dict] = None,
+                      ocr_mode: str = "auto", table_mode: str = "auto",
+                      processing_info: Optional[dict] = None) -> List[Document]:
         """
         Process files using Docling.
         
         Args:
             file_paths: List of file paths to process
             metadata: Optional metadata to add to documents
+            ocr_mode: OCR policy for PDFs ('off', 'auto' or 'force')
+            table_mode: Table structure policy for PDFs ('off', 'auto' or 'force')
+            processing_info: Optional dict that is updated with the PDF processing
+                mode that was applied (intended for single-file calls)
             
         Returns:
             List of processed documents
@@ -181,70 +654,98 @@ class DoclingProcessor:
             logger.info(f"File to process: {path} (size: {os.path.getsize(path)} bytes)")
         
         try:
-            # STEP 1: Create DoclingLoader
-            logger.info("STEP 1: Creating DoclingLoader")
-            loader_start = time.time()
-            try:
-                # Use dynamic device configuration
-                loader = DoclingLoader(
-                    file_path=valid_paths,
-                    converter=self.doc_converter,
-                    export_type=ExportType.DOC_CHUNKS,
-                    chunker=HybridChunker(tokenizer=self.embed_model_id),
-                )
-                logger.info(f"DoclingLoader created in {time.time() - loader_start:.2f} seconds")
-            except Exception as e:
-                logger.error(f"Failed to create DoclingLoader: {e}", exc_info=True)
-                logger.error("Docling processing failed - no fallback mechanism will be used")
-                return []
-            
-            # STEP 2: Parse documents
-            logger.info("STEP 2: Parsing documents")
-            parse_start = time.time()
-            try:
-                logger.info("Starting document loading and parsing")
-                docs = loader.load()
-                parse_time = time.time() - parse_start
-                logger.info(f"Document parsing completed in {parse_time:.2f} seconds")
+            docs = []
+            for path in valid_paths:
+                # STEP 1: Pick the converter for this file
+                logger.info(f"STEP 1: Selecting converter for {os.path.basename(path)}")
+                converter = self.doc_converter
+                if path.lower().endswith(".pdf"):
+                    converter_key, pdf_info = self._resolve_pdf_options(path, ocr_mode, table_mode)
+                    converter = self._get_pdf_converter(converter_key)
+                    logger.info(f"PDF processing mode: {pdf_info}")
+                    
+                    # Large PDFs are split into page ranges and parsed in the shard pool
+                    page_count = pdf_info.get("page_count") or self._count_pdf_pages(path)
+                    if self._should_shard(page_count):
+                        sharded_docs = self._process_pdf_sharded(path, converter_key, page_count)
+                        if sharded_docs:
+                            pdf_info["shards"] = -(-page_count // settings.DOCLING_SHARD_PAGES)
+                            if processing_info is not None:
+                                processing_info.update(pdf_info)
+                            docs.extend(_number_chunks(sharded_docs))
+                            continue
+                        logger.warning("Sharded parsing failed, falling back to single-pass conversion")
+                    
+                    if processing_info is not None:
+                        processing_info.update(pdf_info)
                 
-                if docs:
-                    logger.info(f"Successfully processed {len(docs)} document chunks")
-                    # Log some info about the chunks
-                    logger.info(f"First chunk content length: {len(docs[0].page_content)} chars")
-                    logger.info(f"Metadata keys: {list(docs[0].metadata.keys())}")
-                else:
-                    logger.warning("No document chunks were produced by Docling")
+                # STEP 2: Create DoclingLoader
+                logger.info("STEP 2: Creating DoclingLoader")
+                loader_start = time.time()
+                try:
+                    # Use dynamic device configuration
+                    loader = DoclingLoader(
+                        file_path=path,
+                        converter=converter,
+                        export_type=ExportType.DOC_CHUNKS,
+                        chunker=HybridChunker(tokenizer=self.embed_model_id),
+                    )
+                    logger.info(f"DoclingLoader created in {time.time() - loader_start:.2f} seconds")
+                except Exception as e:
+                    logger.error(f"Failed to create DoclingLoader: {e}", exc_info=True)
+                    logger.error("Docling processing failed - no fallback mechanism will be used")
+                    return []
+                
+                # STEP 3: Parse documents
+                logger.info("STEP 3: Parsing documents")
+                parse_start = time.time()
+                try:
+                    logger.info("Starting document loading and parsing")
+                    file_docs = loader.load()
+                    parse_time = time.time() - parse_start
+                    logger.info(f"Document parsing completed in {parse_time:.2f} seconds")
                     
-                    # Try to extract raw text as fallback for minimal content files
-                    logger.info("Attempting fallback: extracting raw text from document")
-                    try:
-                        # Get the document conversion result to extract text
-                        conv_result = self.doc_converter.convert(valid_paths[0])
-                        raw_text = conv_result.document.export_to_markdown().strip()
+                    if file_docs:
+                        logger.info(f"Successfully processed {len(file_docs)} document chunks")
+                        # Log some info about the chunks
+                        logger.info(f"First chunk content length: {len(file_docs[0].page_content)} chars")
+                        logger.info(f"Metadata keys: {list(file_docs[0].metadata.keys())}")
+                    else:
+                        logger.warning("No document chunks were produced by Docling")
                         
-                        if raw_text and len(raw_text) > 10:  # Minimum content threshold
-                            logger.info(f"Fallback successful: extracted {len(raw_text)} characters of raw text")
-                            # Create a basic document with the raw text
-                            fallback_doc = Document(
-                                page_content=raw_text,
-                                metadata=metadata or {}
-                            )
-                            docs = [fallback_doc]
-                            logger.info("Created fallback document from raw text")
-                        else:
-                            logger.warning(f"Fallback failed: raw text too short ({len(raw_text)} chars)")
-                            return []
-                    except Exception as fallback_error:
-                        logger.error(f"Fallback text extraction failed: {fallback_error}")
-                        return []
-            except Exception as e:
-                logger.error(f"Failed during document parsing: {e}", exc_info=True)
-                logger.error("Docling parsing failed - no fallback mechanism will be used")
+                        # Try to extract raw text as fallback for minimal content files
+                        logger.info("Attempting fallback: extracting raw text from document")
+                        try:
+                            # Get the document conversion result to extract text
+                            conv_result = converter.convert(path)
+                            raw_text = conv_result.document.export_to_markdown().strip()
+                            
+                            if raw_text and len(raw_text) > 10:  # Minimum content threshold
+                                logger.info(f"Fallback successful: extracted {len(raw_text)} characters of raw text")
+                                # Create a basic document with the raw text
+                                fallback_doc = Document(
+                                    page_content=raw_text,
+                                    metadata=dict(metadata or {})
+                                )
+                                file_docs = [fallback_doc]
+                                logger.info("Created fallback document from raw text")
+                            else:
+                                logger.warning(f"Fallback failed: raw text too short ({len(raw_text)} chars)")
+                        except Exception as fallback_error:
+                            logger.error(f"Fallback text extraction failed: {fallback_error}")
+                    
+                    docs.extend(_number_chunks(file_docs))
+                except Exception as e:
+                    logger.error(f"Failed during document parsing: {e}", exc_info=True)
+                    logger.error("Docling parsing failed - no fallback mechanism will be used")
+                    return []
+            
+            if not docs:
                 return []
             
-            # STEP 3: Add metadata if provided
+            # STEP 4: Add metadata if provided
             if metadata:
-                logger.info("STEP 3: Adding metadata to documents")
+                logger.info("STEP 4: Adding metadata to documents")
                 try:
                     for doc in docs:
                         doc.metadata.update(metadata)
@@ -261,13 +762,18 @@ class DoclingProcessor:
             logger.error("Docling processing failed - no fallback mechanism will be used")
             return []
     
-    def process_file_objects(self, file_objects: List[tuple], metadata: Optional[dict] = None) -> List[Document]:
+    def process_file_objects(self, file_objects: List[tuple], metadata: Optional[dict] = None,
+                             ocr_mode: str = "auto", table_mode: str = "auto",
+                             processing_info: Optional[dict] = None) -> List[Document]:
         """
         Process file objects (in-memory files) using Docling.
         
         Args:
             file_objects: List of tuples containing (file_content, file_name, mime_type)
             metadata: Optional metadata to add to documents
+            ocr_mode: OCR policy for PDFs ('off', 'auto' or 'force')
+            table_mode: Table structure policy for PDFs ('off', 'auto' or 'force')
+            processing_info: Optional dict updated with the applied PDF processing mode
             
         Returns:
             List of processed documents
@@ -281,8 +787,9 @@ class DoclingProcessor:
         try:
             # STEP 1: Save files to temporary location
             logger.info("STEP 1: Saving files to temporary location")
-            temp_dir = "/tmp/docling_temp"
-            os.makedirs(temp_dir, exist_ok=True)
+            os.makedirs("/tmp/docling_temp", exist_ok=True)
+            # Unique directory per call so concurrent ingestions of same-named files don't collide
+            temp_dir = tempfile.mkdtemp(dir="/tmp/docling_temp")
             
             file_paths = []
             for idx, (file_content, file_name, mime_type) in enumerate(file_objects):
@@ -303,7 +810,7 @@ class DoclingProcessor:
             
             # STEP 2: Process files
             logger.info("STEP 2: Processing saved files")
-            docs = self.process_files(file_paths, metadata)
+            docs = self.process_files(file_paths, metadata, ocr_mode, table_mode, processing_info)
             
             # STEP 3: Clean up temporary files
             logger.info("STEP 3: Cleaning up temporary files")
@@ -314,6 +821,7 @@ class DoclingProcessor:
                         logger.info(f"Removed temporary file: {path}")
                     except Exception as e:
                         logger.error(f"Failed to remove temporary file {path}: {e}")
+            shutil.rmtree(temp_dir, ignore_errors=True)
             
             total_time = time.time() - start_time
             logger.info(f"=== FILE OBJECT PROCESSING COMPLETED IN {total_time:.2f} SECONDS ===")
@@ -0,0 +1,141 @@
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db import crud, models
+from app.services.message_history_cache import CachedMessage, message_history_cache
+from app.services.tracing import record_stage
+
+logger = logging.getLogger("history_window")
+
+# Rough characters per token used when no tokenizer is configured
+CHARS_PER_TOKEN = 4
+# Tokens added per message by the chat template (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+# Messages fetched per query while filling the window
+PAGE_SIZE = 50
+
+_tokenizer = None
+_tokenizer_loaded = False
+_tokenizer_lock = threading.Lock()
+
+
+def _get_tokenizer():
+    """Load the chat model's tokenizer once; None if not configured or unavailable."""
+    global _tokenizer, _tokenizer_loaded
+    if _tokenizer_loaded:
+        return _tokenizer
+    with _tokenizer_lock:
+        if not _tokenizer_loaded:
+            if settings.LLM_TOKENIZER_PATH:
+                try:
+                    from transformers import AutoTokenizer
+                    _tokenizer = AutoTokenizer.from_pretrained(settings.LLM_TOKENIZER_PATH)
+                    logger.info(f"Loaded history tokenizer from {settings.LLM_TOKENIZER_PATH}")
+                except Exception as e:
+                    logger.warning(f"Could not load tokenizer {settings.LLM_TOKENIZER_PATH}, estimating tokens from length: {e}")
+            _tokenizer_loaded = True
+    return _tokenizer
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text with the chat model's tokenizer.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Number of tokens (estimated from length if no tokenizer is available)
+    """
+    tokenizer = _get_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False))
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def get_history_budget(conversation_type: Optional[models.ConversationType]) -> int:
+    """
+    Get the history token budget for a conversation type.
+
+    RAG conversations get a smaller budget since retrieved context shares the prompt.
+
+    Args:
+        conversation_type: Type of the conversation
+
+    Returns:
+        Maximum number of history tokens
+    """
+    if conversation_type == models.ConversationType.USER_FILES:
+        return settings.HISTORY_TOKEN_BUDGET_USER_FILES
+    if conversation_type == models.ConversationType.GLOBAL_COLLECTION:
+        return settings.HISTORY_TOKEN_BUDGET_GLOBAL_COLLECTION
+    return settings.HISTORY_TOKEN_BUDGET_REGULAR
+
+
+def load_history_window(db: Session, conversation_id: str,
+                        conversation_type: Optional[models.ConversationType] = None,
+                        max_tokens: Optional[int] = None,
+                        skip_current_message: bool = False) -> List[CachedMessage]:
+    """
+    Load the most recent messages of a conversation that fit in a token budget.
+
+    Messages are taken newest first by sequence_number until the budget is used
+    up (the newest message is always included) and returned in chronological
+    order, starting with a user message. Paths that save the user message before
+    generating pass skip_current_message, since their prompt adds the question itself.
+
+    Args:
+        db: Database session
+        conversation_id: Conversation ID
+        conversation_type: Conversation type used to pick the budget; looked up if omitted
+        max_tokens: Explicit budget overriding the per-type one
+        skip_current_message: Leave out the newest message if it is a user message
+
+    Returns:
+        Messages in chronological order
+    """
+    started = time.perf_counter()
+    if max_tokens is None:
+        if conversation_type is None:
+            conversation = crud.get_conversation(db, conversation_id)
+            conversation_type = conversation.conversation_type if conversation else None
+        max_tokens = get_history_budget(conversation_type)
+
+    window: List[CachedMessage] = []
+    used_tokens = 0
+    before_sequence = None
+    full = False
+    while not full:
+        page = message_history_cache.get_recent(db, conversation_id, limit=PAGE_SIZE, before_sequence=before_sequence)
+        for message in page:
+            if message.role not in ("user", "assistant"):
+                continue
+            if skip_current_message:
+                skip_current_message = False
+                if message.role == "user":
+                    continue
+            cost = count_tokens(message.content) + MESSAGE_OVERHEAD_TOKENS
+            if window and used_tokens + cost > max_tokens:
+                full = True
+                break
+            window.append(message)
+            used_tokens += cost
+        if len(page) < PAGE_SIZE:
+            break
+        before_sequence = page[-1].sequence_number
+
+    window.reverse()
+    # Don't open the history with an answer whose question was cut off
+    while len(window) > 1 and window[0].role == "assistant":
+        window.pop(0)
+
+    record_stage("history_load", time.perf_counter() - started)
+    print(f"DEBUG: History window for {conversation_id}: {len(window)} messages, ~{used_tokens}/{max_tokens} tokens")
+    return window
@@ -0,0 +1,251 @@
+import os
+import json
+import shutil
+import logging
+from typing import Any, Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from app.config import settings
+from app.db.database import SessionLocal
+from app.db.models import IngestionCheckpoint
+
+logger = logging.getLogger("ingestion_checkpoint_service")
+
+
+class IngestionCheckpointService:
+    """
+    Persists the progress of chunked ingestions.
+
+    A checkpoint row tracks how many chunk batches of a source have been embedded
+    and inserted. Parsed chunks and the embeddings of batches that are embedded but
+    not yet inserted are kept under INGESTION_CHECKPOINT_DIR, so a restarted job
+    neither re-parses (re-OCRs) the file nor re-embeds finished batches. The row and
+    its files are removed once the ingestion completes.
+
+    Every method opens its own short-lived session, since ingestion runs in worker
+    threads and background tasks that do not share the request's session.
+    """
+
+    @staticmethod
+    def _checkpoint_dir(checkpoint_id: int) -> str:
+        return os.path.join(settings.INGESTION_CHECKPOINT_DIR, str(checkpoint_id))
+
+    @staticmethod
+    def _snapshot(checkpoint: IngestionCheckpoint) -> Dict[str, Any]:
+        return {
+            "id": checkpoint.id,
+            "collection_name": checkpoint.collection_name,
+            "source_key": checkpoint.source_key,
+            "content_hash": checkpoint.content_hash,
+            "status": checkpoint.status,
+            "batch_size": checkpoint.batch_size,
+            "total_chunks": checkpoint.total_chunks,
+            "embedded_batches": checkpoint.embedded_batches,
+            "inserted_batches": checkpoint.inserted_batches,
+            "processing_info": checkpoint.processing_info,
+        }
+
+    @staticmethod
+    def get_or_create(collection_name: str, source_key: str, content_hash: str, batch_size: int) -> Dict[str, Any]:
+        """
+        Get the checkpoint for a source, starting a new one if there is none or the content changed.
+
+        Args:
+            collection_name: Target collection
+            source_key: Identifier of the source within the collection
+            content_hash: SHA-256 of the source content
+            batch_size: Chunks per batch for a new checkpoint
+
+        Returns:
+            Checkpoint snapshot dictionary
+        """
+        db = SessionLocal()
+        try:
+            checkpoint = db.query(IngestionCheckpoint).filter(
+                IngestionCheckpoint.collection_name == collection_name,
+                IngestionCheckpoint.source_key == source_key
+            ).first()
+
+            if checkpoint and checkpoint.content_hash != content_hash:
+                logger.info(f"Content of {source_key} changed, discarding checkpoint {checkpoint.id}")
+                shutil.rmtree(IngestionCheckpointService._checkpoint_dir(checkpoint.id), ignore_errors=True)
+                db.delete(checkpoint)
+                db.flush()
+                checkpoint = None
+
+            if checkpoint is None:
+                checkpoint = IngestionCheckpoint(
+                    collection_name=collection_name,
+                    source_key=source_key,
+                    content_hash=content_hash,
+                    status="pending",
+                    batch_size=batch_size,
+                    embedded_batches=0,
+                    inserted_batches=0
+                )
+                db.add(checkpoint)
+            else:
+                logger.info(
+                    f"Resuming {source_key} in {collection_name} from checkpoint {checkpoint.id}: "
+                    f"status={checkpoint.status}, inserted {checkpoint.inserted_batches} batches"
+                )
+
+            db.commit()
+            db.refresh(checkpoint)
+            return IngestionCheckpointService._snapshot(checkpoint)
+        finally:
+            db.close()
+
+    @staticmethod
+    def update(checkpoint_id: int, **fields):
+        """
+        Update checkpoint fields.
+
+        Args:
+            checkpoint_id: Checkpoint ID
+            **fields: Column values to set
+        """
+        db = SessionLocal()
+        try:
+            db.query(IngestionCheckpoint).filter(IngestionCheckpoint.id == checkpoint_id).update(fields)
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def save_parsed(checkpoint_id: int, docs: List[Document], processing_info: Optional[Dict[str, Any]] = None):
+        """
+        Store parsed chunks and mark the checkpoint as parsed.
+
+        Args:
+            checkpoint_id: Checkpoint ID
+            docs: Parsed chunks (with their chunk_id metadata)
+            processing_info: PDF processing details recorded during parsing
+        """
+        checkpoint_dir = IngestionCheckpointService._checkpoint_dir(checkpoint_id)
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        path = os.path.join(checkpoint_dir, "chunks.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump([{"page_content": d.page_content, "metadata": d.metadata} for d in docs], f, default=str)
+        os.replace(path + ".tmp", path)
+
+        IngestionCheckpointService.update(
+            checkpoint_id,
+            status="parsed",
+            total_chunks=len(docs),
+            embedded_batches=0,
+            inserted_batches=0,
+            processing_info=processing_info
+        )
+
+    @staticmethod
+    def load_parsed(checkpoint_id: int) -> Optional[List[Document]]:
+        """
+        Load parsed chunks of a checkpoint.
+
+        Args:
+            checkpoint_id: Checkpoint ID
+
+        Returns:
+            List of documents, or None if no parsed chunks are stored
+        """
+        path = os.path.join(IngestionCheckpointService._checkpoint_dir(checkpoint_id), "chunks.json")
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                return [Document(page_content=d["page_content"], metadata=d["metadata"]) for d in json.load(f)]
+        except Exception as e:
+            logger.warning(f"Could not load parsed chunks for checkpoint {checkpoint_id}: {e}")
+            return None
+
+    @staticmethod
+    def save_batch_embeddings(checkpoint_id: int, batch_index: int, embeddings: List[List[float]]):
+        """
+        Store the embeddings of a batch and advance the embedded counter.
+
+        Args:
+            checkpoint_id: Checkpoint ID
+            batch_index: Zero-based batch index
+            embeddings: Embedding vectors of the batch
+        """
+        checkpoint_dir = IngestionCheckpointService._checkpoint_dir(checkpoint_id)
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        path = os.path.join(checkpoint_dir, f"batch_{batch_index:05d}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(embeddings, f)
+        os.replace(path + ".tmp", path)
+        IngestionCheckpointService.update(checkpoint_id, embedded_batches=batch_index + 1)
+
+    @staticmethod
+    def load_batch_embeddings(checkpoint_id: int, batch_index: int) -> Optional[List[List[float]]]:
+        """
+        Load stored embeddings of a batch.
+
+        Args:
+            checkpoint_id: Checkpoint ID
+            batch_index: Zero-based batch index
+
+        Returns:
+            Embedding vectors, or None if not stored
+        """
+        path = os.path.join(IngestionCheckpointService._checkpoint_dir(checkpoint_id), f"batch_{batch_index:05d}.json")
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not load embeddings of batch {batch_index} for checkpoint {checkpoint_id}: {e}")
+            return None
+
+    @staticmethod
+    def mark_batch_inserted(checkpoint_id: int, batch_index: int):
+        """
+        Advance the inserted counter and drop the batch's stored embeddings.
+
+        Args:
+            checkpoint_id: Checkpoint ID
+            batch_index: Zero-based batch index
+        """
+        IngestionCheckpointService.update(checkpoint_id, status="inserting", inserted_batches=batch_index + 1)
+        path = os.path.join(IngestionCheckpointService._checkpoint_dir(checkpoint_id), f"batch_{batch_index:05d}.json")
+        if os.path.exists(path):
+            os.remove(path)
+
+    @staticmethod
+    def fail(checkpoint_id: int, error: str):
+        """Record an ingestion failure, keeping progress for the next attempt."""
+        IngestionCheckpointService.update(checkpoint_id, status="failed", error=error[:2000])
+
+    @staticmethod
+    def complete(checkpoint_id: int):
+        """Remove a finished checkpoint and its stored data."""
+        db = SessionLocal()
+        try:
+            db.query(IngestionCheckpoint).filter(IngestionCheckpoint.id == checkpoint_id).delete()
+            db.commit()
+        finally:
+            db.close()
+        shutil.rmtree(IngestionCheckpointService._checkpoint_dir(checkpoint_id), ignore_errors=True)
+
+    @staticmethod
+    def discard_collection(collection_name: str):
+        """
+        Remove all checkpoints of a collection (e.g. when the collection is deleted).
+
+        Args:
+            collection_name: Collection name
+        """
+        db = SessionLocal()
+        try:
+            checkpoints = db.query(IngestionCheckpoint).filter(
+                IngestionCheckpoint.collection_name == collection_name
+            ).all()
+            for checkpoint in checkpoints:
+                shutil.rmtree(IngestionCheckpointService._checkpoint_dir(checkpoint.id), ignore_errors=True)
+                db.delete(checkpoint)
+            db.commit()
+        finally:
+            db.close()
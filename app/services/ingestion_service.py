@@ -1,7 +1,10 @@
 import io
 import os
+import json
 import time
+import hashlib
 import logging
+import threading
 from typing import List, Dict, Any, Optional, Union, Tuple, BinaryIO
 from pathlib import Path
 import tempfile
@@ -13,6 +16,8 @@ from app.config import settings
 from app.utils.infinity_embedder import InfinityEmbedder
 from app.services.document_processor import DoclingProcessor
 from app.services.rag_service import RemoteVectorStoreManager
+from app.services.ingestion_checkpoint_service import IngestionCheckpointService
+from app.services.metrics import INGESTION_IN_PROGRESS, VECTOR_STORE_OPERATION_DURATION
 from app.utils.string_utils import sanitize_collection_name
 
 # Set up logging
@@ -21,6 +26,17 @@ logging.basicConfig(level=logging.INFO,
                    handlers=[logging.StreamHandler()])
 logger = logging.getLogger("ingestion_service")
 
+# Per-collection locks guarding the first insert into a collection that does not exist yet,
+# so concurrent ingestions don't race to create the same Milvus collection
+_collection_locks: Dict[str, threading.Lock] = {}
+_collection_locks_guard = threading.Lock()
+
+
+def _get_collection_lock(collection_name: str) -> threading.Lock:
+    """Get the creation lock for a collection."""
+    with _collection_locks_guard:
+        return _collection_locks.setdefault(collection_name, threading.Lock())
+
 class DocumentIngestionService:
     """Service for ingesting documents into the vector store."""
     
@@ -92,7 +108,170 @@ class DocumentIngestionService:
             logger.error(f"Failed to get/create vector store: {e}", exc_info=True)
             raise
     
-    def ingest_file(self, file_path: str, collection_name: str, metadata: Optional[Dict[str, Any]] = None) -> int:
+    @VECTOR_STORE_OPERATION_DURATION.labels("add_documents").time()
+    def _add_documents(self, collection_name: str, docs: List[Document]):
+        """
+        Add documents to a collection, serializing the insert that creates the collection.
+        
+        Args:
+            collection_name: Name of the collection
+            docs: Documents to add
+        """
+        safe_collection_name = sanitize_collection_name(collection_name)
+        if self.vectorstore_manager.collection_exists(safe_collection_name):
+            self.get_vector_store(collection_name).add_documents(docs)
+            return
+        
+        with _get_collection_lock(safe_collection_name):
+            # Another ingestion may have created the collection while we waited
+            vector_store = self.get_vector_store(collection_name)
+            vector_store.add_documents(docs)
+    
+    @VECTOR_STORE_OPERATION_DURATION.labels("add_embeddings").time()
+    def _add_embeddings(self, collection_name: str, texts: List[str], embeddings: List[List[float]],
+                        metadatas: List[Dict[str, Any]]):
+        """
+        Add pre-computed embeddings to a collection, serializing the insert that creates the collection.
+        
+        Args:
+            collection_name: Name of the collection
+            texts: Chunk texts
+            embeddings: Embedding vectors for the texts
+            metadatas: Metadata for each chunk
+        """
+        safe_collection_name = sanitize_collection_name(collection_name)
+        if self.vectorstore_manager.collection_exists(safe_collection_name):
+            self.get_vector_store(collection_name).add_embeddings(texts, embeddings, metadatas)
+            return
+        
+        with _get_collection_lock(safe_collection_name):
+            vector_store = self.get_vector_store(collection_name)
+            vector_store.add_embeddings(texts, embeddings, metadatas)
+    
+    def _delete_chunks(self, collection_name: str, chunk_ids: List[str]):
+        """
+        Delete chunks by their deterministic chunk IDs, if the collection has them.
+        
+        Args:
+            collection_name: Name of the collection
+            chunk_ids: Chunk IDs to delete
+        """
+        safe_collection_name = sanitize_collection_name(collection_name)
+        if not chunk_ids or not self.vectorstore_manager.collection_exists(safe_collection_name):
+            return
+        try:
+            self.get_vector_store(collection_name).delete(expr=f"chunk_id in {json.dumps(chunk_ids)}")
+        except Exception as e:
+            # Collections created before chunk IDs existed have no chunk_id field
+            logger.warning(f"Could not delete partially inserted chunks from {safe_collection_name}: {e}")
+    
+    def _ingest_checkpointed(self, content: bytes, filename: str, mime_type: str, collection_name: str,
+                             metadata: Optional[Dict[str, Any]], source_key: str, ocr_mode: str,
+                             table_mode: str, processing_info: Optional[Dict[str, Any]]) -> int:
+        """
+        Ingest file content in checkpointed batches.
+        
+        Parsed chunks are stored once, then each batch is embedded and inserted with its
+        progress committed, so a restarted job resumes from the last inserted batch
+        without re-parsing or re-embedding. Chunks carry a deterministic chunk_id so a
+        batch that was inserted but not yet checkpointed is replaced rather than duplicated.
+        
+        Args:
+            content: File content
+            filename: Name of the file
+            mime_type: MIME type of the file
+            collection_name: Name of the collection
+            metadata: Additional metadata to add to documents
+            source_key: Identifier of the source within the collection
+            ocr_mode: OCR policy for PDFs
+            table_mode: Table structure policy for PDFs
+            processing_info: Optional dict updated with the applied PDF processing mode
+            
+        Returns:
+            Number of documents processed
+        """
+        content_hash = hashlib.sha256(content).hexdigest()
+        checkpoint = IngestionCheckpointService.get_or_create(
+            collection_name, source_key, content_hash, settings.INGESTION_BATCH_SIZE
+        )
+        checkpoint_id = checkpoint["id"]
+        resumed = checkpoint["status"] != "pending"
+        reparsed = False
+        
+        try:
+            # STEP 2: Parse, unless a previous attempt already stored the chunks
+            docs = None
+            if checkpoint["status"] != "pending":
+                docs = IngestionCheckpointService.load_parsed(checkpoint_id)
+            if docs is not None:
+                logger.info(f"STEP 2: Reusing {len(docs)} parsed chunks from checkpoint {checkpoint_id}")
+                if processing_info is not None and checkpoint["processing_info"]:
+                    processing_info.update(checkpoint["processing_info"])
+            else:
+                logger.info("STEP 2: Processing with Docling")
+                process_start = time.time()
+                parsed_info: Dict[str, Any] = {}
+                docs = self.document_processor.process_file_objects(
+                    [(content, filename, mime_type)], metadata, ocr_mode, table_mode, parsed_info
+                )
+                if not docs:
+                    IngestionCheckpointService.complete(checkpoint_id)
+                    logger.error("No documents were produced by the document processor - file contains insufficient content for chunking")
+                    raise ValueError("File contains insufficient content for processing. Please provide files with more substantial text content.")
+                
+                for index, doc in enumerate(docs):
+                    doc.metadata["chunk_id"] = hashlib.sha1(
+                        f"{source_key}:{content_hash}:{index}".encode("utf-8")
+                    ).hexdigest()
+                    doc.metadata["content_hash"] = content_hash
+                IngestionCheckpointService.save_parsed(checkpoint_id, docs, parsed_info or None)
+                if processing_info is not None:
+                    processing_info.update(parsed_info)
+                # A fresh parse restarts batch progress
+                checkpoint.update(embedded_batches=0, inserted_batches=0)
+                reparsed = True
+                logger.info(f"Document processing completed in {time.time() - process_start:.2f} seconds, produced {len(docs)} chunks")
+            
+            # STEP 3: Embed and insert batch by batch
+            batch_size = checkpoint["batch_size"]
+            batch_count = (len(docs) + batch_size - 1) // batch_size
+            first_batch = checkpoint["inserted_batches"]
+            logger.info(f"STEP 3: Inserting batches {first_batch + 1}-{batch_count} of {batch_size} chunks")
+            vector_start = time.time()
+            
+            for batch_index in range(first_batch, batch_count):
+                batch = docs[batch_index * batch_size:(batch_index + 1) * batch_size]
+                texts = [doc.page_content for doc in batch]
+                
+                embeddings = None
+                if batch_index < checkpoint["embedded_batches"]:
+                    embeddings = IngestionCheckpointService.load_batch_embeddings(checkpoint_id, batch_index)
+                if embeddings is None:
+                    embeddings = self.embeddings.embed_documents(texts)
+                    IngestionCheckpointService.save_batch_embeddings(checkpoint_id, batch_index, embeddings)
+                
+                if resumed and (reparsed or batch_index == first_batch):
+                    # The previous attempt may have inserted this batch without recording it
+                    self._delete_chunks(collection_name, [doc.metadata["chunk_id"] for doc in batch])
+                
+                self._add_embeddings(collection_name, texts, embeddings, [doc.metadata for doc in batch])
+                IngestionCheckpointService.mark_batch_inserted(checkpoint_id, batch_index)
+                logger.info(f"Inserted batch {batch_index + 1}/{batch_count}")
+            
+            logger.info(f"Vectorization completed in {time.time() - vector_start:.2f} seconds")
+            IngestionCheckpointService.complete(checkpoint_id)
+            return len(docs)
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.error(f"Checkpointed ingestion of {filename} failed, progress kept in checkpoint {checkpoint_id}: {e}", exc_info=True)
+            IngestionCheckpointService.fail(checkpoint_id, str(e))
+            raise Exception("Failed to ingest file into vector store")
+    
+    @INGESTION_IN_PROGRESS.track_inprogress()
+    def ingest_file(self, file_path: str, collection_name: str, metadata: Optional[Dict[str, Any]] = None,
+                    ocr_mode: str = "auto", table_mode: str = "auto",
+                    processing_info: Optional[Dict[str, Any]] = None) -> int:
         """
         Ingest a file into the vector store.
         
@@ -100,6 +279,9 @@ class DocumentIngestionService:
             file_path: Path to the file
             collection_name: Name of the collection
             metadata: Additional metadata to add to documents
+            ocr_mode: OCR policy for PDFs ('off', 'auto' or 'force')
+            table_mode: Table structure policy for PDFs ('off', 'auto' or 'force')
+            processing_info: Optional dict updated with the applied PDF processing mode
             
         Returns:
             Number of documents processed
@@ -110,7 +292,9 @@ class DocumentIngestionService:
         # STEP 1: Process file with Docling
         logger.info("STEP 1: Processing file with Docling")
         process_start = time.time()
-        docs = self.document_processor.process_files([file_path], metadata)
+        docs = self.document_processor.process_files(
+            [file_path], metadata, ocr_mode, table_mode, processing_info
+        )
         process_time = time.time() - process_start
         
         if not docs:
@@ -124,9 +308,8 @@ class DocumentIngestionService:
         logger.info(f"STEP 2: Adding {len(docs)} chunks to vector store")
         vector_start = time.time()
         try:
-            vector_store = self.get_vector_store(collection_name)
             logger.info(f"Starting vectorization of {len(docs)} chunks")
-            vector_store.add_documents(docs)
+            self._add_documents(collection_name, docs)
             vector_time = time.time() - vector_start
             logger.info(f"Vectorization completed in {vector_time:.2f} seconds")
         except Exception as e:
@@ -137,7 +320,11 @@ class DocumentIngestionService:
         logger.info(f"=== FILE INGESTION COMPLETED IN {total_time:.2f} SECONDS ===")
         return len(docs)
     
-    def ingest_file_object(self, file_obj: BinaryIO, filename: str, collection_name: str, metadata: Optional[Dict[str, Any]] = None) -> int:
+    @INGESTION_IN_PROGRESS.track_inprogress()
+    def ingest_file_object(self, file_obj: BinaryIO, filename: str, collection_name: str, metadata: Optional[Dict[str, Any]] = None,
+                           ocr_mode: str = "auto", table_mode: str = "auto",
+                           processing_info: Optional[Dict[str, Any]] = None,
+                           checkpoint_key: Optional[str] = None) -> int:
         """
         Ingest a file object into the vector store.
         
@@ -146,6 +333,11 @@ class DocumentIngestionService:
             filename: Name of the file
             collection_name: Name of the collection
             metadata: Additional metadata to add to documents
+            ocr_mode: OCR policy for PDFs ('off', 'auto' or 'force')
+            table_mode: Table structure policy for PDFs ('off', 'auto' or 'force')
+            processing_info: Optional dict updated with the applied PDF processing mode
+            checkpoint_key: Source identifier for resumable ingestion; defaults to
+                file:<source_file_id> when the metadata carries a source_file_id
             
         Returns:
             Number of documents processed
@@ -164,11 +356,24 @@ class DocumentIngestionService:
             logger.error(f"Failed to read file content: {e}", exc_info=True)
             return 0
         
+        # Files are ingested in resumable batches when they can be identified across attempts
+        if checkpoint_key is None and metadata and metadata.get("source_file_id") is not None:
+            checkpoint_key = f"file:{metadata['source_file_id']}"
+        if settings.INGESTION_CHECKPOINTS_ENABLED and checkpoint_key:
+            num_docs = self._ingest_checkpointed(
+                content, filename, mime_type, collection_name, metadata, checkpoint_key,
+                ocr_mode, table_mode, processing_info
+            )
+            logger.info(f"=== FILE OBJECT INGESTION COMPLETED IN {time.time() - start_time:.2f} SECONDS ===")
+            return num_docs
+        
         # STEP 2: Process with Docling
         logger.info("STEP 2: Processing with Docling")
         process_start = time.time()
         try:
-            docs = self.document_processor.process_file_objects([(content, filename, mime_type)], metadata)
+            docs = self.document_processor.process_file_objects(
+                [(content, filename, mime_type)], metadata, ocr_mode, table_mode, processing_info
+            )
             process_time = time.time() - process_start
             
             if not docs:
@@ -189,9 +394,8 @@ class DocumentIngestionService:
         vector_start = time.time()
         try:
             # Add to vector store using sanitized collection name
-            vector_store = self.get_vector_store(collection_name)
             logger.info(f"Starting vectorization of {len(docs)} chunks")
-            vector_store.add_documents(docs)
+            self._add_documents(collection_name, docs)
             vector_time = time.time() - vector_start
             logger.info(f"Vectorization completed in {vector_time:.2f} seconds")
         except Exception as e:
@@ -254,9 +458,8 @@ class DocumentIngestionService:
             vector_start = time.time()
             try:
                 # Add to vector store
-                vector_store = self.get_vector_store(collection_name)
                 logger.info(f"Starting vectorization of {len(docs)} chunks")
-                vector_store.add_documents(docs)
+                self._add_documents(collection_name, docs)
                 vector_time = time.time() - vector_start
                 logger.info(f"Vectorization completed in {vector_time:.2f} seconds")
             except Exception as e:
@@ -377,10 +580,23 @@ class DocumentIngestionService:
             logger.info(f"Connecting to Milvus: {settings.MILVUS_URI}")
             connections.connect(uri=settings.MILVUS_URI)
             
+            # Blue/green collections are an alias over <name>__g<N> generations
+            if self.vectorstore_manager.resolve_alias(collection_name):
+                logger.info(f"Collection is an alias, dropping it and its generations: {collection_name}")
+                utility.drop_alias(collection_name)
+                generation_prefix = f"{collection_name}__g"
+                for name in utility.list_collections():
+                    if name.startswith(generation_prefix) and name[len(generation_prefix):].isdigit():
+                        utility.drop_collection(name)
+                        IngestionCheckpointService.discard_collection(name)
+                logger.info(f"Successfully deleted collection: {collection_name}")
+                return True
+            
             # Check if collection exists
             if utility.has_collection(collection_name):
                 logger.info(f"Found collection, dropping: {collection_name}")
                 utility.drop_collection(collection_name)
+                IngestionCheckpointService.discard_collection(collection_name)
                 logger.info(f"Successfully deleted collection: {collection_name}")
                 return True
             
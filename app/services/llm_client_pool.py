@@ -0,0 +1,200 @@
+import asyncio
+import copy
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from sqlalchemy.orm import Session
+from langchain_openai import ChatOpenAI
+
+from app.config import settings
+from app.db import crud
+from app.services.metrics import llm_event_hooks
+from app.services.notification_service import config_change_listener
+
+logger = logging.getLogger("llm_client_pool")
+
+LLM_CONFIG_CHANGE = "llm_config"
+
+
+class LLMClientPool:
+    """
+    Process-wide pool of ChatOpenAI clients.
+
+    Clients are keyed by (config version, streaming, thinking) and share one
+    keep-alive HTTP connection pool to the LLM endpoint, so a chat turn neither
+    reads llm_config from the database nor opens new TCP/TLS connections. The
+    cached config is dropped when update_llm_config commits (in every worker, via
+    the config change listener), with a TTL as a safety net.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._config: Optional[Dict[str, Any]] = None
+        self._config_loaded_at = 0.0
+        self._clients: Dict[Tuple, ChatOpenAI] = {}
+        self._http_client: Optional[httpx.Client] = None
+        self._http_async_client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind_event_loop(self):
+        """
+        Share an async HTTP pool on the worker's event loop. Must be called from that loop.
+
+        httpx.AsyncClient is tied to the loop it first runs on, so clients requested
+        from other loops (e.g. asyncio.run in a thread) get their own connections.
+        """
+        self._loop = asyncio.get_running_loop()
+
+    def invalidate(self, payload: Optional[dict] = None):
+        """Drop the cached config and clients; the HTTP pools are kept."""
+        with self._lock:
+            self._config = None
+            self._clients.clear()
+        logger.info("LLM client pool invalidated")
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=60
+        )
+
+    def _get_http_client(self) -> httpx.Client:
+        if self._http_client is None:
+            self._http_client = httpx.Client(
+                limits=self._limits(), timeout=settings.LLM_HTTP_TIMEOUT, event_hooks=llm_event_hooks()
+            )
+        return self._http_client
+
+    def _get_http_async_client(self) -> httpx.AsyncClient:
+        if self._http_async_client is None:
+            self._http_async_client = httpx.AsyncClient(
+                limits=self._limits(), timeout=settings.LLM_HTTP_TIMEOUT, event_hooks=llm_event_hooks(asynchronous=True)
+            )
+        return self._http_async_client
+
+    def _config_is_fresh(self) -> bool:
+        return self._config is not None and time.monotonic() - self._config_loaded_at < settings.LLM_CONFIG_CACHE_TTL_SECONDS
+
+    def _load_config(self, db: Session) -> Dict[str, Any]:
+        """Get the cached LLM config, reading it from the database if needed. Caller holds the lock."""
+        if self._config_is_fresh():
+            return self._config
+
+        config = crud.get_active_llm_config(db)
+        # If no config exists, create a default one
+        if not config:
+            config = crud.create_default_llm_config(db)
+
+        version = f"{config.id}:{config.updated_at or config.created_at}"
+        if self._config is not None and self._config["version"] != version:
+            self._clients.clear()
+
+        self._config = {
+            "version": version,
+            "model_name": config.model_name,
+            "temperature": config.temperature,
+            "top_p": config.top_p,
+            "max_tokens": config.max_tokens,
+            "enable_thinking": getattr(config, "enable_thinking", False),
+            "extra_params": copy.deepcopy(config.extra_params) if config.extra_params else None,
+        }
+        self._config_loaded_at = time.monotonic()
+        print(f"DEBUG: Loaded LLM config version {version}: model={config.model_name}, temp={config.temperature}, top_p={config.top_p}")
+        return self._config
+
+    def _build_params(self, config: Dict[str, Any], streaming: bool, enable_thinking: bool) -> Dict[str, Any]:
+        """Build ChatOpenAI parameters from a config snapshot."""
+        model_params = {
+            "model_name": config["model_name"],
+            "temperature": config["temperature"],
+            "top_p": config["top_p"],
+        }
+
+        # Add max_tokens if set
+        if config["max_tokens"]:
+            model_params["max_tokens"] = config["max_tokens"]
+
+        # Add extra parameters from the config (like base_url and api_key)
+        if config["extra_params"]:
+            for key, value in copy.deepcopy(config["extra_params"]).items():
+                model_params[key] = value
+
+        # Use defaults from settings if not provided
+        if "api_key" not in model_params:
+            model_params["api_key"] = settings.OPENAI_API_KEY
+        if "base_url" not in model_params:
+            model_params["base_url"] = settings.OPENAI_API_BASE
+
+        # Set chat_template_kwargs with enable_thinking in extra_body
+        model_params.setdefault("extra_body", {})
+        model_params["extra_body"].setdefault("chat_template_kwargs", {})
+        model_params["extra_body"]["chat_template_kwargs"]["enable_thinking"] = enable_thinking
+
+        if streaming:
+            model_params["streaming"] = True
+        return model_params
+
+    def get_llm(self, db: Session, streaming: bool = False, override_thinking: Optional[bool] = None) -> ChatOpenAI:
+        """
+        Get a configured LLM client, reusing a pooled one when possible.
+
+        Args:
+            db: Database session (only used when the config is not cached)
+            streaming: Whether to enable streaming mode
+            override_thinking: Override the enable_thinking setting from config
+
+        Returns:
+            Configured ChatOpenAI instance
+        """
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        shared_async = self._loop is not None and running_loop is self._loop
+
+        with self._lock:
+            config = self._load_config(db)
+            enable_thinking = override_thinking if override_thinking is not None else bool(config["enable_thinking"])
+            key = (config["version"], streaming, enable_thinking, shared_async)
+
+            llm = self._clients.get(key)
+            if llm is None:
+                model_params = self._build_params(config, streaming, enable_thinking)
+                model_params["http_client"] = self._get_http_client()
+                if shared_async:
+                    model_params["http_async_client"] = self._get_http_async_client()
+                llm = ChatOpenAI(**model_params)
+                self._clients[key] = llm
+                logger.info(f"Created pooled LLM client: version={config['version']}, streaming={streaming}, thinking={enable_thinking}")
+            return llm
+
+    def _refresh_config(self, db: Session):
+        with self._lock:
+            self._load_config(db)
+
+    async def aget_llm(self, db: Session, streaming: bool = False, override_thinking: Optional[bool] = None) -> ChatOpenAI:
+        """
+        Get a configured LLM client from the event loop.
+
+        Same as get_llm, but a config read from the database runs in a worker
+        thread instead of blocking the loop.
+
+        Args:
+            db: Database session (only used when the config is not cached)
+            streaming: Whether to enable streaming mode
+            override_thinking: Override the enable_thinking setting from config
+
+        Returns:
+            Configured ChatOpenAI instance
+        """
+        if not self._config_is_fresh():
+            await asyncio.to_thread(self._refresh_config, db)
+        return self.get_llm(db, streaming=streaming, override_thinking=override_thinking)
+
+
+llm_client_pool = LLMClientPool()
+config_change_listener.register(LLM_CONFIG_CHANGE, llm_client_pool.invalidate)
@@ -5,14 +5,18 @@ import asyncio
 
 from langchain.memory import ConversationBufferMemory
 from langchain.chains import ConversationChain
-from langchain_openai import ChatOpenAI
 from langchain.schema import BaseMessage, HumanMessage, AIMessage, SystemMessage
 from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
 from langchain.callbacks.base import BaseCallbackHandler
 
-from app.config import settings
 from app.db import crud, models, schemas
+from app.db.database import release_connection
 from app.services.rag_config_service import RAGConfigService
+from app.services.llm_client_pool import llm_client_pool
+from app.services.history_window import load_history_window
+from app.services.conversation_summary_service import ConversationSummaryService
+from app.services.stream_cancellation import save_partial_answer
+from app.services.tracing import set_pipeline, timed_stream, trace_span
 from app.utils.title_utils import clean_title
 
 # Store conversation memory
@@ -48,79 +52,17 @@ class StreamingCallbackHandler(BaseCallbackHandler):
 
 def get_llm(db: Session, streaming: bool = False, override_thinking: Optional[bool] = None):
     """
-    Initialize and return the LLM model using configuration from the database
+    Get the LLM model configured in the database from the shared client pool
     
     Args:
-        db: Database session
+        db: Database session (only read when the cached config is stale)
         streaming: Whether to enable streaming mode
         override_thinking: Override the enable_thinking setting from config (useful for specific use cases)
         
     Returns:
         Configured LLM instance
     """
-    # Get the LLM config from the database (there's only one)
-    config = crud.get_active_llm_config(db)
-    
-    # If no config exists, create a default one
-    if not config:
-        config = crud.create_default_llm_config(db)
-    
-    print(f"DEBUG: Using LLM config: model={config.model_name}, temp={config.temperature}, top_p={config.top_p}")
-    
-    # Create model params from config
-    model_params = {
-        "model_name": config.model_name,
-        "temperature": config.temperature,
-        "top_p": config.top_p,
-    }
-    
-    # Add max_tokens if set
-    if config.max_tokens:
-        model_params["max_tokens"] = config.max_tokens
-    
-    # Handle enable_thinking parameter
-    enable_thinking = override_thinking if override_thinking is not None else getattr(config, 'enable_thinking', False)
-    
-    # Add extra parameters from the config (like base_url and api_key)
-    if config.extra_params:
-        # If base_url is in extra_params, use it
-        if "base_url" in config.extra_params:
-            model_params["base_url"] = config.extra_params["base_url"]
-        
-        # If api_key is in extra_params, use it
-        if "api_key" in config.extra_params:
-            model_params["api_key"] = config.extra_params["api_key"]
-        
-        # Add any other extra parameters
-        for key, value in config.extra_params.items():
-            if key not in ["base_url", "api_key"]:
-                model_params[key] = value
-    
-    # If no API key is provided, use the one from settings
-    if "api_key" not in model_params:
-        model_params["api_key"] = settings.OPENAI_API_KEY
-    
-    # If no base_url is provided, use the one from settings
-    if "base_url" not in model_params:
-        model_params["base_url"] = settings.OPENAI_API_BASE
-    
-    # Add thinking configuration to extra_body
-    if "extra_body" not in model_params:
-        model_params["extra_body"] = {}
-    
-    # Set chat_template_kwargs with enable_thinking
-    if "chat_template_kwargs" not in model_params["extra_body"]:
-        model_params["extra_body"]["chat_template_kwargs"] = {}
-    
-    model_params["extra_body"]["chat_template_kwargs"]["enable_thinking"] = enable_thinking
-    
-    # If streaming is enabled, add the streaming parameter and callback
-    if streaming:
-        model_params["streaming"] = True
-        # Don't set callback handler here, we'll pass it separately
-    
-    # Initialize the model
-    return ChatOpenAI(**model_params)
+    return llm_client_pool.get_llm(db, streaming=streaming, override_thinking=override_thinking)
 
 def extract_user_info(messages: List[models.Message]) -> Dict[str, str]:
     """
@@ -164,7 +106,22 @@ def get_system_prompt(db: Session) -> Optional[str]:
     """
     return RAGConfigService.get_regular_chat_prompt(db)
 
-def get_conversation_memory(db: Session, conversation_id: str = None, user_id: int = None):
+def get_system_prompt_with_summary(db: Session, conversation_id: str) -> Optional[str]:
+    """
+    Get the regular chat system prompt extended with the conversation summary.
+    
+    Args:
+        db: Database session
+        conversation_id: Conversation ID
+        
+    Returns:
+        System prompt string, or None if neither is available
+    """
+    parts = [get_system_prompt(db), ConversationSummaryService.get_summary_prompt(db, conversation_id)]
+    return "\n\n".join(part for part in parts if part) or None
+
+def get_conversation_memory(db: Session, conversation_id: str = None, user_id: int = None,
+                            skip_current_message: bool = False):
     """
     Get or create a conversation with its memory
     
@@ -172,6 +129,7 @@ def get_conversation_memory(db: Session, conversation_id: str = None, user_id: i
         db: Database session
         conversation_id: ID of existing conversation
         user_id: User ID for creating a new conversation
+        skip_current_message: Leave the already saved current question out of the memory
         
     Returns:
         Tuple of (conversation_memory, conversation_id, is_new_conversation)
@@ -198,9 +156,11 @@ def get_conversation_memory(db: Session, conversation_id: str = None, user_id: i
     # Create memory and load messages from database
     memory = ConversationBufferMemory()
     
-    # Load existing messages if this is not a new conversation
+    # Load the most recent messages within the history token budget if this is not a new conversation
     if not is_new_conversation:
-        messages = crud.get_conversation_messages(db, conversation_id)
+        messages = load_history_window(
+            db, conversation_id, db_conversation.conversation_type, skip_current_message=skip_current_message
+        )
         for msg in messages:
             if msg.role == "user":
                 memory.chat_memory.add_user_message(msg.content)
@@ -248,14 +208,12 @@ async def get_llm_response(db: Session, user_id: int, message: str, conversation
     if meta_data and conversation_id:
         crud.update_conversation(db, conversation_id, meta_data)
     
-    # Save user message to database
+    # The user message is saved together with the response below
     user_message = schemas.MessageCreate(
         conversation_id=conversation_id,
         role="user",
         content=message
     )
-    created_msg = crud.create_message(db, user_message)
-    print(f"DEBUG: Saved user message to database, id: {created_msg.id}")
     
     # Update memory with the user message (important for context)
     memory.chat_memory.add_user_message(message)
@@ -267,8 +225,8 @@ async def get_llm_response(db: Session, user_id: int, message: str, conversation
     # Convert memory messages to the format expected by the LLM
     messages = []
     
-    # Add system prompt if configured
-    system_prompt = get_system_prompt(db)
+    # Add system prompt if configured, with the summary of older messages
+    system_prompt = get_system_prompt_with_summary(db, conversation_id)
     if system_prompt:
         messages.append(SystemMessage(content=system_prompt))
     
@@ -292,14 +250,15 @@ async def get_llm_response(db: Session, user_id: int, message: str, conversation
         print(f"ERROR: Exception calling LLM: {str(e)}")
         response = "Sorry, I encountered an error while processing your request."
     
-    # Save assistant response to database
+    # Save the user message and assistant response to database in one transaction
     assistant_message = schemas.MessageCreate(
         conversation_id=conversation_id,
         role="assistant",
         content=response
     )
-    crud.create_message(db, assistant_message)
-    print(f"DEBUG: Saved assistant response to database")
+    created_msgs = crud.create_messages(db, [user_message, assistant_message])
+    print(f"DEBUG: Saved user message and assistant response to database, ids: {[m.id for m in created_msgs]}")
+    ConversationSummaryService.schedule_update(conversation_id)
     
     # Update the memory with the assistant's response
     memory.chat_memory.add_ai_message(response)
@@ -307,11 +266,26 @@ async def get_llm_response(db: Session, user_id: int, message: str, conversation
     # Return just the response string, not a dictionary
     return response
 
-async def get_streaming_llm_response(db: Session, user_id: int, message: str, conversation_id: Optional[str] = None, meta_data: Optional[dict] = None, save_user_message: bool = True):
-    """Get a streaming response from the LLM and store it in the database when complete"""
-    # Get or create conversation with memory
+def _prepare_streaming_turn(db: Session, user_id: int, message: str, conversation_id: Optional[str],
+                            meta_data: Optional[dict], save_user_message: bool):
+    """
+    Do the database work before a streamed answer. Runs in a worker thread.
+    
+    Args:
+        db: Database session
+        user_id: User ID
+        message: User message
+        conversation_id: ID of existing conversation
+        meta_data: Conversation meta_data to store, if any
+        save_user_message: Whether to save the user message
+        
+    Returns:
+        Tuple of (conversation_id, memory, LLM input messages)
+    """
+    # Get or create conversation with memory; a message saved by the caller is
+    # already the newest in history and is added back below
     memory, conversation_id, is_new = get_conversation_memory(
-        db, conversation_id, user_id
+        db, conversation_id, user_id, skip_current_message=not save_user_message
     )
     
     # Update conversation meta_data if provided
@@ -325,39 +299,58 @@ async def get_streaming_llm_response(db: Session, user_id: int, message: str, co
             role="user",
             content=message
         )
-        created_msg = crud.create_message(db, user_message)
+        crud.create_message(db, user_message)
     
     # Update memory with the user message (important for context)
     memory.chat_memory.add_user_message(message)
     
+    # Convert memory messages to the format expected by the LLM
+    messages = []
+    
+    # Add system prompt if configured, with the summary of older messages
+    with trace_span("config"):
+        system_prompt = get_system_prompt_with_summary(db, conversation_id)
+    if system_prompt:
+        messages.append(SystemMessage(content=system_prompt))
+    
+    for msg in memory.chat_memory.messages:
+        if isinstance(msg, HumanMessage):
+            messages.append(HumanMessage(content=msg.content))
+        elif isinstance(msg, AIMessage):
+            messages.append(AIMessage(content=msg.content))
+    
+    # Don't hold a pooled connection while tokens are generated
+    release_connection(db)
+    return conversation_id, memory, messages
+
+async def get_streaming_llm_response(db: Session, user_id: int, message: str, conversation_id: Optional[str] = None, meta_data: Optional[dict] = None, save_user_message: bool = True, stream_id: Optional[str] = None):
+    """Get a streaming response from the LLM and store it in the database when complete"""
+    set_pipeline("chat")
+    # Database queries run in a worker thread so they don't block the event loop
+    conversation_id, memory, messages = await asyncio.to_thread(
+        _prepare_streaming_turn, db, user_id, message, conversation_id, meta_data, save_user_message
+    )
+    
     # Get LLM with streaming enabled
-    llm = get_llm(db, streaming=True)
+    with trace_span("config"):
+        llm = await llm_client_pool.aget_llm(db, streaming=True)
     
     # Collect the full response for storing in the database
     full_response = []
     
     # Stream directly using LangChain's native async streaming
     try:
-        # Convert memory messages to the format expected by the LLM
-        messages = []
-        
-        # Add system prompt if configured
-        system_prompt = get_system_prompt(db)
-        if system_prompt:
-            messages.append(SystemMessage(content=system_prompt))
-        
-        for msg in memory.chat_memory.messages:
-            if isinstance(msg, HumanMessage):
-                messages.append(HumanMessage(content=msg.content))
-            elif isinstance(msg, AIMessage):
-                messages.append(AIMessage(content=msg.content))
-        
         # Use LangChain's native async streaming method
-        async for chunk in llm.astream(messages):
-            token = chunk.content
-            full_response.append(token)
-            # Yield each token for streaming to the client
-            yield token
+        try:
+            async for chunk in timed_stream(llm.astream(messages)):
+                token = chunk.content
+                full_response.append(token)
+                # Yield each token for streaming to the client
+                yield token
+        except (asyncio.CancelledError, GeneratorExit):
+            # Client went away: keep what was generated so far
+            await asyncio.to_thread(save_partial_answer, db, conversation_id, full_response, stream_id=stream_id)
+            raise
         
         # Combine all tokens into the complete response
         complete_response = "".join(full_response)
@@ -366,9 +359,12 @@ async def get_streaming_llm_response(db: Session, user_id: int, message: str, co
         assistant_message = schemas.MessageCreate(
             conversation_id=conversation_id,
             role="assistant",
-            content=complete_response
+            content=complete_response,
+            stream_id=stream_id
         )
-        crud.create_message(db, assistant_message)
+        with trace_span("db_save"):
+            await asyncio.to_thread(crud.create_message, db, assistant_message)
+        ConversationSummaryService.schedule_update(conversation_id)
         
         # Update the memory with the assistant's response
         memory.chat_memory.add_ai_message(complete_response)
@@ -5,27 +5,33 @@ from langchain_core.chat_history import BaseChatMessageHistory
 class CustomMessageHistory(BaseChatMessageHistory):
     """ChatMessageHistory backed by our PostgreSQL database."""
 
-    def __init__(self, session_id: str, db=None):
+    def __init__(self, session_id: str, db=None, conversation_type=None, skip_current_message: bool = False):
         """Initialize with session id and database session.
         
         Args:
             session_id: Conversation ID to use for message lookup
             db: Database session to use
+            conversation_type: Conversation type selecting the history token budget
+            skip_current_message: Leave out the newest message if it is the current question
         """
         self.session_id = session_id
         self.db = db
+        self.conversation_type = conversation_type
+        self.skip_current_message = skip_current_message
     
     @property
     def messages(self) -> List[BaseMessage]:
-        """Retrieve messages from the database."""
+        """Retrieve the most recent messages that fit the history token budget, oldest first."""
         if not self.db:
             print("WARNING: No database session provided to CustomMessageHistory")
             return []
         
-        from app.db import crud
+        from app.services.history_window import load_history_window
         
         # Get messages from db
-        db_messages = crud.get_conversation_messages(self.db, self.session_id)
+        db_messages = load_history_window(
+            self.db, self.session_id, self.conversation_type, skip_current_message=self.skip_current_message
+        )
         
         # Convert to langchain message format
         result = []
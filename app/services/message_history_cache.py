@@ -0,0 +1,207 @@
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db import models
+
+logger = logging.getLogger("message_history_cache")
+
+
+@dataclass(frozen=True)
+class CachedMessage:
+    """Detached snapshot of a Message row, safe to share across sessions."""
+    id: int
+    conversation_id: str
+    sequence_number: int
+    role: str
+    content: str
+    timestamp: Optional[datetime] = None
+    rag_context: Optional[str] = None
+    is_truncated: bool = False
+
+    @classmethod
+    def from_model(cls, message: models.Message) -> "CachedMessage":
+        return cls(
+            id=message.id,
+            conversation_id=message.conversation_id,
+            sequence_number=message.sequence_number,
+            role=message.role,
+            content=message.content,
+            timestamp=message.timestamp,
+            rag_context=message.rag_context,
+            is_truncated=bool(message.is_truncated)
+        )
+
+
+class _Entry:
+    """Contiguous tail of a conversation's messages in ascending sequence order."""
+
+    def __init__(self, messages: List[CachedMessage], complete: bool):
+        self.messages = messages
+        # True if the tail starts at the conversation's first message
+        self.complete = complete
+
+    @property
+    def last_sequence(self) -> int:
+        return self.messages[-1].sequence_number if self.messages else 0
+
+    def trim(self, max_messages: int):
+        if len(self.messages) > max_messages:
+            del self.messages[:len(self.messages) - max_messages]
+            self.complete = False
+
+
+class MessageHistoryCache:
+    """
+    Bounded per-worker cache of recent conversation messages.
+
+    crud.create_message appends every new message, so a chat turn and the title
+    update that follows it read history from memory instead of reloading it. Each
+    read checks the conversation's next_sequence counter (a primary key lookup)
+    and pulls in only the messages another worker added since, so the cache stays
+    correct when requests of one conversation are served by different workers.
+    """
+
+    def __init__(self, max_conversations: int, max_messages: int):
+        self.max_conversations = max_conversations
+        self.max_messages = max_messages
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def invalidate(self, conversation_id: str):
+        """Forget a conversation's messages."""
+        with self._lock:
+            self._entries.pop(conversation_id, None)
+
+    def append(self, message: models.Message):
+        """
+        Add a newly created message to its conversation's cached tail.
+
+        The message is only appended if it directly follows the cached tail; otherwise
+        the entry is dropped and reloaded on the next read.
+
+        Args:
+            message: Committed Message row
+        """
+        snapshot = CachedMessage.from_model(message)
+        with self._lock:
+            entry = self._entries.get(snapshot.conversation_id)
+            if entry is None:
+                return
+            if snapshot.sequence_number == entry.last_sequence + 1:
+                entry.messages.append(snapshot)
+                entry.trim(self.max_messages)
+                self._entries.move_to_end(snapshot.conversation_id)
+            else:
+                del self._entries[snapshot.conversation_id]
+
+    def _load(self, db: Session, conversation_id: str) -> _Entry:
+        rows = db.query(models.Message).filter(
+            models.Message.conversation_id == conversation_id
+        ).order_by(models.Message.sequence_number.desc()).limit(self.max_messages).all()
+        rows.reverse()
+        return _Entry([CachedMessage.from_model(row) for row in rows], complete=len(rows) < self.max_messages)
+
+    def _get_entry(self, db: Session, conversation_id: str) -> _Entry:
+        """Get the reconciled entry of a conversation, loading it if needed."""
+        next_sequence = db.query(models.Conversation.next_sequence).filter(
+            models.Conversation.id == conversation_id
+        ).scalar()
+        latest = next_sequence - 1 if next_sequence else 0
+
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            cached_last = entry.last_sequence if entry else None
+
+        if entry is not None and latest == cached_last:
+            with self._lock:
+                if conversation_id in self._entries:
+                    self._entries.move_to_end(conversation_id)
+            return entry
+
+        if entry is not None and latest > cached_last:
+            # Messages written by another worker since our last read
+            newer = db.query(models.Message).filter(
+                models.Message.conversation_id == conversation_id,
+                models.Message.sequence_number > cached_last
+            ).order_by(models.Message.sequence_number).all()
+            with self._lock:
+                current = self._entries.get(conversation_id)
+                if current is entry and entry.last_sequence == cached_last:
+                    entry.messages.extend(CachedMessage.from_model(row) for row in newer)
+                    entry.trim(self.max_messages)
+                    self._entries.move_to_end(conversation_id)
+                    return entry
+
+        # Not cached, or the conversation shrank (messages deleted)
+        entry = self._load(db, conversation_id)
+        with self._lock:
+            self._entries[conversation_id] = entry
+            self._entries.move_to_end(conversation_id)
+            while len(self._entries) > self.max_conversations:
+                self._entries.popitem(last=False)
+        return entry
+
+    def get_recent(self, db: Session, conversation_id: str, limit: int = 50,
+                   before_sequence: Optional[int] = None) -> List[CachedMessage]:
+        """
+        Get the newest messages of a conversation, newest first.
+
+        Same contract as crud.get_recent_messages; falls back to the database when
+        the requested range is older than the cached tail.
+
+        Args:
+            db: Database session
+            conversation_id: Conversation ID
+            limit: Maximum number of messages
+            before_sequence: Only return messages with a lower sequence_number
+
+        Returns:
+            Messages in descending sequence order
+        """
+        entry = self._get_entry(db, conversation_id)
+        with self._lock:
+            messages = [
+                msg for msg in entry.messages
+                if before_sequence is None or msg.sequence_number < before_sequence
+            ]
+            complete = entry.complete
+        if len(messages) >= limit or complete:
+            return list(reversed(messages[-limit:])) if limit else []
+
+        from app.db import crud
+        rows = crud.get_recent_messages(db, conversation_id, limit=limit, before_sequence=before_sequence)
+        return [CachedMessage.from_model(row) for row in rows]
+
+    def get_messages(self, db: Session, conversation_id: str) -> List[CachedMessage]:
+        """
+        Get all messages of a conversation in chronological order.
+
+        Args:
+            db: Database session
+            conversation_id: Conversation ID
+
+        Returns:
+            Messages in ascending sequence order
+        """
+        entry = self._get_entry(db, conversation_id)
+        with self._lock:
+            if entry.complete:
+                return list(entry.messages)
+
+        rows = db.query(models.Message).filter(
+            models.Message.conversation_id == conversation_id
+        ).order_by(models.Message.sequence_number).all()
+        return [CachedMessage.from_model(row) for row in rows]
+
+
+message_history_cache = MessageHistoryCache(
+    max_conversations=settings.MESSAGE_CACHE_MAX_CONVERSATIONS,
+    max_messages=settings.MESSAGE_CACHE_MAX_MESSAGES
+)
@@ -0,0 +1,225 @@
+import functools
+import os
+import time
+
+from prometheus_client import (
+    REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+# Prometheus metrics of the API and the services it depends on.
+#
+# Every uvicorn worker keeps its own values. With PROMETHEUS_MULTIPROC_DIR set they
+# are written there and /metrics aggregates all workers; gauges are summed over
+# the live workers. Labels are kept low-cardinality: route templates, operations
+# and collection types, never collection names, users or file names.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# HTTP
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route template and status class",
+    ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request duration, until the response body is sent",
+    ["method", "route"], buckets=LATENCY_BUCKETS + (120, 300)
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests being served", multiprocess_mode="livesum"
+)
+
+# Chat pipeline stages (recorded by app.services.tracing)
+STAGE_DURATION = Histogram(
+    "chat_stage_duration_seconds", "Duration of the stages of chat and RAG requests",
+    ["pipeline", "stage"], buckets=LATENCY_BUCKETS + (120,)
+)
+
+# Chat streams
+CHAT_STREAMS_IN_FLIGHT = Gauge(
+    "chat_streams_in_flight", "Answers being generated into a resumable stream", multiprocess_mode="livesum"
+)
+
+# Database pool
+DB_POOL_SIZE = Gauge(
+    "db_pool_size", "Configured connection pool size", ["engine"], multiprocess_mode="livesum"
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Connections checked out of the pool", ["engine"], multiprocess_mode="livesum"
+)
+DB_POOL_CONNECTIONS_OPENED = Counter(
+    "db_pool_connections_opened_total", "New database connections opened by the pool", ["engine"]
+)
+
+# Embeddings (Infinity)
+EMBEDDING_REQUEST_DURATION = Histogram(
+    "embedding_request_duration_seconds", "Duration of one request to the embedding server",
+    ["operation"], buckets=LATENCY_BUCKETS
+)
+EMBEDDING_BATCH_SIZE = Histogram(
+    "embedding_batch_size", "Texts per embedding request",
+    ["operation"], buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+EMBEDDING_ERRORS = Counter(
+    "embedding_errors_total", "Failed requests to the embedding server (before retries)", ["operation"]
+)
+
+# Vector store (Milvus)
+VECTOR_SEARCH_DURATION = Histogram(
+    "vector_search_duration_seconds", "Milvus similarity search duration, excluding query embedding",
+    ["collection_type"], buckets=LATENCY_BUCKETS
+)
+VECTOR_STORE_OPERATION_DURATION = Histogram(
+    "vector_store_operation_duration_seconds", "Duration of Milvus collection management operations",
+    ["operation"], buckets=LATENCY_BUCKETS + (120, 300, 900)
+)
+
+# Object storage (MinIO)
+OBJECT_STORAGE_OPERATION_DURATION = Histogram(
+    "object_storage_operation_duration_seconds", "Duration of MinIO operations",
+    ["operation"], buckets=LATENCY_BUCKETS
+)
+OBJECT_STORAGE_BYTES = Counter(
+    "object_storage_bytes_total", "Bytes transferred to and from MinIO", ["direction"]
+)
+OBJECT_STORAGE_ERRORS = Counter(
+    "object_storage_errors_total", "Failed MinIO operations", ["operation"]
+)
+
+# LLM endpoint
+LLM_REQUESTS = Counter(
+    "llm_requests_total", "Requests to the LLM endpoint by status class", ["status"]
+)
+LLM_RESPONSE_DURATION = Histogram(
+    "llm_response_duration_seconds", "Time until the LLM endpoint sends response headers",
+    buckets=LATENCY_BUCKETS + (120,)
+)
+
+# Ingestion
+INGESTION_QUEUE_DEPTH = Gauge(
+    "ingestion_queue_depth", "Files waiting for an ingestion worker thread", multiprocess_mode="livesum"
+)
+INGESTION_IN_PROGRESS = Gauge(
+    "ingestion_in_progress", "Files being parsed, embedded and inserted", multiprocess_mode="livesum"
+)
+
+
+def status_class(status_code: int) -> str:
+    return f"{status_code // 100}xx"
+
+
+def render_metrics() -> bytes:
+    """
+    Render the metrics in the Prometheus text format.
+
+    Returns:
+        Metrics of all workers when PROMETHEUS_MULTIPROC_DIR is set, otherwise of this worker
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+def instrument_engine(engine, name: str):
+    """
+    Track the connection pool of a SQLAlchemy engine.
+
+    Args:
+        engine: Sync engine (for an async engine, pass its sync_engine)
+        name: Engine label
+    """
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        DB_POOL_SIZE.labels(name).set(pool.size())
+
+    @event.listens_for(pool, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        DB_POOL_CONNECTIONS_OPENED.labels(name).inc()
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKED_OUT.labels(name).inc()
+
+    @event.listens_for(pool, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.labels(name).dec()
+
+
+def queued_ingestion(fn):
+    """
+    Count a task submitted to an ingestion thread pool as queued until it starts.
+
+    Args:
+        fn: Task function
+
+    Returns:
+        Wrapped task, to be submitted once
+    """
+    INGESTION_QUEUE_DEPTH.inc()
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        INGESTION_QUEUE_DEPTH.dec()
+        return fn(*args, **kwargs)
+    return run
+
+
+def _on_llm_request(request):
+    request.extensions["metrics_started"] = time.perf_counter()
+
+
+def _on_llm_response(response):
+    LLM_REQUESTS.labels(status_class(response.status_code)).inc()
+    started = response.request.extensions.get("metrics_started")
+    if started is not None:
+        LLM_RESPONSE_DURATION.observe(time.perf_counter() - started)
+
+
+async def _on_llm_request_async(request):
+    _on_llm_request(request)
+
+
+async def _on_llm_response_async(response):
+    _on_llm_response(response)
+
+
+def llm_event_hooks(asynchronous: bool = False):
+    """httpx event hooks recording requests to the LLM endpoint."""
+    if asynchronous:
+        return {"request": [_on_llm_request_async], "response": [_on_llm_response_async]}
+    return {"request": [_on_llm_request], "response": [_on_llm_response]}
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting HTTP requests by route template, with their duration."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            # The router stores the matched route in the scope; unmatched paths share one label
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUESTS.labels(scope["method"], route, status_class(status_code)).inc()
+            HTTP_REQUEST_DURATION.labels(scope["method"], route).observe(time.perf_counter() - started)
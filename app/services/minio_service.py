@@ -9,6 +9,7 @@ from minio.error import S3Error
 from fastapi import UploadFile
 
 from app.config import settings
+from app.services.metrics import OBJECT_STORAGE_BYTES, OBJECT_STORAGE_ERRORS, OBJECT_STORAGE_OPERATION_DURATION
 
 class MinioService:
     """Service for managing files in MinIO object storage."""
@@ -79,16 +80,19 @@ class MinioService:
             data = io.BytesIO(file_data)
             
             # Upload to MinIO
-            self.client.put_object(
-                bucket_name=self.default_bucket,
-                object_name=file_path,
-                data=data,
-                length=len(file_data),
-                content_type=content_type
-            )
+            with OBJECT_STORAGE_OPERATION_DURATION.labels("upload").time():
+                self.client.put_object(
+                    bucket_name=self.default_bucket,
+                    object_name=file_path,
+                    data=data,
+                    length=len(file_data),
+                    content_type=content_type
+                )
+            OBJECT_STORAGE_BYTES.labels("upload").inc(len(file_data))
             
             return True
         except Exception as e:
+            OBJECT_STORAGE_ERRORS.labels("upload").inc()
             print(f"Error uploading file: {e}")
             return False
     
@@ -117,13 +121,15 @@ class MinioService:
             file_data = io.BytesIO(content)
             
             # Upload to MinIO
-            self.client.put_object(
-                bucket_name=self.default_bucket,
-                object_name=object_name,
-                data=file_data,
-                length=file_size,
-                content_type=file.content_type or "application/octet-stream"
-            )
+            with OBJECT_STORAGE_OPERATION_DURATION.labels("upload").time():
+                self.client.put_object(
+                    bucket_name=self.default_bucket,
+                    object_name=object_name,
+                    data=file_data,
+                    length=file_size,
+                    content_type=file.content_type or "application/octet-stream"
+                )
+            OBJECT_STORAGE_BYTES.labels("upload").inc(file_size)
             
             # Reset file pointer for potential further use
             await file.seek(0)
@@ -136,6 +142,7 @@ class MinioService:
             }
         
         except Exception as e:
+            OBJECT_STORAGE_ERRORS.labels("upload").inc()
             print(f"Error uploading file: {e}")
             return False, "", {}
     
@@ -151,13 +158,15 @@ class MinioService:
         """
         try:
             # Get object data
-            response = self.client.get_object(
-                bucket_name=self.default_bucket,
-                object_name=object_name
-            )
-            
-            # Read all data
-            data = response.read()
+            with OBJECT_STORAGE_OPERATION_DURATION.labels("download").time():
+                response = self.client.get_object(
+                    bucket_name=self.default_bucket,
+                    object_name=object_name
+                )
+                
+                # Read all data
+                data = response.read()
+            OBJECT_STORAGE_BYTES.labels("download").inc(len(data))
             
             # Create BytesIO object
             file_data = io.BytesIO(data)
@@ -169,6 +178,7 @@ class MinioService:
             return True, file_data
         
         except Exception as e:
+            OBJECT_STORAGE_ERRORS.labels("download").inc()
             print(f"Error downloading file: {e}")
             return False, None
     
@@ -183,14 +193,16 @@ class MinioService:
             True if file was deleted
         """
         try:
-            self.client.remove_object(
-                bucket_name=self.default_bucket,
-                object_name=object_name
-            )
+            with OBJECT_STORAGE_OPERATION_DURATION.labels("delete").time():
+                self.client.remove_object(
+                    bucket_name=self.default_bucket,
+                    object_name=object_name
+                )
             
             return True
         
         except Exception as e:
+            OBJECT_STORAGE_ERRORS.labels("delete").inc()
             print(f"Error deleting file: {e}")
             return False
     
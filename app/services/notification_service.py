@@ -0,0 +1,336 @@
+import json
+import asyncio
+import logging
+import select
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set
+
+import psycopg2
+import psycopg2.extensions
+from sqlalchemy import text
+
+from app.config import settings
+from app.db.database import async_engine, engine
+
+logger = logging.getLogger("notification_service")
+
+# Postgres channel carrying file processing events between uvicorn workers
+FILE_EVENTS_CHANNEL = "file_processing_events"
+
+# Postgres channel announcing configuration changes to all uvicorn workers
+CONFIG_CHANGES_CHANNEL = "config_changes"
+
+# Postgres channel relaying resumable answer streams between uvicorn workers
+ANSWER_STREAMS_CHANNEL = "answer_streams"
+
+# Relay events addressed to a waiting reader; all others are requests to the owning worker
+ANSWER_STREAM_READER_EVENTS = {"attached", "chunk", "end", "expired", "denied"}
+
+
+class PgChannelListener:
+    """
+    Background thread holding a dedicated Postgres connection that LISTENs on one
+    channel, reconnecting with backoff on failure. Subclasses handle payloads.
+    """
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _start_thread(self) -> bool:
+        """Start the listener thread if it isn't running. Returns True if started."""
+        if self._thread and self._thread.is_alive():
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen, name=f"{self.channel}-listener", daemon=True)
+        self._thread.start()
+        logger.info(f"Listening on channel '{self.channel}'")
+        return True
+
+    def stop(self):
+        """Stop the listener thread."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _handle(self, payload: dict):
+        raise NotImplementedError
+
+    def _listen(self):
+        """Listener thread: hold a LISTEN connection, reconnecting on failure."""
+        backoff = 1
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(settings.DATABASE_URL)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel};")
+                backoff = 1
+                self._on_connected()
+
+                while not self._stop.is_set():
+                    # Wake up periodically so stop() is honoured
+                    if select.select([conn], [], [], 5.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notification = conn.notifies.pop(0)
+                        try:
+                            self._handle(json.loads(notification.payload))
+                        except Exception as e:
+                            logger.warning(f"Ignoring malformed notification on '{self.channel}': {e}")
+            except Exception as e:
+                logger.error(f"Listener error on '{self.channel}': {e}, reconnecting in {backoff}s")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    def _on_connected(self):
+        """Hook called each time the LISTEN connection is (re)established."""
+        pass
+
+
+class FileEventBroker(PgChannelListener):
+    """
+    Per-worker fan-out of file processing events.
+
+    Each worker keeps one dedicated Postgres connection that LISTENs on
+    FILE_EVENTS_CHANNEL in a background thread. Notifications are handed to the
+    worker's event loop and pushed to the asyncio queues of the SSE / WebSocket
+    subscribers for the event's conversation, so events published by any worker
+    reach every connected client.
+    """
+
+    def __init__(self, channel: str = FILE_EVENTS_CHANNEL):
+        super().__init__(channel)
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self):
+        """Start listening. Must be called from the worker's event loop."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._start_thread()
+
+    def subscribe(self, conversation_id: str) -> asyncio.Queue:
+        """
+        Subscribe to events for a conversation.
+
+        Args:
+            conversation_id: Conversation to receive events for
+
+        Returns:
+            Queue that receives event dictionaries
+        """
+        self.start()
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(conversation_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, conversation_id: str, queue: asyncio.Queue):
+        """Remove a subscriber queue."""
+        queues = self._subscribers.get(conversation_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[conversation_id]
+
+    def deliver_local(self, event: dict):
+        """Deliver an event to this worker's subscribers only (thread-safe)."""
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._fan_out, event)
+
+    def _fan_out(self, event: dict):
+        for queue in list(self._subscribers.get(event.get("conversation_id"), ())):
+            queue.put_nowait(event)
+
+    def _handle(self, payload: dict):
+        self.deliver_local(payload)
+
+
+class ConfigChangeListener(PgChannelListener):
+    """
+    Cross-worker invalidation of in-process configuration caches.
+
+    Caches register a callback per change type (e.g. "llm_config"); a change
+    published by any worker runs the callbacks in every worker. Callbacks run on
+    the listener thread and must be thread-safe. After a reconnect every callback
+    is run, since notifications sent while disconnected are lost.
+    """
+
+    def __init__(self, channel: str = CONFIG_CHANGES_CHANNEL):
+        super().__init__(channel)
+        self._callbacks: Dict[str, List[Callable[[dict], None]]] = {}
+
+    def start(self):
+        """Start listening."""
+        self._start_thread()
+
+    def register(self, change_type: str, callback: Callable[[dict], None]):
+        """
+        Register a callback for a change type.
+
+        Args:
+            change_type: Type of change, e.g. "llm_config"
+            callback: Called with the change payload
+        """
+        self._callbacks.setdefault(change_type, []).append(callback)
+
+    def dispatch(self, payload: dict):
+        """Run the callbacks registered for a change in this worker."""
+        for callback in list(self._callbacks.get(payload.get("type"), ())):
+            try:
+                callback(payload)
+            except Exception as e:
+                logger.error(f"Config change callback failed for {payload.get('type')}: {e}")
+
+    def _handle(self, payload: dict):
+        self.dispatch(payload)
+
+    def _on_connected(self):
+        for change_type in list(self._callbacks):
+            self.dispatch({"type": change_type, "reason": "listener_connected"})
+
+
+class AnswerStreamBroker(PgChannelListener):
+    """
+    Per-worker endpoint of the answer stream relay.
+
+    A reconnect served by a worker that is not generating the answer subscribes
+    here under a reader ID and asks, over ANSWER_STREAMS_CHANNEL, for the stream
+    to be relayed. Events for a subscribed reader are put on its queue; requests
+    (attach, heartbeat, detach) are passed to the registered request handler,
+    which ignores streams this worker doesn't own. Both run on the worker's
+    event loop.
+    """
+
+    def __init__(self, channel: str = ANSWER_STREAMS_CHANNEL):
+        super().__init__(channel)
+        self._readers: Dict[str, asyncio.Queue] = {}
+        self._request_handler: Optional[Callable[[dict], None]] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self):
+        """Start listening. Must be called from the worker's event loop."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._start_thread()
+
+    def set_request_handler(self, handler: Callable[[dict], None]):
+        """Set the callback receiving relay requests from readers on other workers."""
+        self._request_handler = handler
+
+    def subscribe(self, reader_id: str) -> asyncio.Queue:
+        """
+        Receive the relay events addressed to a reader.
+
+        Args:
+            reader_id: Unique ID of the reader
+
+        Returns:
+            Queue that receives event dictionaries
+        """
+        self.start()
+        queue = asyncio.Queue()
+        self._readers[reader_id] = queue
+        return queue
+
+    def unsubscribe(self, reader_id: str):
+        """Remove a reader's queue."""
+        self._readers.pop(reader_id, None)
+
+    def _dispatch(self, payload: dict):
+        if payload.get("type") in ANSWER_STREAM_READER_EVENTS:
+            queue = self._readers.get(payload.get("reader"))
+            if queue is not None:
+                queue.put_nowait(payload)
+        elif self._request_handler is not None:
+            self._request_handler(payload)
+
+    def _handle(self, payload: dict):
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._dispatch, payload)
+
+
+file_event_broker = FileEventBroker()
+config_change_listener = ConfigChangeListener()
+answer_stream_broker = AnswerStreamBroker()
+
+
+def publish_file_event(event: dict):
+    """
+    Publish a file processing event to all workers via pg_notify.
+
+    Falls back to delivering to this worker's subscribers only if the
+    notification cannot be sent.
+
+    Args:
+        event: Event dictionary; must contain conversation_id
+    """
+    payload = json.dumps(event, default=str)
+    try:
+        with engine.begin() as conn:
+            conn.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": FILE_EVENTS_CHANNEL, "payload": payload}
+            )
+    except Exception as e:
+        logger.error(f"Failed to publish file event, delivering locally: {e}")
+        file_event_broker.deliver_local(event)
+
+
+async def notify_file_event(event: dict):
+    """Publish a file processing event without blocking the event loop."""
+    await asyncio.to_thread(publish_file_event, event)
+
+
+def publish_config_change(change_type: str, **details):
+    """
+    Announce a configuration change to every worker.
+
+    The change is applied to this worker's caches immediately and broadcast via
+    pg_notify to the others.
+
+    Args:
+        change_type: Type of change, e.g. "llm_config"
+        **details: Extra payload fields
+    """
+    payload = {"type": change_type, **details}
+    config_change_listener.dispatch(payload)
+    try:
+        with engine.begin() as conn:
+            conn.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": CONFIG_CHANGES_CHANNEL, "payload": json.dumps(payload, default=str)}
+            )
+    except Exception as e:
+        logger.error(f"Failed to broadcast config change '{change_type}': {e}")
+
+
+async def publish_answer_stream_event(event: dict):
+    """
+    Send an answer stream relay event to all workers via pg_notify.
+
+    Payloads must stay below the 8000 byte NOTIFY limit.
+
+    Args:
+        event: Event dictionary with type, stream_id and reader
+    """
+    async with async_engine.begin() as conn:
+        await conn.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": ANSWER_STREAMS_CHANNEL, "payload": json.dumps(event)}
+        )
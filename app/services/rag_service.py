@@ -1,6 +1,7 @@
 from typing import Generator, Dict, Optional, List, AsyncGenerator
 from sqlalchemy.orm import Session
 import os
+import re
 import json
 import uuid
 from langchain_core.documents import Document
@@ -10,7 +11,6 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.documents.transformers import BaseDocumentTransformer
 from langchain.retrievers.document_compressors import DocumentCompressorPipeline
 from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_openai import ChatOpenAI
 from langchain_milvus.vectorstores import Milvus
 from langchain.retrievers import ContextualCompressionRetriever
 from langchain_core.chat_history import BaseChatMessageHistory
@@ -22,14 +22,23 @@ from langchain.prompts import (
 )
 
 from app.db import crud, models, schemas
-from app.db.database import get_db
+from app.db.database import get_db, release_connection
 from app.config import settings
 from app.services.message_history import CustomMessageHistory
+from app.services.history_window import load_history_window
 from app.services.rag_config_service import RAGConfigService
 from app.utils.infinity_embedder import InfinityEmbedder
 from app.utils.string_utils import sanitize_collection_name, conversation_collection_name
 from app.services.llm_service import get_streaming_llm_response
+from app.services.llm_client_pool import llm_client_pool
+from app.services.contextualization_policy import contextualize_and_retrieve
+from app.services.context_packer import STORED_VECTOR_KEY, pack_documents
+from app.services.conversation_summary_service import ConversationSummaryService
+from app.services.stream_cancellation import save_partial_answer
+from app.services.metrics import VECTOR_STORE_OPERATION_DURATION
+from app.services.tracing import record_stage, set_pipeline, should_dump_prompt, timed_stream, trace_span, traced_retrieve
 import asyncio
+import time
 
 # Debug print to verify imports loaded properly
 print("DEBUG: All necessary imports loaded for RAG service including RunnableWithMessageHistory from langchain_core")
@@ -41,6 +50,28 @@ If the answer isn't in the context, politely say you don't know rather than maki
 Be concise, accurate, and helpful in your response.
 """
 
+# Physical collections behind an alias are named <alias>__g<generation>
+GENERATION_SEPARATOR = "__g"
+GENERATION_NAME_PATTERN = re.compile(rf"{GENERATION_SEPARATOR}\d+$")
+
+
+class RetrievalMilvus(Milvus):
+    """
+    Milvus vector store whose search results keep the stored chunk vectors.
+
+    The search already returns the vector field; LangChain drops it when building
+    the documents. It is kept in the metadata under STORED_VECTOR_KEY so the
+    context packer can compare chunks without embedding them again.
+    """
+
+    def _parse_document(self, data: dict) -> Document:
+        vector = data.get(self._vector_field) if isinstance(self._vector_field, str) else None
+        doc = super()._parse_document(data)
+        if vector is not None:
+            doc.metadata[STORED_VECTOR_KEY] = vector
+        return doc
+
+
 class RemoteVectorStoreManager:
     """Manages connection to a remote Milvus vector database."""
     
@@ -59,7 +90,7 @@ class RemoteVectorStoreManager:
         print(f"DEBUG: Getting vectorstore for collection: '{collection_name}' -> '{safe_collection_name}'")
         
         try:
-            self.vectorstore = Milvus(
+            self.vectorstore = RetrievalMilvus(
                 embedding_function=self.infinity_embedder,
                 collection_name=safe_collection_name,
                 connection_args={"uri": self.milvus_uri}
@@ -91,17 +122,36 @@ class RemoteVectorStoreManager:
             print(f"DEBUG: ERROR getting retriever: {str(e)}")
             raise
         
-    def list_collections(self):
-        """List all available collections in Milvus."""
+    @VECTOR_STORE_OPERATION_DURATION.labels("list_collections").time()
+    def list_collections(self, physical: bool = False):
+        """List the collections in Milvus as readers see them.
+        
+        Rebuilt admin collections are listed by their alias; the physical
+        generations behind them (<alias>__g<N>) are hidden.
+        
+        Args:
+            physical: List the physical collections instead, including generations
+            
+        Returns:
+            Collection names
+        """
         try:
-            from pymilvus import connections, utility
-            connections.connect(uri=self.milvus_uri)
-            collections = utility.list_collections()
-            return collections
+            from pymilvus import MilvusClient
+            client = MilvusClient(uri=self.milvus_uri)
+            try:
+                collections = client.list_collections()
+                if physical:
+                    return collections
+                aliases = client.list_aliases().get("aliases", [])
+            finally:
+                client.close()
+            visible = [name for name in collections if not GENERATION_NAME_PATTERN.search(name)]
+            return visible + [alias for alias in aliases if alias not in visible]
         except Exception as e:
             print(f"DEBUG: ERROR listing collections: {str(e)}")
             return []
     
+    @VECTOR_STORE_OPERATION_DURATION.labels("collection_exists").time()
     def collection_exists(self, collection_name: str) -> bool:
         """Check if a collection exists in Milvus.
         
@@ -120,7 +170,145 @@ class RemoteVectorStoreManager:
         except Exception as e:
             print(f"DEBUG: ERROR checking if collection exists: {str(e)}")
             return False
-    
+
+    @VECTOR_STORE_OPERATION_DURATION.labels("get_source_file_hashes").time()
+    def get_source_file_hashes(self, collection_name: str) -> Dict[int, Optional[str]]:
+        """Get the source files stored in a collection.
+
+        Args:
+            collection_name: Name of the collection
+
+        Returns:
+            Mapping of source_file_id to the content hash it was ingested with
+            (None for chunks ingested before content hashes were recorded)
+        """
+        from pymilvus import connections, utility, Collection
+        connections.connect(uri=self.milvus_uri)
+        if not utility.has_collection(collection_name):
+            return {}
+
+        collection = Collection(collection_name)
+        field_names = {field.name for field in collection.schema.fields}
+        if "source_file_id" not in field_names:
+            return {}
+        output_fields = ["source_file_id"] + (["content_hash"] if "content_hash" in field_names else [])
+
+        collection.load()
+        stored: Dict[int, Optional[str]] = {}
+        iterator = collection.query_iterator(
+            batch_size=1000,
+            expr="source_file_id >= 0",
+            output_fields=output_fields
+        )
+        try:
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    break
+                for row in rows:
+                    stored.setdefault(int(row["source_file_id"]), row.get("content_hash"))
+        finally:
+            iterator.close()
+
+        print(f"DEBUG: Collection '{collection_name}' holds chunks of {len(stored)} source files")
+        return stored
+
+    @VECTOR_STORE_OPERATION_DURATION.labels("delete_by_source_file_ids").time()
+    def delete_by_source_file_ids(self, collection_name: str, file_ids: List[int]):
+        """Delete all chunks of the given source files from a collection.
+
+        Args:
+            collection_name: Name of the collection
+            file_ids: Source file IDs whose chunks should be removed
+        """
+        if not file_ids:
+            return
+        from pymilvus import connections, utility, Collection
+        connections.connect(uri=self.milvus_uri)
+        if not utility.has_collection(collection_name):
+            return
+
+        collection = Collection(collection_name)
+        ids = sorted({int(file_id) for file_id in file_ids})
+        collection.delete(expr=f"source_file_id in {ids}")
+        collection.flush()
+        print(f"DEBUG: Deleted chunks of {len(ids)} source files from '{collection_name}'")
+
+    def resolve_alias(self, alias: str) -> Optional[str]:
+        """Get the collection an alias points to.
+
+        Args:
+            alias: Alias name
+
+        Returns:
+            Name of the aliased collection, or None if the name is not an alias
+        """
+        from pymilvus import MilvusClient
+        client = MilvusClient(uri=self.milvus_uri)
+        try:
+            return client.describe_alias(alias).get("collection_name")
+        except Exception:
+            return None
+        finally:
+            client.close()
+
+    @VECTOR_STORE_OPERATION_DURATION.labels("warm_collection").time()
+    def warm_collection(self, collection_name: str):
+        """Build the index and load a collection into memory, blocking until it is ready.
+
+        Args:
+            collection_name: Name of the collection
+        """
+        from pymilvus import connections, utility, Collection
+        connections.connect(uri=self.milvus_uri)
+        collection = Collection(collection_name)
+        collection.flush()
+        utility.wait_for_index_building_complete(collection_name)
+        collection.load()
+        utility.wait_for_loading_complete(collection_name)
+        # Touch the data so the first user query doesn't pay for segment warm-up
+        collection.query(expr="source_file_id >= 0", output_fields=["source_file_id"], limit=1)
+        print(f"DEBUG: Collection '{collection_name}' indexed and loaded ({collection.num_entities} entities)")
+
+    @VECTOR_STORE_OPERATION_DURATION.labels("point_alias").time()
+    def point_alias(self, alias: str, collection_name: str) -> Optional[str]:
+        """Atomically point an alias at a collection.
+
+        If a physical collection still carries the alias name (collections created
+        before aliases were used), it is dropped and replaced by the alias.
+
+        Args:
+            alias: Alias name
+            collection_name: Collection the alias should point to
+
+        Returns:
+            Name of the collection the alias pointed to before, if any
+        """
+        from pymilvus import MilvusClient
+        previous = self.resolve_alias(alias)
+        client = MilvusClient(uri=self.milvus_uri)
+        try:
+            if previous:
+                client.alter_alias(collection_name=collection_name, alias=alias)
+            else:
+                if client.has_collection(alias):
+                    # One-time migration from a plain collection to an alias
+                    print(f"DEBUG: Replacing physical collection '{alias}' with an alias")
+                    client.drop_collection(alias)
+                client.create_alias(collection_name=collection_name, alias=alias)
+            print(f"DEBUG: Alias '{alias}' now points to '{collection_name}' (was: {previous})")
+            return previous
+        finally:
+            client.close()
+
+    @VECTOR_STORE_OPERATION_DURATION.labels("release_collection").time()
+    def release_collection(self, collection_name: str):
+        """Release a collection from memory without dropping it."""
+        from pymilvus import connections, Collection
+        connections.connect(uri=self.milvus_uri)
+        Collection(collection_name).release()
+        print(f"DEBUG: Released collection '{collection_name}'")
+
     def get_embedding_function(self):
         """Get the embedding function."""
         return self.infinity_embedder
@@ -191,102 +379,100 @@ class RagChatService:
             print(f"DEBUG: Error getting RAG system prompt, falling back to default: {str(e)}")
             return DEFAULT_RAG_SYSTEM_PROMPT
 
-    def get_llm(self, db: Session, streaming: bool = False, override_thinking: Optional[bool] = None):
-        """Get a configured LLM instance."""
-        # Get the LLM config from the database (there's only one)
-        config = crud.get_active_llm_config(db)
-        
-        # If no config exists, create a default one
-        if not config:
-            config = crud.create_default_llm_config(db)
-        
-        # Create model params from config
-        model_params = {
-            "model_name": config.model_name,
-            "temperature": config.temperature,
-            "top_p": config.top_p,
-        }
-        
-        # Add max_tokens if set
-        if config.max_tokens:
-            model_params["max_tokens"] = config.max_tokens
-        
-        # Handle enable_thinking parameter
-        enable_thinking = override_thinking if override_thinking is not None else getattr(config, 'enable_thinking', False)
+    def _with_conversation_summary(self, db: Session, conversation_id: Optional[str], system_prompt: str) -> str:
+        """
+        Append the rolling summary of older messages to a system prompt template.
         
-        # Handle extra parameters
-        if config.extra_params:
-            if "base_url" in config.extra_params:
-                model_params["base_url"] = config.extra_params["base_url"]
-            
-            if "api_key" in config.extra_params:
-                model_params["api_key"] = config.extra_params["api_key"]
-            
-            # Add any other parameters
-            for key, value in config.extra_params.items():
-                if key not in ["base_url", "api_key"]:
-                    model_params[key] = value
+        Args:
+            db: Database session
+            conversation_id: Conversation ID
+            system_prompt: System prompt used as a prompt template
+            
+        Returns:
+            System prompt including the summary, if any
+        """
+        summary = ConversationSummaryService.get_summary_prompt(db, conversation_id)
+        if not summary:
+            return system_prompt
+        # The prompt is a template, so braces in the summary must not be read as variables
+        summary = summary.replace("{", "{{").replace("}", "}}")
+        return f"{system_prompt}\n\n{summary}"
+
+    def get_llm(self, db: Session, streaming: bool = False, override_thinking: Optional[bool] = None):
+        """Get a configured LLM instance from the shared client pool."""
+        return llm_client_pool.get_llm(db, streaming=streaming, override_thinking=override_thinking)
+    
+    def _prepare_rag_turn(self, db: Session, user_id: int, message: str, collection_name: str,
+                          conversation_id: Optional[str], meta_data: Optional[dict], save_user_message: bool):
+        """
+        Do the database work before a streamed RAG answer. Runs in a worker thread.
         
-        # Use defaults from settings if not provided
-        if "base_url" not in model_params:
-            model_params["base_url"] = settings.OPENAI_API_BASE
+        Args:
+            db: Database session
+            user_id: User ID
+            message: User message
+            collection_name: Collection to search
+            conversation_id: ID of existing conversation, or None to create one
+            meta_data: Conversation meta_data to store, if any
+            save_user_message: Whether to save the user message
             
-        if "api_key" not in model_params:
-            model_params["api_key"] = settings.OPENAI_API_KEY
+        Returns:
+            Tuple of (conversation_id, chat history, retriever top_k, system prompt template)
+        """
+        # Get or create conversation
+        if conversation_id:
+            db_conversation = crud.get_conversation(db, conversation_id)
+            if not db_conversation:
+                raise ValueError(f"Conversation with ID {conversation_id} not found")
+        else:
+            db_conversation = crud.create_conversation(db, user_id)
+            conversation_id = db_conversation.id
+        conversation_type = db_conversation.conversation_type
         
-        # Add thinking configuration to extra_body
-        if "extra_body" not in model_params:
-            model_params["extra_body"] = {}
+        # Update conversation meta_data if provided
+        if meta_data:
+            crud.update_conversation(db, conversation_id, meta_data)
         
-        # Set chat_template_kwargs with enable_thinking
-        if "chat_template_kwargs" not in model_params["extra_body"]:
-            model_params["extra_body"]["chat_template_kwargs"] = {}
+        # Save user message to database if requested
+        if save_user_message:
+            user_message = schemas.MessageCreate(
+                conversation_id=conversation_id,
+                role="user",
+                content=message
+            )
+            crud.create_message(db, user_message)
         
-        model_params["extra_body"]["chat_template_kwargs"]["enable_thinking"] = enable_thinking
+        # Get chat history without the saved current question, which the prompt adds as input
+        chat_history = CustomMessageHistory(conversation_id, db, conversation_type, skip_current_message=True).messages
         
-        # Enable streaming if requested
-        if streaming:
-            model_params["streaming"] = True
+        # Admin-configurable top_k value and the prompt for the collection type
+        top_k = RAGConfigService.get_retriever_top_k(db)
+        base_system_prompt = self._with_conversation_summary(
+            db, conversation_id, self._get_rag_system_prompt(db, collection_name)
+        )
         
-        # Return configured LLM
-        return ChatOpenAI(**model_params)
+        # Database work is done until the answer is saved; don't hold a
+        # pooled connection during retrieval and token streaming
+        release_connection(db)
+        return conversation_id, chat_history, top_k, base_system_prompt
     
-    async def get_streaming_rag_response(self, db: Session, user_id: int, message: str, collection_name: str, conversation_id: Optional[str] = None, meta_data: Optional[dict] = None, save_user_message: bool = True):
+    async def get_streaming_rag_response(self, db: Session, user_id: int, message: str, collection_name: str, conversation_id: Optional[str] = None, meta_data: Optional[dict] = None, save_user_message: bool = True, stream_id: Optional[str] = None):
         """Get a streaming RAG response."""
+        set_pipeline("rag")
         # Set up conversation
         try:
-            # Get or create conversation
-            if conversation_id:
-                db_conversation = crud.get_conversation(db, conversation_id)
-                if not db_conversation:
-                    raise ValueError(f"Conversation with ID {conversation_id} not found")
-            else:
-                db_conversation = crud.create_conversation(db, user_id)
-                conversation_id = db_conversation.id
-            
-            # Update conversation meta_data if provided
-            if meta_data:
-                crud.update_conversation(db, conversation_id, meta_data)
-            
-            # Save user message to database if requested
-            if save_user_message:
-                user_message = schemas.MessageCreate(
-                    conversation_id=conversation_id,
-                    role="user",
-                    content=message
-                )
-                crud.create_message(db, user_message)
+            # Database queries run in a worker thread so they don't block the event loop
+            config_started = time.perf_counter()
+            conversation_id, chat_history, top_k, base_system_prompt = await asyncio.to_thread(
+                self._prepare_rag_turn, db, user_id, message, collection_name, conversation_id, meta_data, save_user_message
+            )
             
             # Create streaming LLM
-            llm = self.get_llm(db, streaming=True)
-            
-            # Create custom history for this conversation
-            history = CustomMessageHistory(conversation_id, db)
+            llm = await llm_client_pool.aget_llm(db, streaming=True)
             
             # Create retriever with admin-configurable top_k value
-            from app.services.rag_config_service import RAGConfigService
-            top_k = RAGConfigService.get_retriever_top_k(db)
             retriever = self.vectorstore_manager.get_retriever(collection_name, top_k=top_k)
+            record_stage("config", time.perf_counter() - config_started)
             
             # Create the contextualize question chain
             contextualize_q_system_prompt = (
@@ -304,25 +490,22 @@ class RagChatService:
             ])
             
             # Use a non-streaming LLM for context with thinking disabled for efficiency
-            context_llm = self.get_llm(db, streaming=False, override_thinking=False)
+            context_llm = await llm_client_pool.aget_llm(db, streaming=False, override_thinking=False)
             contextualizer = contextualize_q_prompt | context_llm | StrOutputParser()
             
-            # Get chat history
-            chat_history = history.messages
-            
-            # Get contextualized question using LangChain's native async method
-            contextualized_question = await contextualizer.ainvoke({
-                "chat_history": chat_history,
-                "input": message
-            })
+            # Contextualize the question (skipped when not needed) and retrieve relevant documents
+            contextualized_question, relevant_docs = await contextualize_and_retrieve(
+                contextualizer, retriever, message, chat_history
+            )
             
-            # DEBUG: Print the contextualized question that will be sent to vectorstore
+            # DEBUG: Print the contextualized question that was sent to vectorstore
             print(f"DEBUG: Original user message: {message}")
             print(f"DEBUG: Contextualized question sent to vectorstore: {contextualized_question}")
             print(f"DEBUG: Chat history length: {len(chat_history)} messages")
             
-            # Retrieve relevant documents using LangChain's native async method
-            relevant_docs = await retriever.ainvoke(contextualized_question)
+            # Drop duplicate chunks and fit the rest into the context token budget
+            prompt_started = time.perf_counter()
+            relevant_docs = await pack_documents(relevant_docs, contextualized_question, self.embeddings)
             
             # Format context from documents
             context_texts = []
@@ -336,7 +519,6 @@ class RagChatService:
             print(f"DEBUG: Created context with {len(context)} characters")
             
             # Create streaming QA chain with appropriate prompt based on collection type
-            base_system_prompt = self._get_rag_system_prompt(db, collection_name)
             qa_system_prompt = f"{base_system_prompt}\n\nContext: {{context}}"
             
             qa_prompt = ChatPromptTemplate.from_messages([
@@ -351,34 +533,36 @@ class RagChatService:
                 "chat_history": chat_history,
                 "input": message
             }
+            record_stage("prompt_build", time.perf_counter() - prompt_started)
             
-            # DEBUG: Show exactly what the LLM receives
-            print("\n" + "="*80)
-            print("🔍 FINAL LLM INPUT DEBUG - STREAMING RAG RESPONSE")
-            print("="*80)
-            
-            # Format the final system prompt with context
-            final_system_prompt = qa_system_prompt.format(context=context)
-            print(f"\n📋 FINAL SYSTEM PROMPT:\n{final_system_prompt}")
-            
-            print(f"\n💬 CHAT HISTORY ({len(chat_history)} messages):")
-            for i, msg in enumerate(chat_history):
-                msg_type = type(msg).__name__
-                if hasattr(msg, 'content'):
-                    content_preview = msg.content[:100] + "..." if len(msg.content) > 100 else msg.content
-                    print(f"  [{i}] {msg_type}: {content_preview}")
-                else:
-                    print(f"  [{i}] {msg_type}: {str(msg)[:100]}...")
+            # DEBUG: Show exactly what the LLM receives (sampled by RAG_DEBUG_PROMPT_SAMPLE_RATE)
+            if should_dump_prompt():
+                print("\n" + "="*80)
+                print("🔍 FINAL LLM INPUT DEBUG - STREAMING RAG RESPONSE")
+                print("="*80)
+            
+                # Format the final system prompt with context
+                final_system_prompt = qa_system_prompt.format(context=context)
+                print(f"\n📋 FINAL SYSTEM PROMPT:\n{final_system_prompt}")
             
-            print(f"\n👤 USER INPUT:\n{message}")
+                print(f"\n💬 CHAT HISTORY ({len(chat_history)} messages):")
+                for i, msg in enumerate(chat_history):
+                    msg_type = type(msg).__name__
+                    if hasattr(msg, 'content'):
+                        content_preview = msg.content[:100] + "..." if len(msg.content) > 100 else msg.content
+                        print(f"  [{i}] {msg_type}: {content_preview}")
+                    else:
+                        print(f"  [{i}] {msg_type}: {str(msg)[:100]}...")
             
-            print(f"\n📚 RAG CONTEXT ({len(context)} chars):")
-            context_preview = context[:500] + "..." if len(context) > 500 else context
-            print(f"{context_preview}")
+                print(f"\n👤 USER INPUT:\n{message}")
             
-            print("\n" + "="*80)
-            print("🚀 SENDING TO LLM...")
-            print("="*80 + "\n")
+                print(f"\n📚 RAG CONTEXT ({len(context)} chars):")
+                context_preview = context[:500] + "..." if len(context) > 500 else context
+                print(f"{context_preview}")
+            
+                print("\n" + "="*80)
+                print("🚀 SENDING TO LLM...")
+                print("="*80 + "\n")
             
             # Prepare to collect the full response
             full_response = []
@@ -387,10 +571,17 @@ class RagChatService:
             chain = qa_prompt | llm
             
             # Use LangChain's native async streaming method
-            async for chunk in chain.astream(final_input_vars):
-                token = chunk.content
-                full_response.append(token)
-                yield token
+            try:
+                async for chunk in timed_stream(chain.astream(final_input_vars)):
+                    token = chunk.content
+                    full_response.append(token)
+                    yield token
+            except (asyncio.CancelledError, GeneratorExit):
+                # Client went away: keep what was generated so far
+                await asyncio.to_thread(
+                    save_partial_answer, db, conversation_id, full_response, rag_context=context, stream_id=stream_id
+                )
+                raise
             
             # Combine tokens to create the complete response
             complete_response = "".join(full_response)
@@ -400,11 +591,14 @@ class RagChatService:
                 conversation_id=conversation_id,
                 role="assistant",
                 content=complete_response,
-                rag_context=context
+                rag_context=context,
+                stream_id=stream_id
             )
             
             # Store the message
-            crud.create_message(db, assistant_message)
+            with trace_span("db_save"):
+                await asyncio.to_thread(crud.create_message, db, assistant_message)
+            ConversationSummaryService.schedule_update(conversation_id)
             
         except Exception as e:
             # Log the exception and re-raise
@@ -415,6 +609,7 @@ class RagChatService:
     
     async def get_rag_response(self, db: Session, user_id: int, message: str, collection_name: str, conversation_id: Optional[str] = None, meta_data: Optional[dict] = None):
         """Get a non-streaming RAG response."""
+        set_pipeline("rag")
         print(f"DEBUG: Starting get_rag_response with collection={collection_name}, user_id={user_id}, conversation_id={conversation_id}")
         try:
             # Get or create conversation
@@ -432,15 +627,17 @@ class RagChatService:
                 crud.update_conversation(db, conversation_id, meta_data)
 
             # Create LLM (non-streaming)
+            config_started = time.perf_counter()
             llm = self.get_llm(db, streaming=False)
 
             # Create custom history for this conversation
-            history = CustomMessageHistory(conversation_id, db)
+            history = CustomMessageHistory(conversation_id, db, db_conversation.conversation_type)
 
             # Create retriever with admin-configurable top_k value
             from app.services.rag_config_service import RAGConfigService
             top_k = RAGConfigService.get_retriever_top_k(db)
             retriever = self.vectorstore_manager.get_retriever(collection_name, top_k=top_k)
+            record_stage("config", time.perf_counter() - config_started)
 
             # Create the contextualize question chain
             contextualize_q_system_prompt = (
@@ -462,20 +659,20 @@ class RagChatService:
             # Get chat history
             chat_history = history.messages
 
-            # Get contextualized question using LangChain's native async method
-            contextualized_question = await contextualizer.ainvoke({
-                "chat_history": chat_history,
-                "input": message
-            })
+            # Contextualize the question (skipped when not needed) and retrieve relevant documents
+            contextualized_question, relevant_docs = await contextualize_and_retrieve(
+                contextualizer, retriever, message, chat_history
+            )
 
-            # DEBUG: Print the contextualized question that will be sent to vectorstore
+            # DEBUG: Print the contextualized question that was sent to vectorstore
             print(f"DEBUG: Original user message: {message}")
             print(f"DEBUG: Contextualized question sent to vectorstore: {contextualized_question}")
             print(f"DEBUG: Chat history length: {len(chat_history)} messages")
 
-            # Retrieve relevant documents using LangChain's native async method
-            relevant_docs = await retriever.ainvoke(contextualized_question)
-
+            # Drop duplicate chunks and fit the rest into the context token budget
+            prompt_started = time.perf_counter()
+            relevant_docs = await pack_documents(relevant_docs, contextualized_question, self.embeddings)
+            
             # Format context from documents
             context_texts = []
             doc_info = []
@@ -490,7 +687,9 @@ class RagChatService:
             print(f"DEBUG: Final context preview: {context[:200]}...")
 
             # Create QA chain (non-streaming) with appropriate prompt based on collection type
-            base_system_prompt = self._get_rag_system_prompt(db, collection_name)
+            base_system_prompt = self._with_conversation_summary(
+                db, conversation_id, self._get_rag_system_prompt(db, collection_name)
+            )
             qa_system_prompt = f"{base_system_prompt}\n\nContext: {{context}}"
             qa_prompt = ChatPromptTemplate.from_messages([
                 ("system", qa_system_prompt),
@@ -505,37 +704,40 @@ class RagChatService:
                 "chat_history": chat_history,
                 "input": message
             }
-            
-            # DEBUG: Show exactly what the LLM receives
-            print("\n" + "="*80)
-            print("🔍 FINAL LLM INPUT DEBUG - NON-STREAMING RAG RESPONSE")
-            print("="*80)
-            
-            # Format the final system prompt with context
-            final_system_prompt = qa_system_prompt.format(context=context)
-            print(f"\n📋 FINAL SYSTEM PROMPT:\n{final_system_prompt}")
-            
-            print(f"\n💬 CHAT HISTORY ({len(chat_history)} messages):")
-            for i, msg in enumerate(chat_history):
-                msg_type = type(msg).__name__
-                if hasattr(msg, 'content'):
-                    content_preview = msg.content[:100] + "..." if len(msg.content) > 100 else msg.content
-                    print(f"  [{i}] {msg_type}: {content_preview}")
-                else:
-                    print(f"  [{i}] {msg_type}: {str(msg)[:100]}...")
-            
-            print(f"\n👤 USER INPUT:\n{message}")
-            
-            print(f"\n📚 RAG CONTEXT ({len(context)} chars):")
-            context_preview = context[:500] + "..." if len(context) > 500 else context
-            print(f"{context_preview}")
-            
-            print("\n" + "="*80)
-            print("🚀 SENDING TO LLM...")
-            print("="*80 + "\n")
+            record_stage("prompt_build", time.perf_counter() - prompt_started)
+            
+            # DEBUG: Show exactly what the LLM receives (sampled by RAG_DEBUG_PROMPT_SAMPLE_RATE)
+            if should_dump_prompt():
+                print("\n" + "="*80)
+                print("🔍 FINAL LLM INPUT DEBUG - NON-STREAMING RAG RESPONSE")
+                print("="*80)
+            
+                # Format the final system prompt with context
+                final_system_prompt = qa_system_prompt.format(context=context)
+                print(f"\n📋 FINAL SYSTEM PROMPT:\n{final_system_prompt}")
+            
+                print(f"\n💬 CHAT HISTORY ({len(chat_history)} messages):")
+                for i, msg in enumerate(chat_history):
+                    msg_type = type(msg).__name__
+                    if hasattr(msg, 'content'):
+                        content_preview = msg.content[:100] + "..." if len(msg.content) > 100 else msg.content
+                        print(f"  [{i}] {msg_type}: {content_preview}")
+                    else:
+                        print(f"  [{i}] {msg_type}: {str(msg)[:100]}...")
+            
+                print(f"\n👤 USER INPUT:\n{message}")
+            
+                print(f"\n📚 RAG CONTEXT ({len(context)} chars):")
+                context_preview = context[:500] + "..." if len(context) > 500 else context
+                print(f"{context_preview}")
+            
+                print("\n" + "="*80)
+                print("🚀 SENDING TO LLM...")
+                print("="*80 + "\n")
 
             # Run the chain and collect the full response using LangChain's native async method
-            result = await chain.ainvoke(final_input_vars)
+            with trace_span("generation"):
+                result = await chain.ainvoke(final_input_vars)
             complete_response = result.content if hasattr(result, 'content') else str(result)
 
             # Save the assistant response with RAG context
@@ -545,7 +747,9 @@ class RagChatService:
                 content=complete_response,
                 rag_context=context
             )
-            crud.create_message(db, assistant_message)
+            with trace_span("db_save"):
+                crud.create_message(db, assistant_message)
+            ConversationSummaryService.schedule_update(conversation_id)
 
             # Return processed result
             return {
@@ -608,7 +812,9 @@ class RagChatService:
             print(f"DEBUG: Created LLM with model {llm.model_name}")
             
             # Get appropriate system prompt based on collection type
-            system_prompt = self._get_rag_system_prompt(db, conversation_collection)
+            system_prompt = self._with_conversation_summary(
+                db, conversation_id, self._get_rag_system_prompt(db, conversation_collection)
+            )
             
             # Create prompt
             prompt = ChatPromptTemplate.from_messages([
@@ -640,7 +846,10 @@ class RagChatService:
                     print(f"DEBUG: Using top_k: {top_k}")
                     
                     # Retrieve relevant documents using LangChain's native async method
-                    retrieved_docs = await retriever.ainvoke(query)
+                    retrieved_docs = await traced_retrieve(retriever, query, models.ConversationType.USER_FILES.value)
+                    
+                    # Drop duplicate chunks and fit the rest into the context token budget
+                    retrieved_docs = await pack_documents(retrieved_docs, query, self.embeddings)
                     
                     # Join the text of the retrieved documents
                     context_texts = []
@@ -721,10 +930,60 @@ class RagChatService:
             print(f"DEBUG: ERROR in _get_regular_llm_response: {str(e)}")
             return "I'm having trouble processing your request. Please try again later or contact support."
 
+    def _prepare_conversation_rag_turn(self, db: Session, conversation_id: str, query: str,
+                                       collection_name: str, save_user_message: bool):
+        """
+        Do the database work before a streamed conversation RAG answer. Runs in a worker thread.
+        
+        Args:
+            db: Database session
+            conversation_id: ID of the conversation
+            query: User query
+            collection_name: Sanitized name of the conversation's collection
+            save_user_message: Whether to save the user message
+            
+        Returns:
+            Tuple of (formatted history lines, retriever top_k, system prompt)
+        """
+        # Save user message to database first if requested
+        if save_user_message:
+            user_message = schemas.MessageCreate(
+                conversation_id=conversation_id,
+                role="user",
+                content=query
+            )
+            crud.create_message(db, user_message)
+        
+        # Get the most recent conversation history within the token budget,
+        # without the saved current question that the prompt adds as input
+        messages = load_history_window(
+            db, conversation_id, models.ConversationType.USER_FILES, skip_current_message=True
+        )
+        
+        # Format history for the LLM
+        history = []
+        for msg in messages:
+            if msg.role == "user":
+                history.append(f"Human: {msg.content}")
+            elif msg.role == "assistant":
+                history.append(f"Assistant: {msg.content}")
+        
+        # Admin-configured top_k value and the system prompt based on collection type
+        top_k = RAGConfigService.get_retriever_top_k(db)
+        system_prompt = self._with_conversation_summary(
+            db, conversation_id, self._get_rag_system_prompt(db, collection_name)
+        )
+        
+        # Database work is done until the answer is saved; don't hold a
+        # pooled connection during retrieval and token streaming
+        release_connection(db)
+        return history, top_k, system_prompt
+    
     async def get_streaming_conversation_rag_response(self, db: Session, conversation_id: str, 
                                                 query: str, user_id: int, 
                                                 conversation_collection: Optional[str] = None,
-                                                save_user_message: bool = True) -> AsyncGenerator[str, None]:
+                                                save_user_message: bool = True,
+                                                stream_id: Optional[str] = None) -> AsyncGenerator[str, None]:
         """
         Get a streaming RAG response using files attached to a conversation.
         
@@ -735,33 +994,13 @@ class RagChatService:
             user_id: ID of the user
             conversation_collection: Optional name of the collection for this conversation
             save_user_message: Whether to save the user message to the database (defaults to True)
+            stream_id: ID of the resumable stream, stored on the saved answer
             
         Yields:
             Tokens of the generated response
         """
+        set_pipeline("conversation_rag")
         try:
-            # Save user message to database first if requested
-            if save_user_message:
-                user_message = schemas.MessageCreate(
-                    conversation_id=conversation_id,
-                    role="user",
-                    content=query
-                )
-                crud.create_message(db, user_message)
-            
-            # Get conversation history
-            messages = crud.get_conversation_messages(db, conversation_id)
-            
-            # Format history for the LLM
-            history = []
-            for msg in messages:
-                if msg.role == "user":
-                    history.append(f"Human: {msg.content}")
-                elif msg.role == "assistant":
-                    history.append(f"Assistant: {msg.content}")
-            
-            history_text = "\n".join(history[-10:])  # Limit history to last 10 messages
-            
             # Use the conversation-specific collection
             if not conversation_collection:
                 conversation_collection = conversation_collection_name(conversation_id)
@@ -769,48 +1008,60 @@ class RagChatService:
             # Ensure collection name is valid for Milvus
             safe_collection_name = sanitize_collection_name(conversation_collection)
             
+            # Database queries run in a worker thread so they don't block the event loop
+            config_started = time.perf_counter()
+            history, top_k, system_prompt = await asyncio.to_thread(
+                self._prepare_conversation_rag_turn, db, conversation_id, query, safe_collection_name, save_user_message
+            )
+            history_text = "\n".join(history)
+            
             # Check if collection exists
             if not self.vectorstore_manager.collection_exists(safe_collection_name):
                 # If no collection exists, fall back to regular chat
                 # But don't create another user message since we already saved one above
-                # Convert the synchronous generator to an async one
                 stream_gen = get_streaming_llm_response(
                     db=db,
                     user_id=user_id,
                     message=query,
                     conversation_id=conversation_id,
                     meta_data=None,
-                    save_user_message=False  # Don't save user message again
+                    save_user_message=False,  # Don't save user message again
+                    stream_id=stream_id
                 )
-                # Since we're in an async function but get_streaming_llm_response is synchronous,
-                # we need to manually yield each token
-                for chunk in stream_gen:
+                async for chunk in stream_gen:
                     yield chunk
                 return
             
             # Create vector store for the conversation
-            vectorstore = Milvus(
+            vectorstore = RetrievalMilvus(
                 embedding_function=self.vectorstore_manager.get_embedding_function(),
                 collection_name=safe_collection_name,
                 connection_args={"uri": self.milvus_uri}
             )
             
             # Create retriever with admin-configured top_k value
-            top_k = RAGConfigService.get_retriever_top_k(db)
             retriever = vectorstore.as_retriever(
                 search_type="similarity",
                 search_kwargs={"k": top_k}
             )
             
+            # Create chat model from the shared client pool (disable thinking for efficiency)
+            chat = await llm_client_pool.aget_llm(db, streaming=True, override_thinking=False)
+            record_stage("config", time.perf_counter() - config_started)
+            
             # DEBUG: Print the query that will be sent to vectorstore (streaming method)
             print(f"DEBUG STREAMING: Query sent to vectorstore: {query}")
             print(f"DEBUG STREAMING: Using top_k: {top_k}")
             print(f"DEBUG STREAMING: Chat history length: {len(history)} messages")
             
             # Get relevant documents using LangChain's native async method
-            docs = await retriever.ainvoke(query)
+            docs = await traced_retrieve(retriever, query, models.ConversationType.USER_FILES.value)
             print(f"DEBUG STREAMING: Retrieved {len(docs)} documents")
             
+            # Drop duplicate chunks and fit the rest into the context token budget
+            prompt_started = time.perf_counter()
+            docs = await pack_documents(docs, query, self.embeddings)
+            
             # Format context from documents
             context_parts = [self._extract_doc_text(doc) for doc in docs]
             context = "\n\n".join(context_parts)
@@ -827,17 +1078,12 @@ class RagChatService:
             else:
                 print("DEBUG STREAMING: No context retrieved!")
             
-            # Create prompt with appropriate system prompt based on collection type
-            system_prompt = self._get_rag_system_prompt(db, safe_collection_name)
             prompt = ChatPromptTemplate.from_messages([
                 ("system", system_prompt),
                 MessagesPlaceholder(variable_name="chat_history"),
                 ("human", "Context: {context}\n\nQuestion: {input}")
             ])
             
-            # Create chat model using the get_llm method (disable thinking for efficiency)
-            chat = self.get_llm(db, streaming=True, override_thinking=False)
-            
             # Create chain
             chain = prompt | chat
             
@@ -847,38 +1093,47 @@ class RagChatService:
                 "chat_history": history_text,
                 "input": query
             }
+            record_stage("prompt_build", time.perf_counter() - prompt_started)
             
-            # DEBUG: Show exactly what the LLM receives in streaming conversation RAG
-            print("\n" + "="*80)
-            print("🔍 FINAL LLM INPUT DEBUG - STREAMING CONVERSATION RAG")
-            print("="*80)
+            # DEBUG: Show exactly what the LLM receives in streaming conversation RAG (sampled by RAG_DEBUG_PROMPT_SAMPLE_RATE)
+            if should_dump_prompt():
+                print("\n" + "="*80)
+                print("🔍 FINAL LLM INPUT DEBUG - STREAMING CONVERSATION RAG")
+                print("="*80)
             
-            # Get the formatted messages that will be sent to the LLM
-            formatted_messages = await prompt.aformat_messages(**final_input_vars)
+                # Get the formatted messages that will be sent to the LLM
+                formatted_messages = await prompt.aformat_messages(**final_input_vars)
             
-            print(f"\n📋 FORMATTED MESSAGES TO LLM ({len(formatted_messages)} messages):")
-            for i, msg in enumerate(formatted_messages):
-                msg_type = type(msg).__name__
-                role = getattr(msg, 'type', 'unknown')
-                content_preview = msg.content[:300] + "..." if len(msg.content) > 300 else msg.content
-                print(f"  [{i}] {msg_type} ({role}):\n{content_preview}\n")
+                print(f"\n📋 FORMATTED MESSAGES TO LLM ({len(formatted_messages)} messages):")
+                for i, msg in enumerate(formatted_messages):
+                    msg_type = type(msg).__name__
+                    role = getattr(msg, 'type', 'unknown')
+                    content_preview = msg.content[:300] + "..." if len(msg.content) > 300 else msg.content
+                    print(f"  [{i}] {msg_type} ({role}):\n{content_preview}\n")
             
-            print(f"\n💬 RAW CHAT HISTORY INPUT:\n{history_text[:500]}...")
-            print(f"\n👤 USER QUERY:\n{query}")
-            print(f"\n📚 RAG CONTEXT ({len(context)} chars):\n{context[:500]}...")
+                print(f"\n💬 RAW CHAT HISTORY INPUT:\n{history_text[:500]}...")
+                print(f"\n👤 USER QUERY:\n{query}")
+                print(f"\n📚 RAG CONTEXT ({len(context)} chars):\n{context[:500]}...")
             
-            print("\n" + "="*80)
-            print("🚀 SENDING TO LLM...")
-            print("="*80 + "\n")
+                print("\n" + "="*80)
+                print("🚀 SENDING TO LLM...")
+                print("="*80 + "\n")
             
             # Stream the response
             full_response = []
             
             # Use LangChain's native async streaming method
-            async for chunk in chain.astream(final_input_vars):
-                token = chunk.content
-                full_response.append(token)
-                yield token
+            try:
+                async for chunk in timed_stream(chain.astream(final_input_vars)):
+                    token = chunk.content
+                    full_response.append(token)
+                    yield token
+            except (asyncio.CancelledError, GeneratorExit):
+                # Client went away: keep what was generated so far
+                await asyncio.to_thread(
+                    save_partial_answer, db, conversation_id, full_response, rag_context=context, stream_id=stream_id
+                )
+                raise
             
             # Combine all tokens into the complete response
             complete_response = "".join(full_response)
@@ -888,9 +1143,12 @@ class RagChatService:
                 conversation_id=conversation_id,
                 role="assistant",
                 content=complete_response,
-                rag_context=context
+                rag_context=context,
+                stream_id=stream_id
             )
-            crud.create_message(db, assistant_message)
+            with trace_span("db_save"):
+                await asyncio.to_thread(crud.create_message, db, assistant_message)
+            ConversationSummaryService.schedule_update(conversation_id)
             
         except Exception as e:
             # Log the exception and re-raise
@@ -909,8 +1167,8 @@ class RagChatService:
             Formatted conversation history
         """
         try:
-            # Get messages for this conversation
-            messages = crud.get_conversation_messages(db, conversation_id)
+            # Get the most recent messages of this conversation within the token budget
+            messages = load_history_window(db, conversation_id, models.ConversationType.USER_FILES)
             
             # Format messages as a string
             history = ""
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+from typing import AsyncIterator, List, Optional
+
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+
+from app.config import settings
+from app.db import crud, schemas
+
+logger = logging.getLogger("stream_cancellation")
+
+
+async def _wait_for_disconnect(request: Request, interval: float):
+    while not await request.is_disconnected():
+        await asyncio.sleep(interval)
+
+
+async def stop_on_disconnect(request: Request, chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Stop a streamed answer as soon as the client disconnects.
+
+    The pending step of the stream is cancelled. When the chunks come straight
+    from a streaming service this closes the upstream LLM request and the
+    service saves what was generated so far as a truncated answer.
+
+    Args:
+        request: Incoming HTTP request of the stream
+        chunks: Answer stream, e.g. from one of the streaming services
+
+    Yields:
+        Chunks of the answer while the client is connected
+    """
+    iterator = chunks.__aiter__()
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request, settings.STREAM_DISCONNECT_POLL_SECONDS))
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            pending = asyncio.ensure_future(iterator.__anext__())
+            done, _ = await asyncio.wait({pending, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if pending not in done:
+                print("DEBUG: Client disconnected, cancelling the answer stream")
+                pending.cancel()
+                # Let the service save the partial answer before the session is closed
+                await asyncio.wait({pending})
+                return
+            future, pending = pending, None
+            try:
+                chunk = future.result()
+            except StopAsyncIteration:
+                return
+            yield chunk
+    finally:
+        watcher.cancel()
+        if pending is not None and not pending.done():
+            pending.cancel()
+
+
+def save_partial_answer(db: Session, conversation_id: str, tokens: List[str], rag_context: Optional[str] = None,
+                        stream_id: Optional[str] = None):
+    """
+    Save the part of an answer generated before the stream was cancelled.
+
+    Called from the streaming services when the client goes away; the message is
+    marked as truncated. Nothing is saved if no token was generated.
+
+    Args:
+        db: Database session
+        conversation_id: Conversation ID
+        tokens: Tokens generated so far
+        rag_context: Retrieved context used for the answer
+        stream_id: ID of the resumable stream the answer was generated for
+    """
+    content = "".join(tokens)
+    if not content or not conversation_id:
+        return
+    try:
+        crud.create_message(db, schemas.MessageCreate(
+            conversation_id=conversation_id,
+            role="assistant",
+            content=content,
+            rag_context=rag_context,
+            is_truncated=True,
+            stream_id=stream_id
+        ))
+        print(f"DEBUG: Saved truncated answer ({len(content)} chars) for conversation {conversation_id}")
+    except Exception as e:
+        logger.error(f"Failed to save truncated answer for conversation {conversation_id}: {e}")
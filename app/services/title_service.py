@@ -1,14 +1,27 @@
 from sqlalchemy.orm import Session
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional, Set
 from langchain_openai import ChatOpenAI
 from langchain.schema import HumanMessage
 import asyncio
+import logging
+import numpy as np
 
 from app.db import crud, models, schemas
+from app.db.database import SessionLocal, release_connection
 from app.config import settings
-from app.services.llm_service import get_llm
+from app.services.llm_client_pool import llm_client_pool
+from app.services.message_history_cache import message_history_cache
+from app.utils.infinity_embedder import InfinityEmbedder
 from app.utils.title_utils import clean_title
 
+logger = logging.getLogger("title_service")
+
+# Longest excerpt of a user message embedded for topic shift detection
+MAX_TOPIC_MESSAGE_CHARS = 2000
+
+# Shared embedder for topic shift detection, created on first use
+_embedder: Optional[InfinityEmbedder] = None
+
 class TitleGenerationService:
     """
     Service for automatically generating and updating conversation titles.
@@ -16,12 +29,60 @@ class TitleGenerationService:
     Features:
     1. Initial title from first message
     2. Regular title updates every 5 exchanges 
-    3. Title updates on significant topic shifts
+    3. Title updates on significant topic shifts (detected with embeddings)
     4. Final title generation at conversation end
     """
     
     MESSAGE_THRESHOLD = 5  # Update title after this many new message pairs
     
+    # Title steps run as event loop tasks next to chat streams, so their queries
+    # run in worker threads and no connection is held during embedding or LLM calls
+    
+    @staticmethod
+    def _load_conversation_state(db: Session, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Read the conversation fields and messages a title step needs. Runs in a worker thread.
+        
+        Args:
+            db: Database session
+            conversation_id: ID of the conversation
+            
+        Returns:
+            Dict with headline, topic_centroid, topic_message_count and messages,
+            or None if the conversation doesn't exist
+        """
+        conversation = crud.get_conversation(db, conversation_id)
+        if not conversation:
+            return None
+        state = {
+            "headline": conversation.headline,
+            "topic_centroid": conversation.topic_centroid,
+            "topic_message_count": conversation.topic_message_count,
+            "messages": message_history_cache.get_messages(db, conversation_id),
+        }
+        release_connection(db)
+        return state
+    
+    @staticmethod
+    def _update_conversation(db: Session, conversation_id: str, values: Dict[str, Any]):
+        """Update columns of a conversation. Runs in a worker thread."""
+        db.query(models.Conversation).filter(models.Conversation.id == conversation_id).update(
+            values, synchronize_session=False
+        )
+        db.commit()
+    
+    @staticmethod
+    async def _generate_title(db: Session, conversation_id: str, prompt: str) -> str:
+        """Ask the LLM for a title and store it as the conversation headline."""
+        # Get LLM with thinking disabled for title generation
+        llm = await llm_client_pool.aget_llm(db, override_thinking=False)
+        # An uncached config read checks out a connection; return it before the call
+        await asyncio.to_thread(release_connection, db)
+        response = await llm.ainvoke([HumanMessage(content=prompt)])
+        title = clean_title(response.content)
+        await asyncio.to_thread(TitleGenerationService._update_conversation, db, conversation_id, {"headline": title})
+        return title
+    
     @staticmethod
     async def generate_initial_title(db: Session, conversation_id: str) -> str:
         """
@@ -34,13 +95,10 @@ class TitleGenerationService:
         Returns:
             Generated title
         """
-        # Get conversation
-        conversation = crud.get_conversation(db, conversation_id)
-        if not conversation:
+        state = await asyncio.to_thread(TitleGenerationService._load_conversation_state, db, conversation_id)
+        if not state:
             return "New Conversation"
-        
-        # Get messages
-        messages = crud.get_conversation_messages(db, conversation_id)
+        messages = state["messages"]
         
         # If no messages, return default
         if not messages:
@@ -63,19 +121,9 @@ Message: "{message}"
 
 Title: """
         
-        # Get LLM with thinking disabled for title generation
-        llm = get_llm(db, override_thinking=False)
-        
-        # Generate title
-        message = HumanMessage(content=prompt.format(message=first_message.content))
-        response = llm.invoke([message])
-        title = clean_title(response.content)
-        
-        # Update conversation
-        conversation.headline = title
-        db.commit()
-        
-        return title
+        return await TitleGenerationService._generate_title(
+            db, conversation_id, prompt.format(message=first_message.content)
+        )
     
     @staticmethod
     async def update_title_periodic(db: Session, conversation_id: str) -> str:
@@ -89,17 +137,14 @@ Title: """
         Returns:
             Updated title
         """
-        # Get conversation
-        conversation = crud.get_conversation(db, conversation_id)
-        if not conversation:
+        state = await asyncio.to_thread(TitleGenerationService._load_conversation_state, db, conversation_id)
+        if not state:
             return "Conversation Not Found"
-        
-        # Get all messages
-        messages = crud.get_conversation_messages(db, conversation_id)
+        messages = state["messages"]
         
         # Skip if not enough messages
         if len(messages) < 4:  # Need at least 2 exchanges (4 messages)
-            return conversation.headline or "New Conversation"
+            return state["headline"] or "New Conversation"
         
         # Get the most recent messages (up to last 5 exchanges = 10 messages)
         recent_messages = messages[-10:]
@@ -120,25 +165,37 @@ Title: """
             role = "User" if msg.role == "user" else "Assistant"
             formatted_messages += f"{role}: {msg.content[:200]}...\n"
         
-        # Get LLM with thinking disabled for title generation
-        llm = get_llm(db, override_thinking=False)
-        
-        # Generate title
-        message = HumanMessage(content=prompt.format(messages=formatted_messages))
-        response = llm.invoke([message])
-        title = clean_title(response.content)
-        
-        # Update conversation
-        conversation.headline = title
-        db.commit()
-        
-        return title
+        return await TitleGenerationService._generate_title(
+            db, conversation_id, prompt.format(messages=formatted_messages)
+        )
+    
+    @staticmethod
+    async def _embed_message(text: str) -> Optional[np.ndarray]:
+        """Embed a user message as a unit vector; None if the embedder is unavailable."""
+        global _embedder
+        if not text or not text.strip():
+            return None
+        try:
+            if _embedder is None:
+                _embedder = InfinityEmbedder()
+            embedding = await asyncio.to_thread(_embedder.embed_query, text[:MAX_TOPIC_MESSAGE_CHARS])
+        except Exception as e:
+            logger.warning(f"Could not embed message for topic shift detection: {e}")
+            return None
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
     
     @staticmethod
     async def detect_topic_shift(db: Session, conversation_id: str, last_user_message: str) -> bool:
         """
         Detect if there's a significant shift in conversation topic.
         
+        The message embedding is compared with the conversation's running topic
+        centroid instead of asking the LLM. A cosine distance above
+        TITLE_TOPIC_SHIFT_THRESHOLD is a shift and restarts the centroid from the
+        message; otherwise the message is averaged into the centroid.
+        
         Args:
             db: Database session
             conversation_id: ID of the conversation
@@ -147,30 +204,43 @@ Title: """
         Returns:
             True if a topic shift is detected, False otherwise
         """
-        # Get conversation
-        conversation = crud.get_conversation(db, conversation_id)
-        if not conversation or not conversation.headline:
+        state = await asyncio.to_thread(TitleGenerationService._load_conversation_state, db, conversation_id)
+        if not state:
             return False
         
-        # Get previous title
-        current_title = conversation.headline
-        
-        # Create prompt to detect topic shift
-        prompt = """Determine if there's a significant topic shift between the current conversation title and the new message.
-Current title: "{title}"
-New message: "{message}"
-
-Is there a significant shift in topic? Answer YES or NO only."""
-        
-        # Get LLM with thinking disabled for title generation
-        llm = get_llm(db, override_thinking=False)
-        
-        # Check for topic shift
-        message = HumanMessage(content=prompt.format(title=current_title, message=last_user_message))
-        response = llm.invoke([message])
-        result = response.content.strip().upper()
+        embedding = await TitleGenerationService._embed_message(last_user_message)
+        if embedding is None:
+            return False
         
-        return "YES" in result
+        centroid = None
+        if state["topic_centroid"] and state["topic_message_count"]:
+            centroid = np.asarray(state["topic_centroid"], dtype=np.float32)
+            if centroid.shape != embedding.shape:
+                # Embedding model changed, start over
+                centroid = None
+        
+        topic_shift = False
+        if centroid is not None:
+            centroid_norm = np.linalg.norm(centroid)
+            similarity = float(np.dot(embedding, centroid) / centroid_norm) if centroid_norm > 0 else 0.0
+            distance = 1.0 - similarity
+            topic_shift = bool(state["headline"]) and distance > settings.TITLE_TOPIC_SHIFT_THRESHOLD
+            print(f"DEBUG: Topic distance for conversation {conversation_id}: {distance:.3f} (shift: {topic_shift})")
+        
+        if centroid is None or topic_shift:
+            new_centroid, count = embedding, 1
+        else:
+            # Cap the weight of the history so the centroid follows a slowly drifting topic
+            weight = min(state["topic_message_count"], settings.TITLE_TOPIC_CENTROID_WINDOW)
+            new_centroid = (centroid * weight + embedding) / (weight + 1)
+            count = state["topic_message_count"] + 1
+        
+        await asyncio.to_thread(TitleGenerationService._update_conversation, db, conversation_id, {
+            "topic_centroid": [round(float(x), 6) for x in new_centroid],
+            "topic_message_count": count,
+        })
+        
+        return topic_shift
     
     @staticmethod
     async def update_title_on_shift(db: Session, conversation_id: str) -> str:
@@ -185,13 +255,10 @@ Is there a significant shift in topic? Answer YES or NO only."""
             Updated title
         """
         # Similar to update_title_periodic but with a prompt focused on the new topic
-        # Get conversation
-        conversation = crud.get_conversation(db, conversation_id)
-        if not conversation:
+        state = await asyncio.to_thread(TitleGenerationService._load_conversation_state, db, conversation_id)
+        if not state:
             return "Conversation Not Found"
-        
-        # Get all messages
-        messages = crud.get_conversation_messages(db, conversation_id)
+        messages = state["messages"]
         
         # Get the most recent messages (last 3 exchanges = 6 messages)
         recent_messages = messages[-6:]
@@ -213,21 +280,9 @@ Title: """
             role = "User" if msg.role == "user" else "Assistant"
             formatted_messages += f"{role}: {msg.content[:200]}...\n"
         
-        # Get LLM with thinking disabled for title generation
-        llm = get_llm(db, override_thinking=False)
-        
-        # Generate title
-        message = HumanMessage(content=prompt.format(
-            messages=formatted_messages
-        ))
-        response = llm.invoke([message])
-        title = clean_title(response.content)
-        
-        # Update conversation
-        conversation.headline = title
-        db.commit()
-        
-        return title
+        return await TitleGenerationService._generate_title(
+            db, conversation_id, prompt.format(messages=formatted_messages)
+        )
     
     @staticmethod
     async def generate_final_title(db: Session, conversation_id: str) -> str:
@@ -241,13 +296,10 @@ Title: """
         Returns:
             Final title
         """
-        # Get conversation
-        conversation = crud.get_conversation(db, conversation_id)
-        if not conversation:
+        state = await asyncio.to_thread(TitleGenerationService._load_conversation_state, db, conversation_id)
+        if not state:
             return "Conversation Not Found"
-        
-        # Get all messages
-        messages = crud.get_conversation_messages(db, conversation_id)
+        messages = state["messages"]
         
         # Create prompt for generating final title
         prompt = """Generate a short, comprehensive title (2-5 words) that captures the entire conversation.
@@ -265,29 +317,17 @@ Final comprehensive title: """
         # Find first and last user messages
         user_messages = [msg for msg in messages if msg.role == "user"]
         if not user_messages:
-            return conversation.headline or "New Conversation"
+            return state["headline"] or "New Conversation"
         
         first_user_msg = user_messages[0].content
         last_user_msg = user_messages[-1].content
         
-        # Get LLM with thinking disabled for title generation
-        llm = get_llm(db, override_thinking=False)
-        
-        # Generate title
-        message = HumanMessage(content=prompt.format(
+        return await TitleGenerationService._generate_title(db, conversation_id, prompt.format(
             message_count=len(messages),
             first_message=first_user_msg[:200],
             last_message=last_user_msg[:200],
-            current_title=conversation.headline or "Untitled"
+            current_title=state["headline"] or "Untitled"
         ))
-        response = llm.invoke([message])
-        title = clean_title(response.content)
-        
-        # Update conversation
-        conversation.headline = title
-        db.commit()
-        
-        return title
     
     @staticmethod
     async def process_new_message(db: Session, conversation_id: str, user_message: str) -> None:
@@ -300,17 +340,17 @@ Final comprehensive title: """
             conversation_id: ID of the conversation
             user_message: Content of the user message
         """
-        # Get conversation
-        conversation = crud.get_conversation(db, conversation_id)
-        if not conversation:
+        state = await asyncio.to_thread(TitleGenerationService._load_conversation_state, db, conversation_id)
+        if not state:
             return
         
         # Get message count
-        messages = crud.get_conversation_messages(db, conversation_id)
-        message_count = len(messages)
+        message_count = len(state["messages"])
         
         # Case 1: First message - generate initial title
-        if message_count == 1 or not conversation.headline:
+        if message_count == 1 or not state["headline"]:
+            # Seed the topic centroid with this message
+            await TitleGenerationService.detect_topic_shift(db, conversation_id, user_message)
             await TitleGenerationService.generate_initial_title(db, conversation_id)
             return
         
@@ -325,4 +365,75 @@ Final comprehensive title: """
         message_pairs = message_count // 2
         if message_pairs % TitleGenerationService.MESSAGE_THRESHOLD == 0:
             await TitleGenerationService.update_title_periodic(db, conversation_id)
-            return 
\ No newline at end of file
+            return 
+
+
+class TitleUpdateScheduler:
+    """
+    Debounced, bounded background title updates.
+
+    Each chat message schedules an update for its conversation. Updates wait
+    TITLE_DEBOUNCE_SECONDS and only the latest pending message of a conversation is
+    processed, so a burst of messages costs one title run. At most
+    TITLE_MAX_CONCURRENCY updates run at a time per worker, each with a session from
+    the shared engine whose queries run in worker threads, so no update blocks the
+    event loop or holds a connection during embedding and LLM calls.
+    """
+
+    # conversation_id -> latest user message waiting for a title update
+    _pending: Dict[str, str] = {}
+    _running: Set[str] = set()
+    _tasks: Set[asyncio.Task] = set()
+    _semaphore: Optional[asyncio.Semaphore] = None
+
+    @classmethod
+    def schedule(cls, conversation_id: str, user_message: str):
+        """
+        Schedule a title update for a conversation.
+
+        Must be called from the event loop. If an update for the conversation is
+        already scheduled, it will use this message instead of the earlier one.
+
+        Args:
+            conversation_id: ID of the conversation
+            user_message: Content of the latest user message
+        """
+        if not conversation_id:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        cls._pending[conversation_id] = user_message
+        if conversation_id in cls._running:
+            return
+        cls._running.add(conversation_id)
+        task = loop.create_task(cls._run(conversation_id))
+        cls._tasks.add(task)
+        task.add_done_callback(cls._tasks.discard)
+
+    @classmethod
+    def _get_semaphore(cls) -> asyncio.Semaphore:
+        if cls._semaphore is None:
+            cls._semaphore = asyncio.Semaphore(max(1, settings.TITLE_MAX_CONCURRENCY))
+        return cls._semaphore
+
+    @classmethod
+    async def _run(cls, conversation_id: str):
+        try:
+            while True:
+                await asyncio.sleep(settings.TITLE_DEBOUNCE_SECONDS)
+                user_message = cls._pending.pop(conversation_id, None)
+                if user_message is None:
+                    break
+                async with cls._get_semaphore():
+                    db = SessionLocal()
+                    try:
+                        await TitleGenerationService.process_new_message(db, conversation_id, user_message)
+                    finally:
+                        db.close()
+        except Exception as e:
+            logger.error(f"Failed to update title of conversation {conversation_id}: {e}")
+        finally:
+            cls._pending.pop(conversation_id, None)
+            cls._running.discard(conversation_id)
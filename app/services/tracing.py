@@ -0,0 +1,151 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, Optional
+
+from app.config import settings
+from app.services.metrics import STAGE_DURATION, VECTOR_SEARCH_DURATION
+
+# Pipeline label of stages recorded outside a traced chat request
+DEFAULT_PIPELINE = "other"
+
+
+class RequestTrace:
+    """Stage timings of one request, accumulated per stage."""
+
+    def __init__(self):
+        self.pipeline = DEFAULT_PIPELINE
+        self.stages: Dict[str, float] = {}
+        self.started = time.perf_counter()
+
+    def record(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        STAGE_DURATION.labels(self.pipeline, stage).observe(seconds)
+
+    def timings_ms(self) -> Dict[str, float]:
+        """Stage durations in milliseconds."""
+        return {stage: round(seconds * 1000, 1) for stage, seconds in self.stages.items()}
+
+    def server_timing(self) -> str:
+        """Stage durations formatted as a Server-Timing header value."""
+        entries = [f"{stage};dur={ms}" for stage, ms in self.timings_ms().items()]
+        entries.append(f"total;dur={round((time.perf_counter() - self.started) * 1000, 1)}")
+        return ", ".join(entries)
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+def current_timings() -> Dict[str, float]:
+    """Stage durations of the current request in milliseconds, empty outside a request."""
+    trace = current_trace()
+    return trace.timings_ms() if trace is not None else {}
+
+
+def set_pipeline(pipeline: str):
+    """Label the stages of the current request with a pipeline name (chat, rag, conversation_rag)."""
+    trace = current_trace()
+    if trace is not None:
+        trace.pipeline = pipeline
+
+
+def record_stage(stage: str, seconds: float):
+    """Record a stage duration on the current request, or only as a metric outside a request."""
+    trace = current_trace()
+    if trace is not None:
+        trace.record(stage, seconds)
+    else:
+        STAGE_DURATION.labels(DEFAULT_PIPELINE, stage).observe(seconds)
+
+
+@contextmanager
+def trace_span(stage: str):
+    """Time a block as a stage of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+async def traced_retrieve(retriever, query: str, collection_type: str = "global_collection"):
+    """
+    Retrieve documents, recording the vector search time.
+
+    The retriever embeds the query itself; that part is recorded separately by
+    the embedder as query_embedding and left out of milvus_search.
+
+    Args:
+        retriever: LangChain retriever
+        query: Search query
+        collection_type: Metrics label (a ConversationType value, never a collection name)
+
+    Returns:
+        Retrieved documents
+    """
+    trace = current_trace()
+    embedded_before = trace.stages.get("query_embedding", 0.0) if trace else 0.0
+    started = time.perf_counter()
+    docs = await retriever.ainvoke(query)
+    elapsed = time.perf_counter() - started
+    embedded = (trace.stages.get("query_embedding", 0.0) - embedded_before) if trace else 0.0
+    search_seconds = max(0.0, elapsed - embedded)
+    record_stage("milvus_search", search_seconds)
+    VECTOR_SEARCH_DURATION.labels(collection_type).observe(search_seconds)
+    return docs
+
+
+async def timed_stream(chunks: AsyncIterator) -> AsyncIterator:
+    """Pass through an LLM stream, recording time to first token and total generation time."""
+    started = time.perf_counter()
+    first = True
+    async for chunk in chunks:
+        if first:
+            record_stage("ttft", time.perf_counter() - started)
+            first = False
+        yield chunk
+    record_stage("generation", time.perf_counter() - started)
+
+
+def should_dump_prompt() -> bool:
+    """Whether to print the full LLM input of this request (sampled by RAG_DEBUG_PROMPT_SAMPLE_RATE)."""
+    rate = settings.RAG_DEBUG_PROMPT_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+class TraceMiddleware:
+    """
+    ASGI middleware giving every request a RequestTrace.
+
+    Stages finished before the response starts are sent in a Server-Timing
+    header. Streaming responses start before generation, so the chat stream also
+    reports the full timings in its final frame.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        token = _current_trace.set(trace)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_trace.reset(token)
@@ -1,16 +1,26 @@
-from typing import List, Any, Optional, Dict, Union
+from collections import OrderedDict
+from typing import List, Any, Optional, Dict, Tuple, Union
 from langchain_community.embeddings import InfinityEmbeddings
 from langchain_core.embeddings import Embeddings
 import requests
+import threading
 import time
 import json
 import logging
 import numpy as np
 
 from app.config import settings
+from app.services.metrics import EMBEDDING_BATCH_SIZE, EMBEDDING_ERRORS, EMBEDDING_REQUEST_DURATION
+from app.services.tracing import trace_span
 
 logger = logging.getLogger(__name__)
 
+# Recent query embeddings, shared by all embedders of the worker. The retriever
+# and the context packer embed the same search query in one RAG turn.
+QUERY_EMBEDDING_CACHE_SIZE = 256
+_query_embedding_cache: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+_query_embedding_cache_lock = threading.Lock()
+
 class InfinityEmbedder(Embeddings):
     """
     Service for generating embeddings using Infinity model.
@@ -50,12 +60,29 @@ class InfinityEmbedder(Embeddings):
         """
         Generate embeddings for a single query text.
         
+        Recently embedded queries are answered from a small in-process cache.
+        
         Args:
             query: Text to embed
             
         Returns:
             List of floats representing the embedding
         """
+        key = (self.model, query)
+        with _query_embedding_cache_lock:
+            cached = _query_embedding_cache.get(key)
+            if cached is not None:
+                _query_embedding_cache.move_to_end(key)
+                return cached
+        
+        embedding = self._embed_query_uncached(query)
+        with _query_embedding_cache_lock:
+            _query_embedding_cache[key] = embedding
+            while len(_query_embedding_cache) > QUERY_EMBEDDING_CACHE_SIZE:
+                _query_embedding_cache.popitem(last=False)
+        return embedding
+    
+    def _embed_query_uncached(self, query: str) -> List[float]:
         # Handle empty input
         if not query or not query.strip():
             logger.warning("Received empty text for embedding")
@@ -64,14 +91,17 @@ class InfinityEmbedder(Embeddings):
             dummy_embedding = self.client.embed_query(dummy)
             return [0.0] * len(dummy_embedding)
         
-        for attempt in range(self.retry_count):
-            try:
-                return self.client.embed_query(query)
-            except Exception as e:
-                logger.error(f"Error embedding query (attempt {attempt+1}/{self.retry_count}): {str(e)}")
-                if attempt == self.retry_count - 1:
-                    raise
-                time.sleep(1)
+        with trace_span("query_embedding"):
+            for attempt in range(self.retry_count):
+                try:
+                    with EMBEDDING_REQUEST_DURATION.labels("query").time():
+                        return self.client.embed_query(query)
+                except Exception as e:
+                    EMBEDDING_ERRORS.labels("query").inc()
+                    logger.error(f"Error embedding query (attempt {attempt+1}/{self.retry_count}): {str(e)}")
+                    if attempt == self.retry_count - 1:
+                        raise
+                    time.sleep(1)
     
     def embed_documents(self, documents: List[str]) -> List[List[float]]:
         """
@@ -102,12 +132,15 @@ class InfinityEmbedder(Embeddings):
         all_embeddings = []
         for i in range(0, len(filtered_docs), self.batch_size):
             batch = filtered_docs[i:i+self.batch_size]
+            EMBEDDING_BATCH_SIZE.labels("documents").observe(len(batch))
             for attempt in range(self.retry_count):
                 try:
-                    batch_embeddings = self.client.embed_documents(batch)
+                    with EMBEDDING_REQUEST_DURATION.labels("documents").time():
+                        batch_embeddings = self.client.embed_documents(batch)
                     all_embeddings.extend(batch_embeddings)
                     break
                 except Exception as e:
+                    EMBEDDING_ERRORS.labels("documents").inc()
                     logger.error(f"Error embedding batch {i//self.batch_size} (attempt {attempt+1}/{self.retry_count}): {str(e)}")
                     if attempt == self.retry_count - 1:
                         raise
@@ -192,7 +225,7 @@ class InfinityEmbedder(Embeddings):
         try:
             start_time = time.time()
             sample = "Health check test"
-            _ = self.embed_query(sample)
+            _ = self._embed_query_uncached(sample)
             end_time = time.time()
             
             return {
@@ -0,0 +1,110 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import orjson
+
+from app.config import settings
+
+
+def ndjson_frame(payload: Dict[str, Any]) -> bytes:
+    """
+    Encode one NDJSON frame.
+
+    Args:
+        payload: JSON-serializable frame
+
+    Returns:
+        Encoded frame terminated by a newline
+    """
+    return orjson.dumps(payload) + b"\n"
+
+
+async def coalesce_chunks(chunks: AsyncIterator[str], max_delay: Optional[float] = None,
+                          max_bytes: Optional[int] = None) -> AsyncIterator[str]:
+    """
+    Merge small streamed text chunks into larger ones.
+
+    Buffered text is flushed once it reaches max_bytes or when max_delay has
+    passed since its first chunk arrived, even if no further chunk comes.
+
+    Args:
+        chunks: Text chunks, e.g. LLM tokens
+        max_delay: Longest time a chunk is held back, in seconds (defaults to STREAM_FRAME_MAX_DELAY_MS)
+        max_bytes: Flush size in UTF-8 bytes (defaults to STREAM_FRAME_MAX_BYTES)
+
+    Yields:
+        Concatenated chunks, in order
+    """
+    if max_delay is None:
+        max_delay = settings.STREAM_FRAME_MAX_DELAY_MS / 1000
+    if max_bytes is None:
+        max_bytes = settings.STREAM_FRAME_MAX_BYTES
+
+    loop = asyncio.get_running_loop()
+    iterator = chunks.__aiter__()
+    buffer: List[str] = []
+    buffered_bytes = 0
+    deadline = 0.0
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if not buffer and pending is None:
+                # Nothing to flush, so wait for the next chunk without a timer
+                try:
+                    chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+            else:
+                if pending is None:
+                    pending = asyncio.ensure_future(iterator.__anext__())
+                timeout = max(0.0, deadline - loop.time()) if buffer else None
+                done, _ = await asyncio.wait({pending}, timeout=timeout)
+                if not done:
+                    yield "".join(buffer)
+                    buffer, buffered_bytes = [], 0
+                    continue
+                future, pending = pending, None
+                try:
+                    chunk = future.result()
+                except StopAsyncIteration:
+                    break
+
+            if not chunk:
+                continue
+            if not buffer:
+                deadline = loop.time() + max_delay
+            buffer.append(chunk)
+            buffered_bytes += len(chunk.encode("utf-8"))
+            if buffered_bytes >= max_bytes or loop.time() >= deadline:
+                yield "".join(buffer)
+                buffer, buffered_bytes = [], 0
+
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+async def token_frames(chunks: AsyncIterator[str], per_token: bool = False,
+                       offset: Optional[int] = None) -> AsyncIterator[bytes]:
+    """
+    Encode streamed answer text as NDJSON token frames.
+
+    Args:
+        chunks: Text chunks of the answer
+        per_token: Send one frame per chunk instead of coalescing them
+        offset: Answer characters sent before the first chunk; if given, each frame
+            carries the offset reached after it so the client can resume from there
+
+    Yields:
+        Encoded {"status": "token", "token": ...} frames
+    """
+    if not per_token:
+        chunks = coalesce_chunks(chunks)
+    async for text in chunks:
+        if offset is None:
+            yield ndjson_frame({"status": "token", "token": text})
+        else:
+            offset += len(text)
+            yield ndjson_frame({"status": "token", "token": text, "offset": offset})
@@ -113,5 +113,7 @@ else
 fi
 
 # Start the application
+# Each worker opens up to DB_CONNECTIONS_PER_WORKER Postgres connections;
+# keep workers x DB_CONNECTIONS_PER_WORKER below max_connections
 echo "🎯 Starting FastAPI application..."
-exec python -m uvicorn app.main:app --host 0.0.0.0 --port 35430 --workers 5
+exec python -m uvicorn app.main:app --host 0.0.0.0 --port 35430 --workers "${UVICORN_WORKERS:-5}"